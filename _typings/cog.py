@@ -1,18 +1,27 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar
 
 from discord.ext import commands
 
 if TYPE_CHECKING:
     from bot import FIFIBot
+    from utils.ratelimit import Limit
+
+    from .context import Context
 
 __all__: tuple[str, ...] = ("BaseCog",)
 
 
 class BaseCog(commands.Cog):
+    # limits every command of the cog counts against together, see `utils.ratelimit.Limit`.
+    ratelimits: ClassVar[tuple[Limit, ...]] = ()
+
     def __init__(self, bot: FIFIBot) -> None:
         self.bot: FIFIBot = bot
 
-
-
+    async def cog_check(self, ctx: Context) -> bool:  # type: ignore[override]
+        # only looks at the limits, the use is counted once the command is invoked.
+        if self.ratelimits:
+            await self.bot.ratelimiter.check(ctx, [(self.qualified_name, self.ratelimits, 1.0)])
+        return True
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
 import io
-from asyncpg import Pool
+import time
 from aiohttp import ClientSession
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, AsyncIterable, Sequence
 
 import discord
 from discord.ext import commands
 
-from ui import ConfirmationView
-from database import DatabaseProtocol
+from database import DatabaseProtocol, GuildSettingsCache, WriteBuffer
+from ui import TextPaginator
+from utils import AttachmentSpool, WebClient, paginate_stream
 
 if TYPE_CHECKING:
     from bot import FIFIBot
@@ -24,18 +25,33 @@ class Context(commands.Context["FIFIBot"]):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.pool: Pool = self.bot.pool
+        self.pool: DatabaseProtocol = self.bot.pool
 
     @property
     def db(self) -> DatabaseProtocol:
         """A database connection pool."""
         return self.pool
 
+    @property
+    def buffer(self) -> WriteBuffer:
+        """The write-behind buffer for batched inserts."""
+        return self.bot.buffer
+
+    @property
+    def settings(self) -> GuildSettingsCache:
+        """The cache of the per guild settings."""
+        return self.bot.settings
+
     @property
     def session(self) -> ClientSession:
         """Get the bot web client session."""
         return self.bot.session
 
+    @property
+    def web(self) -> WebClient:
+        """The web client with caching, for requests to external APIs."""
+        return self.bot.web
+
     @staticmethod
     def tick(opt: bool | None, label: str | None = None) -> str:
         """
@@ -100,19 +116,21 @@ class Context(commands.Context["FIFIBot"]):
         """
 
         author_id = author_id or self.author.id
-        view = ConfirmationView(
-            timeout=timeout,
-            delete_after=delete_after,
-            author_id=author_id,
-        )
-        view.message = await self.send(
-            content=message,
-            embed=embed,
-            view=view,
-            ephemeral=delete_after,
-        )
-        await view.wait()
-        return view.value
+        prompts = self.bot.prompts
+        prompt = prompts.create(timeout=timeout, delete_after=delete_after)
+        try:
+            sent = await self.send(
+                content=message,
+                embed=embed,
+                view=prompts.view(prompt, author_id),
+                ephemeral=delete_after,
+            )
+        except BaseException:
+            prompts.discard(prompt)
+            raise
+
+        prompts.attach(prompt, sent)
+        return await prompt.future
 
     async def safe_send(
         self, content: str, *, escape_mentions: bool = True, **kwargs
@@ -139,6 +157,99 @@ class Context(commands.Context["FIFIBot"]):
         else:
             return await self.send(content, **kwargs)
 
+    async def stream_send(
+        self,
+        source: AsyncIterable[str | Sequence[Any]],
+        *,
+        escape_mentions: bool = True,
+        codeblock: str | None = None,
+        paginate: bool = False,
+        max_messages: int = 3,
+        max_pages: int = 50,
+        filename: str = "output.txt",
+        compress: bool = False,
+        max_file_size: int = 8 * 1024 * 1024,
+    ) -> list[discord.Message]:
+        """
+        Send text as it's produced, without ever holding all of it.
+
+        The text is cut into pages as it arrives, each sent as its own message or
+        added to a paginator. What doesn't fit in ``max_messages`` or ``max_pages``
+        goes into an attachment, kept in memory while small and on disk after.
+
+        Parameters
+        ----------
+        source: `AsyncIterable[str | Sequence[Any]]`
+            The text to send, or rows which are written one per line.
+        escape_mentions: `bool`
+            Whether to escape mentions like @username.
+        codeblock: `str | None`
+            The language of the code block the pages are wrapped in, no code block if ``None``.
+        paginate: `bool`
+            Whether the pages go to a paginator instead of a message each.
+        max_messages: `int`
+            The most messages sent before the rest goes into the attachment.
+        max_pages: `int`
+            The most pages of the paginator before the rest goes into the attachment.
+        filename: `str`
+            The name of the attachment.
+        compress: `bool`
+            Whether the attachment is gzip compressed.
+        max_file_size: `int`
+            The most bytes written to the attachment, the rest is cut off.
+
+        Returns
+        --------
+        list[discord.Message]
+            The messages sent.
+        """
+        wrapper = f"```{codeblock}\n{{}}```" if codeblock is not None else "{}"
+        page_size = 2000 - len(wrapper) + 2
+
+        messages: list[discord.Message] = []
+        paginator: TextPaginator | None = None
+        spool: AttachmentSpool | None = None
+        refreshed = 0.0
+
+        try:
+            async for page in paginate_stream(source, page_size=page_size, escape_mentions=escape_mentions):
+                if spool is not None:
+                    spool.write(page)
+                elif paginate and (paginator is None or len(paginator.pages) < max_pages):
+                    if paginator is None:
+                        paginator = TextPaginator(author_id=self.author.id)
+                        paginator.add_page(wrapper.format(page))
+                        if (message := await paginator.start(self)) is not None:
+                            messages.append(message)
+                        refreshed = time.monotonic()
+                        continue
+
+                    paginator.add_page(wrapper.format(page))
+                    # editing on every page would burn the rate limit of the channel.
+                    if time.monotonic() - refreshed > 2:
+                        await paginator.refresh()
+                        refreshed = time.monotonic()
+                elif not paginate and len(messages) < max_messages:
+                    messages.append(await self.send(wrapper.format(page)))
+                else:
+                    spool = AttachmentSpool(filename, compress=compress, max_size=max_file_size)
+                    spool.write(page)
+
+            if paginator is not None:
+                paginator.complete = True
+                await paginator.refresh()
+
+            if spool is not None:
+                note = "The rest of the output is attached"
+                if spool.truncated:
+                    note += f", cut off after {spool.max_size // 1024} KiB"
+                messages.append(await self.send(f"{note}.", file=spool.to_file()))
+        finally:
+            if spool is not None:
+                spool.close()
+
+        return messages
+
     async def show_help(self, command: Any | None = None) -> None:
         """
         Shows the help command for the specified command if given.
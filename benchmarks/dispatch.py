@@ -0,0 +1,324 @@
+"""
+End-to-end benchmark of the command pipeline, fed by a fake gateway with the HTTP layer stubbed.
+
+Run from the repository root (the bot's config.toml is read as usual, no token is needed):
+
+    python -m benchmarks.dispatch [--number 2000]
+"""
+
+from __future__ import annotations
+
+import gc
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Awaitable
+
+import discord
+from discord.webhook.async_ import async_context
+
+from bot import FIFIBot
+from core import CONFIG
+from database import GuildSettingsCache, LocalDatabase, WriteBuffer
+from launcher import create_database
+
+
+BOT_ID: int = 1000000000000000001
+GUILD_ID: int = 1000000000000000002
+CHANNEL_ID: int = 1000000000000000003
+AUTHOR_ID: int = 1000000000000000004
+APPLICATION_ID: int = BOT_ID
+
+
+def _user(user_id: int, name: str, *, bot: bool = False) -> dict[str, Any]:
+    return {
+        "id": str(user_id),
+        "username": name,
+        "discriminator": "0",
+        "global_name": name,
+        "avatar": None,
+        "bot": bot,
+    }
+
+
+def _member(user_id: int, name: str) -> dict[str, Any]:
+    return {
+        "user": _user(user_id, name),
+        "roles": [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def _guild() -> dict[str, Any]:
+    return {
+        "id": str(GUILD_ID),
+        "name": "benchmark",
+        "owner_id": str(AUTHOR_ID),
+        "icon": None,
+        "features": [],
+        "verification_level": 0,
+        "default_message_notifications": 0,
+        "explicit_content_filter": 0,
+        "mfa_level": 0,
+        "nsfw_level": 0,
+        "premium_tier": 0,
+        "preferred_locale": "en-US",
+        "member_count": 2,
+        "roles": [
+            {
+                "id": str(GUILD_ID),
+                "name": "@everyone",
+                "permissions": str(discord.Permissions.general().value | discord.Permissions.text().value),
+                "position": 0,
+                "color": 0,
+                "hoist": False,
+                "managed": False,
+                "mentionable": False,
+            }
+        ],
+        "channels": [
+            {"id": str(CHANNEL_ID), "type": 0, "name": "general", "position": 0, "permission_overwrites": []}
+        ],
+        "members": [_member(AUTHOR_ID, "author"), _member(BOT_ID, "fifi")],
+        "emojis": [],
+        "stickers": [],
+    }
+
+
+def _message(message_id: int, content: str) -> dict[str, Any]:
+    return {
+        "id": str(message_id),
+        "channel_id": str(CHANNEL_ID),
+        "guild_id": str(GUILD_ID),
+        "author": _user(AUTHOR_ID, "author"),
+        "member": {k: v for k, v in _member(AUTHOR_ID, "author").items() if k != "user"},
+        "content": content,
+        "timestamp": "2024-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def _interaction(interaction_id: int, command: discord.app_commands.Command, number: int) -> dict[str, Any]:
+    return {
+        "id": str(interaction_id),
+        "application_id": str(APPLICATION_ID),
+        "type": 2,
+        "token": "benchmark",
+        "version": 1,
+        "guild_id": str(GUILD_ID),
+        "channel_id": str(CHANNEL_ID),
+        "member": {**_member(AUTHOR_ID, "author"), "permissions": "8"},
+        "locale": "en-US",
+        "guild_locale": "en-US",
+        "app_permissions": "8",
+        # read unconditionally by discord.py 2.5 and later.
+        "attachment_size_limit": 10 * 1024 * 1024,
+        "data": {
+            "id": str(interaction_id + 1),
+            "name": command.name,
+            "type": 1,
+            "options": [{"name": "number", "type": 4, "value": number}],
+        },
+    }
+
+
+class FakeHTTP:
+    """Answers the requests the pipeline makes, counting them instead of sending them."""
+
+    __slots__: tuple[str, ...] = ("requests", "_ids")
+
+    def __init__(self) -> None:
+        self.requests: dict[str, int] = {}
+        self._ids: int = 2000000000000000000
+
+    async def request(self, route: discord.http.Route, **kwargs: Any) -> Any:
+        key = f"{route.method} {route.path}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        if route.path.startswith("/channels/{channel_id}/messages") and route.method in ("POST", "PATCH"):
+            self._ids += 1
+            payload = kwargs.get("json") or {}
+            return {**_message(self._ids, payload.get("content") or ""), "author": _user(BOT_ID, "fifi", bot=True)}
+        if route.path.endswith("/commands") and route.method == "PUT":
+            return []
+        if route.path.endswith("/callback"):
+            # discord.py 2.5 and later ask for the interaction callback response.
+            return {"interaction": {"id": "0", "type": 2}}
+        return None
+
+    async def webhook_request(self, route: discord.http.Route, session: Any = None, **kwargs: Any) -> Any:
+        # interaction responses and followups go through the webhook adapter.
+        return await self.request(route, **kwargs)
+
+
+async def create_bot(*, postgres: bool = False) -> tuple[FIFIBot, FakeHTTP]:
+    if postgres:
+        db = await create_database()
+    else:
+        db = LocalDatabase()
+        await db.setup(*sorted(Path("database/schemas").glob("*.sql")))
+
+    # errors raised by the benchmark are logged, never posted.
+    CONFIG.BOT.exception_webhook = ""
+
+    bot = FIFIBot()
+    bot.pool = db
+    bot.buffer = WriteBuffer(db)
+    bot.settings = GuildSettingsCache(db)
+
+    fake = FakeHTTP()
+    bot.http.request = fake.request  # type: ignore[method-assign]
+    async_context.get().request = fake.webhook_request  # type: ignore[method-assign]
+
+    # what logging in and the READY payload would have filled in.
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=_user(BOT_ID, "fifi", bot=True))
+    state.application_id = APPLICATION_ID
+    bot.owner_id = AUTHOR_ID
+    state._add_guild_from_data(_guild())
+
+    await bot._async_setup_hook()
+    await bot.setup_hook()
+    return bot, fake
+
+
+async def _stage(name: str, timings: dict[str, float], coro: Awaitable[Any]) -> Any:
+    started = time.perf_counter()
+    result = await coro
+    timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+    return result
+
+
+async def run_stages(bot: FIFIBot, contents: list[str], number: int) -> dict[str, float]:
+    """Run messages through the pipeline one stage at a time, timing each stage."""
+    state = bot._connection
+    channel = bot.get_channel(CHANNEL_ID)
+    timings: dict[str, float] = {}
+
+    async def parse(data: dict[str, Any]) -> discord.Message:
+        return discord.Message(state=state, channel=channel, data=data)  # type: ignore[arg-type]
+
+    for i in range(number):
+        data = _message(3000000000000000000 + i, contents[i % len(contents)])
+        message = await _stage("parse", timings, parse(data))
+        await _stage("prefix", timings, bot.get_prefix(message))
+        ctx = await _stage("context", timings, bot.get_context(message))
+        if ctx.command is None:
+            continue
+
+        # checks, cooldowns and converters, e.g. commands.Greedy[discord.Object] of Admin.sync.
+        await _stage("prepare", timings, ctx.command.prepare(ctx))
+        await _stage("callback", timings, ctx.command.callback(*ctx.args, **ctx.kwargs))
+
+    return timings
+
+
+async def _drain() -> None:
+    # let the tasks the dispatch scheduled run to completion.
+    current = asyncio.current_task()
+    while pending := [t for t in asyncio.all_tasks() if t is not current and not t.done() and _is_dispatch(t)]:
+        await asyncio.wait(pending)
+
+
+def _is_dispatch(task: asyncio.Task) -> bool:
+    name = task.get_name()
+    return name.startswith("discord.py:") or name.startswith("CommandTree-invoker")
+
+
+async def run_gateway(
+    bot: FIFIBot, make_payload: Callable[[int], dict[str, Any]], event: str, number: int, batch: int = 100
+) -> float:
+    """Feed payloads through the gateway parser like the websocket would, returning the elapsed time."""
+    parse = bot._connection.parsers[event]
+    started = time.perf_counter()
+    for start in range(0, number, batch):
+        for i in range(start, min(number, start + batch)):
+            parse(make_payload(i))
+        await _drain()
+    return time.perf_counter() - started
+
+
+async def measure_memory(run: Callable[[], Awaitable[Any]], number: int) -> tuple[float, float]:
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    await run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    return peak / number, (sys.getallocatedblocks() - blocks) / number
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="messages per measurement")
+    parser.add_argument("--postgres", action="store_true", help="use the configured database instead of sqlite")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bot, fake = await create_bot(postgres=args.postgres)
+    test = bot.tree.get_command("testing")
+
+    workloads: dict[str, list[str]] = {
+        "no prefix": ["hello there, just chatting"],
+        "unknown command": ["?nothing here"],
+        "queries": ["?queries 5"],
+        "sync (Greedy[Object])": [f"?sync {GUILD_ID} {GUILD_ID + 1} {GUILD_ID + 2}"],
+    }
+
+    try:
+        print(f"{'workload':<24} {'msgs/s':>9}  stages (us per message)")
+        for name, contents in workloads.items():
+            # warm up caches, e.g. the sync hashes and the translated payloads.
+            await run_stages(bot, contents, 10)
+
+            started = time.perf_counter()
+            timings = await run_stages(bot, contents, args.number)
+            elapsed = time.perf_counter() - started
+            stages = "  ".join(f"{stage} {t / args.number * 1e6:.1f}" for stage, t in timings.items())
+            print(f"{name:<24} {args.number / elapsed:>9.0f}  {stages}")
+
+        print()
+        print(f"{'gateway event':<24} {'msgs/s':>9} {'peak KiB/msg':>13} {'blocks/msg':>11}")
+        gateway: dict[str, tuple[str, Callable[[int], dict[str, Any]]]] = {
+            "MESSAGE_CREATE chat": ("MESSAGE_CREATE", lambda i: _message(4000000000000000000 + i, "just chatting")),
+            "MESSAGE_CREATE queries": ("MESSAGE_CREATE", lambda i: _message(5000000000000000000 + i, "?queries 5")),
+        }
+        if test is not None:
+            gateway["INTERACTION_CREATE"] = (
+                "INTERACTION_CREATE",
+                lambda i: _interaction(6000000000000000000 + i * 2, test, i),  # type: ignore[arg-type]
+            )
+
+        for name, (event, make_payload) in gateway.items():
+            await run_gateway(bot, make_payload, event, 10)
+            elapsed = await run_gateway(bot, make_payload, event, args.number)
+            peak, blocks = await measure_memory(
+                lambda: run_gateway(bot, make_payload, event, args.number), args.number
+            )
+            print(f"{name:<24} {args.number / elapsed:>9.0f} {peak / 1024:>13.2f} {blocks:>11.2f}")
+
+        print()
+        print("stubbed HTTP requests:", ", ".join(f"{k}: {v}" for k, v in sorted(fake.requests.items())))
+    finally:
+        await bot.close()
+        await bot.pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
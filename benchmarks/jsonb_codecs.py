@@ -0,0 +1,82 @@
+"""
+Micro-benchmark of the jsonb codec backends on rows shaped like the ones the bot stores.
+
+Run from the repository root:
+
+    python -m benchmarks.jsonb_codecs [--number 2000]
+"""
+
+from __future__ import annotations
+
+import random
+import argparse
+import timeit
+from typing import Any
+
+from database.codecs import SERIALIZERS, JSONBCodec
+
+
+def _settings_row() -> dict[str, Any]:
+    # a guild settings row, a handful of flat keys.
+    return {
+        "prefixes": ["f!", "?"],
+        "locale": "en-US",
+        "log_channel": 1123456789012345678,
+        "mod_roles": [1123456789012345670 + i for i in range(5)],
+        "disabled_commands": ["sync", "testing"],
+        "welcome": {"enabled": True, "channel": 1123456789012345679, "message": "Hi {user}!"},
+        "automod": {"invites": True, "links": False, "spam_threshold": 5},
+    }
+
+
+def _stats_row() -> dict[str, Any]:
+    # a per guild stats row, counters keyed by id plus a short history.
+    rng = random.Random(0)
+    return {
+        "messages": {str(1123456789012345000 + i): rng.randint(0, 10_000) for i in range(150)},
+        "commands": {f"command_{i}": rng.randint(0, 500) for i in range(40)},
+        "history": [
+            {"day": f"2024-01-{d:02}", "messages": rng.randint(0, 5000), "joins": rng.randint(0, 50)}
+            for d in range(1, 31)
+        ],
+    }
+
+
+def _large_row() -> dict[str, Any]:
+    return {"members": [_settings_row() for _ in range(100)]}
+
+
+ROWS: dict[str, dict[str, Any]] = {
+    "settings": _settings_row(),
+    "stats": _stats_row(),
+    "large": _large_row(),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="iterations per measurement")
+    args = parser.parse_args()
+
+    codecs: list[JSONBCodec] = []
+    for serializer in SERIALIZERS:
+        codecs.append(JSONBCodec(serializer, "text"))
+        codecs.append(JSONBCodec(serializer, "binary"))
+    codecs.append(JSONBCodec("auto", raw=True))
+
+    print(f"{'row':<10} {'size':>8}  {'codec':<34} {'encode':>10} {'decode':>10}")
+    for row_name, row in ROWS.items():
+        for codec in codecs:
+            wire = codec.encoder(row)
+            encode = timeit.timeit(lambda: codec.encoder(row), number=args.number)
+            decode = timeit.timeit(lambda: codec.decoder(wire), number=args.number)
+            label = f"{codec.serializer}/{codec.format}{'/raw' if codec.raw else ''}"
+            print(
+                f"{row_name:<10} {len(wire):>7}B  {label:<34} "
+                f"{encode / args.number * 1e6:>8.1f}us {decode / args.number * 1e6:>8.1f}us"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,134 @@
-import logging
+from __future__ import annotations
+
 import sys
+import math
+import time
+import asyncio
+import logging
 import aiohttp
-import asyncpg
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 
 from _typings import Context
-from core import CONFIG
+from core import CONFIG, LoopStalled, RateLimited, WorkerLink
+from core.performance import create_connector, json_dumps
+from database import (
+    QUERIES,
+    AdaptivePool,
+    DatabaseProtocol,
+    ErrorStore,
+    GuildSettingsCache,
+    WriteBuffer,
+)
 from translations import TreeTranslator
+from ui import PromptButton, PromptDispatcher
+from utils import FetchCache, Limit, command_uses, PrefixMatcher, RateLimiter, TreeSyncer, WebClient, cache_options
+from utils.error import PacketManager
+from utils.ratelimit import RATELIMITED
+from utils.watchdog import LoopWatchdog
+from utils.metrics import (
+    COMMAND_ERRORS,
+    COMMANDS,
+    METRICS,
+    CommandTiming,
+    LoopLagMonitor,
+    MetricsServer,
+    current_timing,
+    http_trace_config,
+    observe_query,
+)
 
 
 _log: logging.Logger = logging.getLogger(__name__)
 
 
-class FIFIBot(commands.Bot):
+DEFAULT_PREFIXES: tuple[str, ...] = ("f!", "?")
+
+
+def _command_prefix(bot: FIFIBot, message: discord.Message) -> list[str]:
+    # the prefix as written, so the library's own matching is case insensitive too.
+    prefix = bot.prefixes.match(message)
+    return [prefix] if prefix is not None else []
+
+
+def _default_ratelimits() -> tuple[Limit, ...]:
+    config = CONFIG.RATELIMIT
+    if not config.enabled:
+        return ()
 
-    pool: asyncpg.Pool
+    limits = (
+        Limit(config.user_rate, config.user_per, "user"),
+        Limit(config.guild_rate, config.guild_per, "guild"),
+        Limit(config.global_rate, config.global_per, "global"),
+    )
+    # a rate of 0 turns that level off.
+    return tuple(limit for limit in limits if limit.rate > 0)
 
-    def __init__(self) -> None:
+
+class FIFIBot(commands.AutoShardedBot):
+
+    pool: DatabaseProtocol
+    buffer: WriteBuffer
+    settings: GuildSettingsCache
+    syncer: TreeSyncer
+    packets: PacketManager
+    prompts: PromptDispatcher
+    ratelimiter: RateLimiter
+
+    def __init__(
+        self,
+        *,
+        shard_ids: list[int] | None = None,
+        shard_count: int | None = None,
+        cluster: WorkerLink | None = None,
+    ) -> None:
         ua: str = (
             f"FiFi Bot/{CONFIG.BOT.version}, Python/{sys.version}, Discord.py/{discord.__version__}"  # user agent string
         )
 
         self.session: aiohttp.ClientSession = aiohttp.ClientSession(
-            headers={"User-Agent": ua}
+            connector=create_connector(),
+            headers={"User-Agent": ua},
+            json_serialize=json_dumps(),
+            trace_configs=[http_trace_config()],
         )  # a aiohttp web client session -> Only close when bot is closed.
+        self.web: WebClient = WebClient(self.session)  # cached requests to external APIs
 
         self.debug: bool = CONFIG.BOT.debug  # debug mode of the bot
         self.uptime = discord.utils.utcnow()  # uptime of the bot
+        self.cluster: WorkerLink | None = cluster  # IPC link to the supervisor in cluster mode
+        self.loop_lag: LoopLagMonitor = LoopLagMonitor(CONFIG.METRICS.loop_lag_interval)
+        self.metrics_server: MetricsServer | None = None
+        self.watchdog: LoopWatchdog | None = None
+        self.prefixes: PrefixMatcher = PrefixMatcher(DEFAULT_PREFIXES)  # command prefixes of every guild
+        self.ratelimits: tuple[Limit, ...] = _default_ratelimits()  # limits every command counts against
+        self.fetched: FetchCache = FetchCache(
+            max_size=CONFIG.CACHE.fetch_cache_size, ttl=CONFIG.CACHE.fetch_cache_ttl
+        )  # members and users fetched because they weren't cached
 
         intents: discord.Intents = discord.Intents.default()
         intents.message_content = True
 
+        if shard_ids is None and shard_count is None:
+            # outside of a cluster it's a single shard, the same as a plain commands.Bot.
+            shard_count = 1
+
         super().__init__(
-            command_prefix=["f!", "?"],
+            command_prefix=_command_prefix,
             intents=intents,
             case_insensitive=True,
             strip_after_prefix=True,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
+            http_trace=http_trace_config(),
+            **cache_options(CONFIG.CACHE, intents),
         )
+        if CONFIG.PERFORMANCE.enabled:
+            # the library only creates its connector on login, this is its own with the profile applied.
+            # Discord's rate limits already bound the connections.
+            self.http.connector = create_connector(limit=0, limit_per_host=0)
 
     async def get_context(
         self, origin: discord.Interaction | discord.Message, /, *, cls=Context
@@ -46,18 +136,244 @@ class FIFIBot(commands.Bot):
         # get the context of the message or interaction
         return await super().get_context(origin, cls=cls)
 
+    async def get_or_fetch_member(self, guild: discord.Guild, user_id: int, /) -> discord.Member | None:
+        # members outside the cache profile are fetched once and kept for a while.
+        return await self.fetched.member(guild, user_id)
+
+    async def get_or_fetch_user(self, user_id: int, /) -> discord.User | None:
+        return await self.fetched.user(self, user_id)
+
+    async def process_commands(self, message: discord.Message, /) -> None:
+        # most messages aren't commands, turn them away before building a context for them.
+        if message.author.bot or self.prefixes.match(message) is None:
+            return
+
+        # every message gets its own task, the timing stays with the command it invokes.
+        current_timing.set(CommandTiming())
+        await super().process_commands(message)
+
+    async def _before_command(self, ctx: Context) -> None:
+        # the checks only look at the limits, e.g. for the help command, the use is counted here.
+        # a group is prepared along with its subcommand unless it's only invoked without one.
+        nested = ctx.command is not None and any(not parent.invoke_without_command for parent in ctx.command.parents)
+        uses = command_uses(ctx.command, self.ratelimits, inherited=not nested)
+        if uses:
+            await self.ratelimiter.hit(uses, user_id=ctx.author.id, guild_id=ctx.guild and ctx.guild.id)
+
+        timing = current_timing.get()
+        if timing is not None:
+            timing.invoked = time.perf_counter()
+
+    async def _after_command(self, ctx: Context) -> None:
+        name = ctx.command.qualified_name if ctx.command else "unknown"
+        COMMANDS.inc(name, "prefix")
+        timing = current_timing.get()
+        if timing is not None:
+            timing.observe(name, "prefix")
+
+    async def _interaction_check(self, interaction: discord.Interaction, /) -> bool:
+        # runs in the task the app command callback runs in.
+        timing = CommandTiming()
+        current_timing.set(timing)
+        interaction.extras["timing"] = timing
+
+        # autocomplete runs on every keystroke and can't be answered with an error.
+        if interaction.type is not discord.InteractionType.autocomplete:
+            uses = command_uses(interaction.command, self.ratelimits)
+            if uses:
+                await self.ratelimiter.hit(uses, user_id=interaction.user.id, guild_id=interaction.guild_id)
+        return True
+
+    async def _ratelimit_check(self, ctx: Context) -> bool:
+        if not self.ratelimits:
+            return True
+        return await self.ratelimiter.check(ctx, [("*", self.ratelimits, 1.0)])
+
+    async def on_app_command_completion(
+        self, interaction: discord.Interaction, command: app_commands.Command | app_commands.ContextMenu
+    ) -> None:
+        COMMANDS.inc(command.qualified_name, "app")
+        timing: CommandTiming | None = interaction.extras.get("timing")
+        if timing is not None:
+            timing.observe(command.qualified_name, "app")
+
+    def _register_metrics(self) -> None:
+        QUERIES.observers.append(observe_query)
+
+        METRICS.gauge(
+            "fifi_gateway_latency_seconds",
+            "The heartbeat latency of each shard.",
+            ("shard",),
+            function=lambda: [((str(shard),), latency) for shard, latency in self.latencies if math.isfinite(latency)],
+        )
+        METRICS.gauge(
+            "fifi_guilds", "The guilds in the cache.", function=lambda: [((), len(self.guilds))]
+        )
+
+        pool = self.pool
+        if isinstance(pool, AdaptivePool):
+            METRICS.gauge(
+                "fifi_pool_connections",
+                "The connections of the database pool.",
+                ("state",),
+                function=lambda: [
+                    (("in_use",), pool.metrics.in_use),
+                    (("limit",), pool.limit),
+                    (("open",), pool.get_size()),
+                    (("idle",), pool.get_idle_size()),
+                ],
+            )
+            METRICS.gauge(
+                "fifi_pool_acquire_wait_p95_seconds",
+                "The p95 wait for a connection over the most recent acquires.",
+                function=lambda: [((), pool.metrics.wait_percentile(95))],
+            )
 
     async def setup_hook(self) -> None:
         # setup function only call once when bot is ready
         await self.tree.set_translator(TreeTranslator())
-        await self.load_extension("jishaku")
+        self.tree.on_error = self.on_app_command_error
+        self.tree.interaction_check = self._interaction_check
+        self.before_invoke(self._before_command)
+        self.after_invoke(self._after_command)
+
+        self._register_metrics()
+        self.loop_lag.start()
+        if CONFIG.WATCHDOG.enabled:
+            self.watchdog = LoopWatchdog(
+                asyncio.get_running_loop(),
+                threshold=CONFIG.WATCHDOG.threshold,
+                interval=CONFIG.WATCHDOG.interval,
+                on_stall=self._on_loop_stall,
+            )
+            self.watchdog.start()
+        if CONFIG.METRICS.enabled:
+            # workers of a cluster each serve their own metrics.
+            port = CONFIG.METRICS.port + (self.cluster.cluster_id if self.cluster else 0)
+            self.metrics_server = MetricsServer(CONFIG.METRICS.host, port)
+            await self.metrics_server.start()
+
+        self.packets = PacketManager(self, store=ErrorStore(self.buffer))
+        self.prompts = PromptDispatcher(self)
+        self.add_dynamic_items(PromptButton)
+        self.ratelimiter = RateLimiter(
+            self.pool, shared_scopes=CONFIG.RATELIMIT.shared_scopes, resolution=CONFIG.RATELIMIT.resolution
+        )
+        self.ratelimiter.start()
+        self.add_check(self._ratelimit_check)
+        self.settings.start()
+        self.prefixes.user_id = self.user and self.user.id
+        await self.prefixes.load(self.settings)
         await self.load_extension("extensions")
 
+        self.syncer = TreeSyncer(self.tree, self.pool)
+        if CONFIG.BOT.auto_sync:
+            try:
+                await self.syncer.sync()
+            except discord.HTTPException as e:
+                _log.error(f"Failed to sync the global commands: {e}")
+
+        if self.cluster is not None:
+            self.cluster.start(self)
+
+    def _on_loop_stall(self, error: LoopStalled) -> None:
+        packets: PacketManager | None = getattr(self, "packets", None)
+        if packets is not None:
+            asyncio.create_task(packets.add_error(error=error, event_name="loop_stall"))
+
     async def on_ready(self) -> None:
         _log.info(f"Logged in as: {self.user}")
 
+    async def on_error(self, event_method: str, /, *args, **kwargs) -> None:
+        packets: PacketManager | None = getattr(self, "packets", None)
+        if packets is None:
+            return await super().on_error(event_method, *args, **kwargs)
+
+        await packets.add_error(error=sys.exc_info()[1], event_name=event_method)
+
+    async def on_command_error(self, context: Context, exception: commands.CommandError, /) -> None:
+        error = exception.original if isinstance(exception, commands.CommandInvokeError) else exception
+        COMMAND_ERRORS.inc(
+            context.command.qualified_name if context.command else "unknown", "prefix", type(error).__name__
+        )
+
+        if isinstance(error, RateLimited):
+            RATELIMITED.inc(error.scope)
+            # gone once the command can be used again, no point in answering every try.
+            await context.send(
+                f"You're going too fast, try again in {error.retry_after:.1f}s.",
+                delete_after=min(error.retry_after, 10.0),
+            )
+            return
+
+        packets: PacketManager | None = getattr(self, "packets", None)
+        # only bugs are reported, bad input and failed checks are the user's doing.
+        if packets is None or not isinstance(exception, commands.CommandInvokeError):
+            return await super().on_command_error(context, exception)
+
+        if (context.command and context.command.has_error_handler()) or (
+            context.cog and context.cog.has_error_handler()
+        ):
+            return
+
+        await packets.add_error(error=exception.original, target=context)
+
+    async def on_app_command_error(
+        self, interaction: discord.Interaction, error: app_commands.AppCommandError, /
+    ) -> None:
+        original = error.original if isinstance(error, app_commands.CommandInvokeError) else error
+        COMMAND_ERRORS.inc(
+            interaction.command.qualified_name if interaction.command else "unknown", "app", type(original).__name__
+        )
+
+        if isinstance(error, RateLimited):
+            RATELIMITED.inc(error.scope)
+            if not interaction.response.is_done():
+                await interaction.response.send_message(
+                    f"You're going too fast, try again in {error.retry_after:.1f}s.", ephemeral=True
+                )
+            return
+
+        packets: PacketManager | None = getattr(self, "packets", None)
+        if packets is None or not isinstance(error, app_commands.CommandInvokeError):
+            return await app_commands.CommandTree.on_error(self.tree, interaction, error)
+
+        await packets.add_error(error=error.original, target=interaction)
+
     async def close(self) -> None:
         # close the session when bot is closing
+        if self.cluster is not None:
+            self.cluster.close()
+
+        self.loop_lag.close()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+
+        prompts: PromptDispatcher | None = getattr(self, "prompts", None)
+        if prompts is not None:
+            prompts.close()
+
+        ratelimiter: RateLimiter | None = getattr(self, "ratelimiter", None)
+        if ratelimiter is not None:
+            ratelimiter.close()
+
+        settings: GuildSettingsCache | None = getattr(self, "settings", None)
+        if settings is not None:
+            await settings.close()
+
+        # deliver the error reports still queued while the session is open.
+        packets: PacketManager | None = getattr(self, "packets", None)
+        if packets is not None:
+            await packets.close()
+
+        # write out whatever the cogs still have buffered before going away.
+        buffer: WriteBuffer | None = getattr(self, "buffer", None)
+        if buffer is not None:
+            await buffer.close()
+            _log.info("Flushed the write buffer")
+
         await self.session.close()
         _log.info("Closed Bot Session")
         return await super().close()
@@ -1,3 +1,4 @@
 from .config import CONFIG as CONFIG
 from .enums import *
-
+from .cluster import ClusterSupervisor, WorkerLink
+from .errors import *
@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import os
+import time
+import math
+import asyncio
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+from typing import TYPE_CHECKING, Any, Callable
+
+import aiohttp
+
+if TYPE_CHECKING:
+    from multiprocessing.process import BaseProcess
+
+    from bot import FIFIBot
+
+
+__all__: tuple[str, ...] = (
+    "ClusterSupervisor",
+    "WorkerLink",
+    "fetch_recommended_shards",
+    "split_shards",
+)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# A worker target receives (cluster_id, shard_ids, shard_count, link) and blocks until the bot stops.
+WorkerTarget = Callable[[int, list[int], int, "WorkerLink"], None]
+
+
+async def fetch_recommended_shards(token: str) -> int:
+    """
+    Ask Discord how many shards the bot should run with.
+
+    Parameters
+    ----------
+    token : `str`
+        The bot token.
+
+    Returns
+    -------
+    int
+        The recommended shard count.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"},
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return int(data["shards"])
+
+
+def split_shards(shard_count: int, workers: int) -> list[list[int]]:
+    """
+    Split the shards into contiguous ranges, one per worker.
+
+    Parameters
+    ----------
+    shard_count : `int`
+        The total number of shards.
+    workers : `int`
+        The number of worker processes.
+
+    Returns
+    -------
+    list[list[int]]
+        The shard ids owned by each worker.
+    """
+    workers = max(1, min(workers, shard_count))
+    per_worker = math.ceil(shard_count / workers)
+    return [
+        list(range(start, min(start + per_worker, shard_count)))
+        for start in range(0, shard_count, per_worker)
+    ]
+
+
+class WorkerLink:
+    """
+    The worker side of the IPC channel between a worker process and the supervisor.
+
+    The link periodically reports the health of the bot and listens for commands
+    sent by the supervisor.
+
+    Attributes
+    ----------
+    cluster_id: `int`
+        The id of the cluster this worker runs.
+    interval: `float`
+        How often (in seconds) the health report is sent.
+    """
+
+    __slots__: tuple[str, ...] = ("cluster_id", "interval", "_conn", "_task")
+
+    def __init__(self, cluster_id: int, conn: Connection, *, interval: float) -> None:
+        self.cluster_id: int = cluster_id
+        self.interval: float = interval
+        self._conn: Connection = conn
+        self._task: asyncio.Task[None] | None = None
+
+    def send(self, op: str, **data: Any) -> None:
+        """
+        Send a message to the supervisor. Errors are ignored as the supervisor
+        will notice a dead link through the missing heartbeats.
+        """
+        try:
+            self._conn.send((op, data))
+        except (OSError, ValueError):
+            pass
+
+    def start(self, bot: FIFIBot) -> None:
+        """Start reporting the health of the given bot."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot))
+
+    def close(self) -> None:
+        # the task itself closes the bot when asked to shut down, don't cancel it mid-close.
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+        self._conn.close()
+
+    def _receive(self) -> list[str]:
+        ops: list[str] = []
+        while self._conn.poll():
+            op, _ = self._conn.recv()
+            ops.append(op)
+        return ops
+
+    async def _run(self, bot: FIFIBot) -> None:
+        announced = False
+        while not bot.is_closed():
+            ready = bot.is_ready()
+            if ready and not announced:
+                self.send("ready")
+                announced = True
+
+            latency = bot.latency
+            self.send(
+                "heartbeat",
+                ready=ready,
+                guilds=len(bot.guilds),
+                latency=None if math.isnan(latency) or math.isinf(latency) else latency,
+            )
+
+            try:
+                ops = self._receive()
+            except (EOFError, OSError):
+                # the supervisor is gone, nothing would restart or stop this worker anymore.
+                _log.warning(f"Cluster {self.cluster_id} lost the link to its supervisor, shutting down.")
+                await bot.close()
+                return
+
+            if "shutdown" in ops:
+                _log.info(f"Cluster {self.cluster_id} received shutdown request.")
+                await bot.close()
+                return
+
+            await asyncio.sleep(self.interval)
+
+
+class _Worker:
+    __slots__: tuple[str, ...] = (
+        "cluster_id",
+        "shard_ids",
+        "process",
+        "conn",
+        "last_heartbeat",
+        "ready",
+        "restarts",
+        "restart_at",
+        "stats",
+    )
+
+    def __init__(self, cluster_id: int, shard_ids: list[int]) -> None:
+        self.cluster_id: int = cluster_id
+        self.shard_ids: list[int] = shard_ids
+        self.process: BaseProcess | None = None
+        self.conn: Connection | None = None
+        self.last_heartbeat: float = 0.0
+        self.ready: bool = False
+        self.restarts: int = 0
+        self.restart_at: float | None = None
+        self.stats: dict[str, Any] = {}
+
+    def __repr__(self) -> str:
+        return f"<Cluster id={self.cluster_id} shards={self.shard_ids[0]}-{self.shard_ids[-1]}>"
+
+
+class ClusterSupervisor:
+    """
+    Spawns the worker processes of a cluster, watches their health and restarts them.
+
+    Workers are started one after another, the next one is only spawned once the
+    previous one reported it is ready (or timed out), so the shards don't fight
+    over the identify rate limit.
+
+    Attributes
+    ----------
+    shard_count: `int`
+        The total number of shards across all workers.
+    heartbeat_interval: `float`
+        How often (in seconds) a worker reports its health.
+    heartbeat_timeout: `float`
+        How long (in seconds) a worker can stay silent before it's restarted.
+    restart_delay: `float`
+        The base delay (in seconds) before a crashed worker is restarted.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "shard_count",
+        "heartbeat_interval",
+        "heartbeat_timeout",
+        "restart_delay",
+        "_target",
+        "_workers",
+        "_context",
+        "_closing",
+    )
+
+    def __init__(
+        self,
+        target: WorkerTarget,
+        *,
+        shard_count: int,
+        workers: int = 0,
+        heartbeat_interval: float = 5.0,
+        heartbeat_timeout: float = 60.0,
+        restart_delay: float = 5.0,
+    ) -> None:
+        self.shard_count: int = shard_count
+        self.heartbeat_interval: float = heartbeat_interval
+        self.heartbeat_timeout: float = heartbeat_timeout
+        self.restart_delay: float = restart_delay
+
+        self._target: WorkerTarget = target
+        self._context = multiprocessing.get_context("spawn")
+        self._closing: bool = False
+        self._workers: list[_Worker] = [
+            _Worker(cluster_id, shard_ids)
+            for cluster_id, shard_ids in enumerate(
+                split_shards(shard_count, workers or os.cpu_count() or 1)
+            )
+        ]
+
+    def _spawn(self, worker: _Worker) -> None:
+        parent, child = self._context.Pipe()
+        link = WorkerLink(worker.cluster_id, child, interval=self.heartbeat_interval)
+
+        process = self._context.Process(
+            target=self._target,
+            args=(worker.cluster_id, worker.shard_ids, self.shard_count, link),
+            name=f"fifi-cluster-{worker.cluster_id}",
+            daemon=False,
+        )
+        process.start()
+        child.close()  # the child owns its end now
+
+        worker.process = process
+        worker.conn = parent
+        worker.ready = False
+        worker.restart_at = None
+        worker.last_heartbeat = time.monotonic()
+        _log.info(f"Spawned {worker!r} (pid {process.pid})")
+
+    def _schedule_restart(self, worker: _Worker, reason: str) -> None:
+        if worker.process is not None and worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join(5)
+            if worker.process.is_alive():
+                worker.process.kill()
+
+        if worker.conn is not None:
+            worker.conn.close()
+
+        worker.process = None
+        worker.conn = None
+        delay = min(self.restart_delay * 2**worker.restarts, 300.0)
+        worker.restarts += 1
+        worker.restart_at = time.monotonic() + delay
+        _log.warning(f"{worker!r} {reason}, restarting in {delay:.1f}s.")
+
+    def _handle(self, worker: _Worker) -> None:
+        assert worker.conn is not None
+        try:
+            while worker.conn.poll():
+                op, data = worker.conn.recv()
+                worker.last_heartbeat = time.monotonic()
+                if op == "ready":
+                    worker.ready = True
+                    worker.restarts = 0
+                    _log.info(f"{worker!r} is ready.")
+                elif op == "heartbeat":
+                    worker.stats = data
+        except (EOFError, OSError):
+            # The pipe is closed, the process exit is picked up by the health check.
+            pass
+
+    def _check(self, worker: _Worker) -> None:
+        if worker.process is None:
+            if worker.restart_at is not None and time.monotonic() >= worker.restart_at:
+                self._spawn(worker)
+            return
+
+        if not worker.process.is_alive():
+            self._schedule_restart(
+                worker, f"exited with code {worker.process.exitcode}"
+            )
+        elif time.monotonic() - worker.last_heartbeat > self.heartbeat_timeout:
+            self._schedule_restart(worker, "stopped sending heartbeats")
+
+    def _poll(self, timeout: float) -> None:
+        conns = {w.conn: w for w in self._workers if w.conn is not None}
+        for conn in wait(list(conns), timeout=timeout):
+            self._handle(conns[conn])  # type: ignore
+
+        for worker in self._workers:
+            self._check(worker)
+
+    def run(self) -> None:
+        """
+        Run the cluster until interrupted. This blocks the calling thread.
+        """
+        _log.info(
+            f"Starting {len(self._workers)} cluster(s) for {self.shard_count} shard(s)."
+        )
+        try:
+            for worker in self._workers:
+                self._spawn(worker)
+                started = time.monotonic()
+                while not worker.ready and worker.process is not None:
+                    if time.monotonic() - started > self.heartbeat_timeout:
+                        _log.warning(
+                            f"{worker!r} did not become ready in time, starting the next one."
+                        )
+                        break
+                    self._poll(self.heartbeat_interval)
+
+            while not self._closing:
+                self._poll(self.heartbeat_interval)
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        """Ask every worker to stop and wait for them to exit."""
+        self._closing = True
+        for worker in self._workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.send(("shutdown", {}))
+                except (OSError, ValueError):
+                    pass
+
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+
+            worker.process.join(self.heartbeat_interval * 3)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+
+            _log.info(f"{worker!r} stopped.")
@@ -23,6 +23,8 @@ class BotConfig:
         The webhook to send errors to.
     owner_id : `int`
         The owner ID.
+    auto_sync : `bool`
+        Whether the global commands are synced on startup when they changed.
     """
 
     __slots__: tuple[str, ...] = (
@@ -31,6 +33,7 @@ class BotConfig:
         "version",
         "exception_webhook",
         "owner_id",
+        "auto_sync",
     )
 
     def __init__(
@@ -40,6 +43,7 @@ class BotConfig:
         version: str,
         exception_webhook: str,
         owner_id: int,
+        auto_sync: bool = False,
     ) -> None:
         self.token: str = token
         self.debug: bool = debug
@@ -48,6 +52,7 @@ class BotConfig:
         self.owner_id: int = (
             owner_id  # This is not required because we can get it from app info. It's just optional.
         )
+        self.auto_sync: bool = auto_sync
 
     def __str__(self) -> str:
         return self.token
@@ -64,12 +69,104 @@ class DatabaseConfig:
     ----------
     dsn : `str`
         The database connection string.
+    backend : `str`
+        ``postgres``, or ``sqlite`` for an in-process database used by tests and benchmarks.
+    sqlite_path : `str`
+        The file of the sqlite backend, ``:memory:`` keeps it in memory.
+    latency : `float`
+        An artificial delay (in seconds) added to every statement of the sqlite backend.
+    slow_query_threshold : `float`
+        Named queries slower than this (in seconds) are logged, ``0`` disables it.
+    jsonb_serializer : `str`
+        The JSON library used for jsonb values, ``auto`` picks the fastest one installed.
+    jsonb_format : `str`
+        The wire format of jsonb values, ``binary`` or ``text``.
+    jsonb_raw : `bool`
+        Whether jsonb values are returned as raw JSON bytes for lazy decoding, readers
+        of jsonb columns decode them with `database.codecs.decoded`.
+    buffer_max_rows : `int`
+        The number of pending rows of a table which makes the write buffer flush it.
+    buffer_interval : `float`
+        How often (in seconds) the write buffer flushes every table.
+    settings_cache_size : `int`
+        The maximum number of guilds kept in the settings cache.
+    settings_cache_ttl : `float`
+        How long (in seconds) guild settings are cached.
+    pool_min_size : `int`
+        The number of connections the pool keeps open.
+    pool_max_size : `int`
+        The maximum number of connections the pool can open.
+    pool_target_wait : `float`
+        The acquire wait (in seconds) above which the pool hands out more connections.
+    pool_idle_lifetime : `float`
+        How long (in seconds) any idle connection is kept open, the minimum included,
+        closed connections are opened again on demand.
+    acquire_timeout : `float`
+        How long (in seconds) to wait for a connection by default.
+    command_timeout : `float`
+        How long (in seconds) a query can run by default.
     """
 
-    __slots__: tuple[str, ...] = ("dsn",)
+    __slots__: tuple[str, ...] = (
+        "dsn",
+        "backend",
+        "sqlite_path",
+        "latency",
+        "slow_query_threshold",
+        "jsonb_serializer",
+        "jsonb_format",
+        "jsonb_raw",
+        "buffer_max_rows",
+        "buffer_interval",
+        "settings_cache_size",
+        "settings_cache_ttl",
+        "pool_min_size",
+        "pool_max_size",
+        "pool_target_wait",
+        "pool_idle_lifetime",
+        "acquire_timeout",
+        "command_timeout",
+    )
 
-    def __init__(self, dsn: str) -> None:
+    def __init__(
+        self,
+        dsn: str,
+        backend: str = "postgres",
+        sqlite_path: str = ":memory:",
+        latency: float = 0.0,
+        slow_query_threshold: float = 0.25,
+        jsonb_serializer: str = "auto",
+        jsonb_format: str = "binary",
+        jsonb_raw: bool = False,
+        buffer_max_rows: int = 500,
+        buffer_interval: float = 5.0,
+        settings_cache_size: int = 1000,
+        settings_cache_ttl: float = 300.0,
+        pool_min_size: int = 2,
+        pool_max_size: int = 20,
+        pool_target_wait: float = 0.05,
+        pool_idle_lifetime: float = 120.0,
+        acquire_timeout: float = 10.0,
+        command_timeout: float = 30.0,
+    ) -> None:
         self.dsn: str = dsn
+        self.backend: str = backend
+        self.sqlite_path: str = sqlite_path
+        self.latency: float = latency
+        self.slow_query_threshold: float = slow_query_threshold
+        self.jsonb_serializer: str = jsonb_serializer
+        self.jsonb_format: str = jsonb_format
+        self.jsonb_raw: bool = jsonb_raw
+        self.buffer_max_rows: int = buffer_max_rows
+        self.buffer_interval: float = buffer_interval
+        self.settings_cache_size: int = settings_cache_size
+        self.settings_cache_ttl: float = settings_cache_ttl
+        self.pool_min_size: int = pool_min_size
+        self.pool_max_size: int = pool_max_size
+        self.pool_target_wait: float = pool_target_wait
+        self.pool_idle_lifetime: float = pool_idle_lifetime
+        self.acquire_timeout: float = acquire_timeout
+        self.command_timeout: float = command_timeout
 
     def __str__(self) -> str:
         return self.dsn
@@ -78,6 +175,288 @@ class DatabaseConfig:
         return f"<DatabaseConfig dsn={self.dsn}>"
 
 
+class ClusterConfig:
+    """
+    A configuration for running the bot as a cluster of worker processes.
+
+    Attributes
+    ----------
+    enabled : `bool`
+        Whether the launcher should run in cluster mode.
+    workers : `int`
+        The number of worker processes, ``0`` means one per CPU core.
+    shard_count : `int`
+        The total number of shards, ``0`` means use the count recommended by Discord.
+    heartbeat_interval : `float`
+        How often (in seconds) a worker reports its health to the supervisor.
+    heartbeat_timeout : `float`
+        How long (in seconds) the supervisor waits for a heartbeat before restarting a worker.
+    restart_delay : `float`
+        The base delay (in seconds) before a crashed worker is restarted.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "enabled",
+        "workers",
+        "shard_count",
+        "heartbeat_interval",
+        "heartbeat_timeout",
+        "restart_delay",
+    )
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        workers: int = 0,
+        shard_count: int = 0,
+        heartbeat_interval: float = 5.0,
+        heartbeat_timeout: float = 60.0,
+        restart_delay: float = 5.0,
+    ) -> None:
+        self.enabled: bool = enabled
+        self.workers: int = workers
+        self.shard_count: int = shard_count
+        self.heartbeat_interval: float = heartbeat_interval
+        self.heartbeat_timeout: float = heartbeat_timeout
+        self.restart_delay: float = restart_delay
+
+    def __repr__(self) -> str:
+        return f"<ClusterConfig enabled={self.enabled} workers={self.workers} shard_count={self.shard_count}>"
+
+
+class MetricsConfig:
+    """
+    A configuration for the metrics endpoint.
+
+    Attributes
+    ----------
+    enabled : `bool`
+        Whether the metrics are served over HTTP.
+    host : `str`
+        The address the endpoint listens on.
+    port : `int`
+        The port the endpoint listens on, cluster workers add their cluster ID to it.
+    loop_lag_interval : `float`
+        How often (in seconds) the event loop lag is measured.
+    """
+
+    __slots__: tuple[str, ...] = ("enabled", "host", "port", "loop_lag_interval")
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        host: str = "127.0.0.1",
+        port: int = 9100,
+        loop_lag_interval: float = 0.5,
+    ) -> None:
+        self.enabled: bool = enabled
+        self.host: str = host
+        self.port: int = port
+        self.loop_lag_interval: float = loop_lag_interval
+
+    def __repr__(self) -> str:
+        return f"<MetricsConfig enabled={self.enabled} host={self.host} port={self.port}>"
+
+
+class WatchdogConfig:
+    """
+    A configuration for the event loop watchdog.
+
+    Attributes
+    ----------
+    enabled : `bool`
+        Whether a thread watches the event loop for stalls.
+    threshold : `float`
+        How long (in seconds) the loop can be unresponsive before it's reported.
+    interval : `float`
+        How often (in seconds) the loop is checked.
+    """
+
+    __slots__: tuple[str, ...] = ("enabled", "threshold", "interval")
+
+    def __init__(
+        self, enabled: bool = False, threshold: float = 0.5, interval: float = 0.1
+    ) -> None:
+        self.enabled: bool = enabled
+        self.threshold: float = threshold
+        self.interval: float = interval
+
+    def __repr__(self) -> str:
+        return f"<WatchdogConfig enabled={self.enabled} threshold={self.threshold}>"
+
+
+class PerformanceConfig:
+    """
+    A configuration for the performance profile, every part of it falls back to
+    the default when its library isn't installed.
+
+    Attributes
+    ----------
+    enabled : `bool`
+        Whether the performance profile is used.
+    uvloop : `bool`
+        Whether the event loop is uvloop.
+    json : `str`
+        The JSON library of the web client session, ``auto`` picks the fastest one installed.
+    aiodns : `bool`
+        Whether DNS is resolved with aiodns instead of a thread.
+    connector_limit : `int`
+        The maximum number of connections of a web client session, ``0`` for no limit.
+    connector_limit_per_host : `int`
+        The maximum number of connections to the same host, ``0`` for no limit.
+    dns_cache_ttl : `int`
+        How long (in seconds) resolved hosts are cached.
+    keepalive_timeout : `float`
+        How long (in seconds) an idle connection is kept open.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "enabled",
+        "uvloop",
+        "json",
+        "aiodns",
+        "connector_limit",
+        "connector_limit_per_host",
+        "dns_cache_ttl",
+        "keepalive_timeout",
+    )
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        uvloop: bool = True,
+        json: str = "auto",
+        aiodns: bool = True,
+        connector_limit: int = 100,
+        connector_limit_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+    ) -> None:
+        self.enabled: bool = enabled
+        self.uvloop: bool = uvloop
+        self.json: str = json
+        self.aiodns: bool = aiodns
+        self.connector_limit: int = connector_limit
+        self.connector_limit_per_host: int = connector_limit_per_host
+        self.dns_cache_ttl: int = dns_cache_ttl
+        self.keepalive_timeout: float = keepalive_timeout
+
+    def __repr__(self) -> str:
+        return f"<PerformanceConfig enabled={self.enabled} uvloop={self.uvloop} json={self.json}>"
+
+
+class RatelimitConfig:
+    """
+    A configuration for the rate limits every command is held to, on top of the
+    ones of the command itself.
+
+    Attributes
+    ----------
+    enabled : `bool`
+        Whether the bot-wide rate limits are applied.
+    user_rate : `int`
+        The number of commands a user can use every ``user_per`` seconds, ``0`` for no limit.
+    user_per : `float`
+        How long (in seconds) the user limit takes to refill.
+    guild_rate : `int`
+        The number of commands a guild can use every ``guild_per`` seconds, ``0`` for no limit.
+    guild_per : `float`
+        How long (in seconds) the guild limit takes to refill.
+    global_rate : `int`
+        The number of commands the bot runs every ``global_per`` seconds, ``0`` for no limit.
+    global_per : `float`
+        How long (in seconds) the global limit takes to refill.
+    shared_scopes : `list[str]`
+        The scopes whose buckets are kept in the database, shared by every worker.
+    resolution : `float`
+        The length (in seconds) of a tick of the timing wheel expiring buckets.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "enabled",
+        "user_rate",
+        "user_per",
+        "guild_rate",
+        "guild_per",
+        "global_rate",
+        "global_per",
+        "shared_scopes",
+        "resolution",
+    )
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        user_rate: int = 5,
+        user_per: float = 5.0,
+        guild_rate: int = 60,
+        guild_per: float = 30.0,
+        global_rate: int = 0,
+        global_per: float = 1.0,
+        shared_scopes: list[str] | None = None,
+        resolution: float = 1.0,
+    ) -> None:
+        self.enabled: bool = enabled
+        self.user_rate: int = user_rate
+        self.user_per: float = user_per
+        self.guild_rate: int = guild_rate
+        self.guild_per: float = guild_per
+        self.global_rate: int = global_rate
+        self.global_per: float = global_per
+        self.shared_scopes: list[str] = shared_scopes or []
+        self.resolution: float = resolution
+
+    def __repr__(self) -> str:
+        return f"<RatelimitConfig enabled={self.enabled} shared_scopes={self.shared_scopes}>"
+
+
+class CacheConfig:
+    """
+    A configuration for what the bot keeps of the gateway state.
+
+    Attributes
+    ----------
+    max_messages : `int`
+        The number of messages kept, ``0`` to keep none.
+    members : `str`
+        The members kept, ``all`` that the intents allow, ``voice`` only those in
+        a voice channel, or ``none``.
+    chunk_guilds_at_startup : `bool`
+        Whether every member of every guild is requested at startup, only done
+        when the members intent is on and all members are kept.
+    fetch_cache_size : `int`
+        The maximum number of members and users kept once fetched because they
+        weren't cached.
+    fetch_cache_ttl : `float`
+        How long (in seconds) a fetched member or user is kept.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "max_messages",
+        "members",
+        "chunk_guilds_at_startup",
+        "fetch_cache_size",
+        "fetch_cache_ttl",
+    )
+
+    def __init__(
+        self,
+        max_messages: int = 1000,
+        members: str = "all",
+        chunk_guilds_at_startup: bool = True,
+        fetch_cache_size: int = 1000,
+        fetch_cache_ttl: float = 300.0,
+    ) -> None:
+        self.max_messages: int = max_messages
+        self.members: str = members
+        self.chunk_guilds_at_startup: bool = chunk_guilds_at_startup
+        self.fetch_cache_size: int = fetch_cache_size
+        self.fetch_cache_ttl: float = fetch_cache_ttl
+
+    def __repr__(self) -> str:
+        return f"<CacheConfig max_messages={self.max_messages} members={self.members}>"
+
+
 class ConfigNode:
     """
     A configuration node for the bot.
@@ -88,18 +467,52 @@ class ConfigNode:
         The bot configuration.
     database : `DatabaseConfig`
         The database configuration.
+    cluster : `ClusterConfig`
+        The cluster configuration.
+    metrics : `MetricsConfig`
+        The metrics configuration.
+    watchdog : `WatchdogConfig`
+        The event loop watchdog configuration.
+    performance : `PerformanceConfig`
+        The performance profile configuration.
+    ratelimit : `RatelimitConfig`
+        The command rate limit configuration.
+    cache : `CacheConfig`
+        The gateway cache configuration.
     """
 
-    __slots__: tuple[str, ...] = ("BOT", "DATABASE")
+    __slots__: tuple[str, ...] = ("BOT", "DATABASE", "CLUSTER", "METRICS", "WATCHDOG", "PERFORMANCE", "RATELIMIT", "CACHE")
 
-    def __init__(self, bot: BotConfig, database: DatabaseConfig) -> None:
+    def __init__(
+        self,
+        bot: BotConfig,
+        database: DatabaseConfig,
+        cluster: ClusterConfig | None = None,
+        metrics: MetricsConfig | None = None,
+        watchdog: WatchdogConfig | None = None,
+        performance: PerformanceConfig | None = None,
+        ratelimit: RatelimitConfig | None = None,
+        cache: CacheConfig | None = None,
+    ) -> None:
         self.BOT: BotConfig = bot
         self.DATABASE: DatabaseConfig = database
+        self.CLUSTER: ClusterConfig = cluster or ClusterConfig()
+        self.METRICS: MetricsConfig = metrics or MetricsConfig()
+        self.WATCHDOG: WatchdogConfig = watchdog or WatchdogConfig()
+        self.PERFORMANCE: PerformanceConfig = performance or PerformanceConfig()
+        self.RATELIMIT: RatelimitConfig = ratelimit or RatelimitConfig()
+        self.CACHE: CacheConfig = cache or CacheConfig()
 
     @staticmethod
     def from_dict(data: dict[str, Any]) -> ConfigNode:
         bot_data = data.get("BOT", {})
         database_data = data.get("DATABASE", {})
+        cluster_data = data.get("CLUSTER", {})
+        metrics_data = data.get("METRICS", {})
+        watchdog_data = data.get("WATCHDOG", {})
+        performance_data = data.get("PERFORMANCE", {})
+        ratelimit_data = data.get("RATELIMIT", {})
+        cache_data = data.get("CACHE", {})
 
         bot_config = BotConfig(
             token=bot_data.get("token", ""),
@@ -107,13 +520,93 @@ class ConfigNode:
             version=bot_data.get("version", ""),
             exception_webhook=bot_data.get("exception_webhook", ""),
             owner_id=bot_data.get("owner_id", 0),
+            auto_sync=bot_data.get("auto_sync", False),
         )
 
         database_config = DatabaseConfig(
             dsn=database_data.get("dsn", ""),
+            backend=database_data.get("backend", "postgres"),
+            sqlite_path=database_data.get("sqlite_path", ":memory:"),
+            latency=database_data.get("latency", 0.0),
+            slow_query_threshold=database_data.get("slow_query_threshold", 0.25),
+            jsonb_serializer=database_data.get("jsonb_serializer", "auto"),
+            jsonb_format=database_data.get("jsonb_format", "binary"),
+            jsonb_raw=database_data.get("jsonb_raw", False),
+            buffer_max_rows=database_data.get("buffer_max_rows", 500),
+            buffer_interval=database_data.get("buffer_interval", 5.0),
+            settings_cache_size=database_data.get("settings_cache_size", 1000),
+            settings_cache_ttl=database_data.get("settings_cache_ttl", 300.0),
+            pool_min_size=database_data.get("pool_min_size", 2),
+            pool_max_size=database_data.get("pool_max_size", 20),
+            pool_target_wait=database_data.get("pool_target_wait", 0.05),
+            pool_idle_lifetime=database_data.get("pool_idle_lifetime", 120.0),
+            acquire_timeout=database_data.get("acquire_timeout", 10.0),
+            command_timeout=database_data.get("command_timeout", 30.0),
+        )
+
+        cluster_config = ClusterConfig(
+            enabled=cluster_data.get("enabled", False),
+            workers=cluster_data.get("workers", 0),
+            shard_count=cluster_data.get("shard_count", 0),
+            heartbeat_interval=cluster_data.get("heartbeat_interval", 5.0),
+            heartbeat_timeout=cluster_data.get("heartbeat_timeout", 60.0),
+            restart_delay=cluster_data.get("restart_delay", 5.0),
+        )
+
+        metrics_config = MetricsConfig(
+            enabled=metrics_data.get("enabled", False),
+            host=metrics_data.get("host", "127.0.0.1"),
+            port=metrics_data.get("port", 9100),
+            loop_lag_interval=metrics_data.get("loop_lag_interval", 0.5),
+        )
+
+        watchdog_config = WatchdogConfig(
+            enabled=watchdog_data.get("enabled", False),
+            threshold=watchdog_data.get("threshold", 0.5),
+            interval=watchdog_data.get("interval", 0.1),
         )
 
-        return ConfigNode(bot=bot_config, database=database_config)
+        performance_config = PerformanceConfig(
+            enabled=performance_data.get("enabled", False),
+            uvloop=performance_data.get("uvloop", True),
+            json=performance_data.get("json", "auto"),
+            aiodns=performance_data.get("aiodns", True),
+            connector_limit=performance_data.get("connector_limit", 100),
+            connector_limit_per_host=performance_data.get("connector_limit_per_host", 10),
+            dns_cache_ttl=performance_data.get("dns_cache_ttl", 300),
+            keepalive_timeout=performance_data.get("keepalive_timeout", 30.0),
+        )
+
+        ratelimit_config = RatelimitConfig(
+            enabled=ratelimit_data.get("enabled", False),
+            user_rate=ratelimit_data.get("user_rate", 5),
+            user_per=ratelimit_data.get("user_per", 5.0),
+            guild_rate=ratelimit_data.get("guild_rate", 60),
+            guild_per=ratelimit_data.get("guild_per", 30.0),
+            global_rate=ratelimit_data.get("global_rate", 0),
+            global_per=ratelimit_data.get("global_per", 1.0),
+            shared_scopes=ratelimit_data.get("shared_scopes", []),
+            resolution=ratelimit_data.get("resolution", 1.0),
+        )
+
+        cache_config = CacheConfig(
+            max_messages=cache_data.get("max_messages", 1000),
+            members=cache_data.get("members", "all"),
+            chunk_guilds_at_startup=cache_data.get("chunk_guilds_at_startup", True),
+            fetch_cache_size=cache_data.get("fetch_cache_size", 1000),
+            fetch_cache_ttl=cache_data.get("fetch_cache_ttl", 300.0),
+        )
+
+        return ConfigNode(
+            bot=bot_config,
+            database=database_config,
+            cluster=cluster_config,
+            metrics=metrics_config,
+            watchdog=watchdog_config,
+            performance=performance_config,
+            ratelimit=ratelimit_config,
+            cache=cache_config,
+        )
 
 
 def load_config(file_path: Path) -> ConfigNode:
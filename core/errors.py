@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from discord import app_commands
+from discord.ext import commands
+
+
+__all__: tuple[str, ...] = ("FIFIException", "LoopStalled", "RateLimited")
+
+
+class FIFIException(Exception):
+    """The base of the errors raised by the bot."""
+
+
+class LoopStalled(FIFIException):
+    """
+    The event loop was held by blocking code. It's never raised, its traceback is
+    the stack of the loop thread captured during the stall.
+
+    Attributes
+    ----------
+    duration : `float`
+        How long (in seconds) the loop was held.
+    task : `str | None`
+        The task which was running, if any.
+    """
+
+    def __init__(self, duration: float, task: str | None = None) -> None:
+        self.duration: float = duration
+        self.task: str | None = task
+        super().__init__(
+            f"The event loop was blocked for {duration * 1000:.0f}ms"
+            + (f" by {task}" if task else "")
+        )
+
+
+class RateLimited(FIFIException, commands.CheckFailure, app_commands.CheckFailure):
+    """
+    A command was used more than its rate limits allow. It's a check failure of
+    both prefix and application commands.
+
+    Attributes
+    ----------
+    scope : `str`
+        The scope of the exhausted limit, ``user``, ``guild`` or ``global``.
+    retry_after : `float`
+        How long (in seconds) until the command can be used again.
+    """
+
+    def __init__(self, scope: str, retry_after: float) -> None:
+        self.scope: str = scope
+        self.retry_after: float = retry_after
+        super().__init__(f"Rate limited ({scope}), try again in {retry_after:.1f}s")
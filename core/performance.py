@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import json
+import asyncio
+import logging
+from typing import Any, Callable, Coroutine, TypeVar
+
+import aiohttp
+
+from .config import CONFIG
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
+
+
+__all__: tuple[str, ...] = ("run", "json_dumps", "create_connector")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+
+def _loop_factory() -> Callable[[], asyncio.AbstractEventLoop] | None:
+    if not (CONFIG.PERFORMANCE.enabled and CONFIG.PERFORMANCE.uvloop):
+        return None
+
+    if uvloop is None:
+        _log.warning("uvloop is not installed, using the default event loop.")
+        return None
+
+    return uvloop.new_event_loop
+
+
+def run(main: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion like :func:`asyncio.run`, on uvloop when the
+    performance profile asks for it and it's installed.
+
+    Parameters
+    ----------
+    main : `Coroutine[Any, Any, T]`
+        The coroutine to run.
+
+    Returns
+    -------
+    T
+        What the coroutine returned.
+    """
+    loop_factory = _loop_factory()
+    if loop_factory is None:
+        return asyncio.run(main)
+
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        _log.info("Running on uvloop")
+        return runner.run(main)
+
+
+def _orjson_dumps(value: Any) -> str:
+    # aiohttp wants text, orjson gives bytes.
+    return orjson.dumps(value).decode()  # type: ignore
+
+
+def json_dumps() -> Callable[[Any], str]:
+    """
+    Get the JSON serializer of the web client session.
+
+    The gateway and the Discord API already use orjson whenever it's installed,
+    this is for the requests made with :attr:`FIFIBot.session`.
+    """
+    if not CONFIG.PERFORMANCE.enabled:
+        return json.dumps
+
+    serializer = CONFIG.PERFORMANCE.json
+    if serializer in ("auto", "orjson") and orjson is not None:
+        return _orjson_dumps
+
+    if serializer == "orjson":
+        _log.warning("orjson is not installed, falling back to json.")
+    return json.dumps
+
+
+def create_connector(**overrides: Any) -> aiohttp.TCPConnector:
+    """
+    Create the connector of a web client session.
+
+    With the performance profile the pool is bounded per host, DNS answers are
+    cached and resolved without a thread when aiodns is installed, and idle
+    connections are kept alive for longer. Otherwise it's aiohttp's default.
+
+    Parameters
+    ----------
+    **overrides : `Any`
+        Arguments of :class:`aiohttp.TCPConnector` which take precedence over the profile.
+
+    Returns
+    -------
+    aiohttp.TCPConnector
+        A new connector, every session needs its own.
+    """
+    config = CONFIG.PERFORMANCE
+    if not config.enabled:
+        return aiohttp.TCPConnector(**overrides)
+
+    resolver: aiohttp.abc.AbstractResolver | None = None
+    if config.aiodns:
+        if aiodns is not None:
+            resolver = aiohttp.AsyncResolver()
+        else:
+            _log.warning("aiodns is not installed, resolving in a thread.")
+
+    options: dict[str, Any] = {
+        "limit": config.connector_limit,
+        "limit_per_host": config.connector_limit_per_host,
+        "ttl_dns_cache": config.dns_cache_ttl,
+        "keepalive_timeout": config.keepalive_timeout,
+        "resolver": resolver,
+    }
+    return aiohttp.TCPConnector(**{**options, **overrides})
@@ -1 +1,8 @@
-from .crud import create_pool, DatabaseProtocol
+from .crud import create_pool, setup_schemas, DatabaseProtocol, FIFIConnection
+from .queries import QUERIES, QueryRegistry, QueryStats
+from .codecs import JSONBCodec, get_jsonb_codec
+from .buffer import WriteBuffer, BufferedTable
+from .settings import GuildSettingsCache
+from .pool import AdaptivePool, PoolMetrics
+from .local import LocalDatabase, LocalConnection
+from .errors import ErrorStore
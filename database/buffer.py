@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Iterable, Mapping, Sequence
+
+if TYPE_CHECKING:
+    from .crud import DatabaseProtocol
+
+
+__all__: tuple[str, ...] = ("WriteBuffer", "BufferedTable")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# Postgres accepts at most this many parameters in one statement.
+MAX_PARAMETERS: int = 32767
+
+
+class BufferedTable:
+    """
+    The pending rows of a single table.
+
+    Tables without conflict columns are appended to and flushed with ``COPY``.
+    Tables with conflict columns coalesce rows with the same key in memory and
+    are flushed with a multi-row ``INSERT ... ON CONFLICT`` upsert.
+
+    Attributes
+    ----------
+    name : `str`
+        The name of the table.
+    columns : `tuple[str, ...]`
+        The columns of a row, in order.
+    conflict : `tuple[str, ...]`
+        The columns of the unique key rows are coalesced on.
+    increment : `tuple[str, ...]`
+        The columns which are summed when rows are coalesced or upserted.
+    preserve : `tuple[str, ...]`
+        The columns which keep their first value when rows are coalesced or upserted.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "name",
+        "columns",
+        "conflict",
+        "increment",
+        "preserve",
+        "rows",
+        "_key_index",
+        "_increment_index",
+        "_preserve_index",
+        "_query",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        columns: Sequence[str],
+        *,
+        conflict: Sequence[str] = (),
+        increment: Sequence[str] = (),
+        preserve: Sequence[str] = (),
+    ) -> None:
+        self.name: str = name
+        self.columns: tuple[str, ...] = tuple(columns)
+        self.conflict: tuple[str, ...] = tuple(conflict)
+        self.increment: tuple[str, ...] = tuple(increment)
+        self.preserve: tuple[str, ...] = tuple(preserve)
+
+        unknown = set(self.conflict + self.increment + self.preserve) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Unknown columns for table {name}: {', '.join(sorted(unknown))}")
+
+        self._key_index: tuple[int, ...] = tuple(self.columns.index(c) for c in self.conflict)
+        self._increment_index: tuple[int, ...] = tuple(self.columns.index(c) for c in self.increment)
+        self._preserve_index: tuple[int, ...] = tuple(self.columns.index(c) for c in self.preserve)
+        self._query: str | None = self._upsert_query() if self.conflict else None
+
+        self.rows: dict[tuple[Any, ...], list[Any]] | list[tuple[Any, ...]] = self._empty()
+
+    def _empty(self) -> dict[tuple[Any, ...], list[Any]] | list[tuple[Any, ...]]:
+        return {} if self.conflict else []
+
+    def _upsert_query(self) -> str:
+        updates = []
+        for column in self.columns:
+            if column in self.conflict or column in self.preserve:
+                continue
+            if column in self.increment:
+                updates.append(f"{column} = {self.name}.{column} + EXCLUDED.{column}")
+            else:
+                updates.append(f"{column} = EXCLUDED.{column}")
+
+        action = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+        return (
+            f"INSERT INTO {self.name} ({', '.join(self.columns)}) VALUES {{values}} "
+            f"ON CONFLICT ({', '.join(self.conflict)}) {action}"
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, row: tuple[Any, ...]) -> None:
+        if isinstance(self.rows, list):
+            self.rows.append(row)
+            return
+
+        key = tuple(row[i] for i in self._key_index)
+        pending = self.rows.get(key)
+        if pending is None:
+            self.rows[key] = list(row)
+            return
+
+        for i, value in enumerate(row):
+            if i in self._increment_index:
+                pending[i] += value
+            elif i not in self._preserve_index:
+                pending[i] = value
+
+    def requeue(self, rows: list[tuple[Any, ...]]) -> None:
+        """Put back rows which failed to be written, as older than the pending ones."""
+        if isinstance(self.rows, list):
+            self.rows[:0] = rows
+            return
+
+        for row in rows:
+            key = tuple(row[i] for i in self._key_index)
+            pending = self.rows.get(key)
+            if pending is None:
+                self.rows[key] = list(row)
+                continue
+
+            # the pending row is the newer one, only its counts and first values come from the failed one.
+            for i in self._increment_index:
+                pending[i] += row[i]
+            for i in self._preserve_index:
+                pending[i] = row[i]
+
+    def take(self) -> list[tuple[Any, ...]]:
+        """Take every pending row out of the buffer."""
+        rows, self.rows = self.rows, self._empty()
+        if isinstance(rows, dict):
+            return [tuple(row) for row in rows.values()]
+        return rows
+
+    async def write(self, db: DatabaseProtocol, rows: list[tuple[Any, ...]]) -> None:
+        async with db.acquire() as con:
+            if self._query is None:
+                await con.copy_records_to_table(
+                    self.name, records=rows, columns=self.columns
+                )
+                return
+
+            width = len(self.columns)
+            per_statement = MAX_PARAMETERS // width
+            async with con.transaction():
+                for start in range(0, len(rows), per_statement):
+                    chunk = rows[start : start + per_statement]
+                    values = ", ".join(
+                        "(" + ", ".join(f"${r * width + c + 1}" for c in range(width)) + ")"
+                        for r in range(len(chunk))
+                    )
+                    args = [value for row in chunk for value in row]
+                    await con.execute(self._query.format(values=values), *args)
+
+
+class WriteBuffer:
+    """
+    A write-behind buffer which batches rows per table and writes them in bulk.
+
+    Rows are flushed when a table holds ``max_rows`` rows, every ``interval``
+    seconds and when the buffer is closed.
+
+    Attributes
+    ----------
+    db: `DatabaseProtocol`
+        The database the rows are written to.
+    max_rows: `int`
+        The number of pending rows of a table which triggers a flush.
+    interval: `float`
+        How often (in seconds) every table is flushed.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "db",
+        "max_rows",
+        "interval",
+        "_tables",
+        "_task",
+        "_flushing",
+        "_closed",
+    )
+
+    def __init__(
+        self, db: DatabaseProtocol, *, max_rows: int = 500, interval: float = 5.0
+    ) -> None:
+        self.db: DatabaseProtocol = db
+        self.max_rows: int = max_rows
+        self.interval: float = interval
+
+        self._tables: dict[str, BufferedTable] = {}
+        self._task: asyncio.Task[None] | None = None
+        self._flushing: dict[str, asyncio.Task[None]] = {}
+        self._closed: bool = False
+
+    def register(
+        self,
+        table: str,
+        columns: Sequence[str],
+        *,
+        conflict: Sequence[str] = (),
+        increment: Sequence[str] = (),
+        preserve: Sequence[str] = (),
+    ) -> BufferedTable:
+        """
+        Register a table rows can be enqueued for.
+
+        Parameters
+        ----------
+        table : `str`
+            The name of the table.
+        columns : `Sequence[str]`
+            The columns of a row, in order.
+        conflict : `Sequence[str]`
+            The unique key to coalesce and upsert rows on. Without one rows are copied as is.
+        increment : `Sequence[str]`
+            The columns which are added up instead of overwritten, e.g. counters.
+        preserve : `Sequence[str]`
+            The columns which keep their first written value, e.g. a creation time.
+
+        Returns
+        -------
+        BufferedTable
+            The buffered table.
+        """
+        if table in self._tables:
+            return self._tables[table]
+
+        buffered = BufferedTable(
+            table, columns, conflict=conflict, increment=increment, preserve=preserve
+        )
+        self._tables[table] = buffered
+        return buffered
+
+    def enqueue(self, table: str, row: Sequence[Any] | Mapping[str, Any]) -> None:
+        """
+        Enqueue a row to be written to a table.
+
+        Parameters
+        ----------
+        table : `str`
+            The name of a registered table.
+        row : `Sequence[Any] | Mapping[str, Any]`
+            The values of the row, in column order or keyed by column.
+
+        Raises
+        ------
+        RuntimeError
+            The buffer is closed.
+        KeyError
+            The table isn't registered.
+        """
+        if self._closed:
+            raise RuntimeError("Cannot enqueue rows to a closed write buffer.")
+
+        buffered = self._tables[table]
+        if isinstance(row, Mapping):
+            row = tuple(row[column] for column in buffered.columns)
+        buffered.add(tuple(row))
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        if len(buffered) >= self.max_rows:
+            self._schedule(buffered)
+
+    def enqueue_many(self, table: str, rows: Iterable[Sequence[Any] | Mapping[str, Any]]) -> None:
+        """Enqueue several rows to be written to a table."""
+        for row in rows:
+            self.enqueue(table, row)
+
+    def _schedule(self, buffered: BufferedTable) -> asyncio.Task[None]:
+        # writes run in their own task so cancelling whoever waits on them can't lose rows midway.
+        task = self._flushing.get(buffered.name)
+        if task is None:
+            task = asyncio.create_task(self._flush_table(buffered))
+            self._flushing[buffered.name] = task
+        return task
+
+    async def _flush_table(self, buffered: BufferedTable) -> None:
+        try:
+            rows = buffered.take()
+            if not rows:
+                return
+
+            try:
+                await buffered.write(self.db, rows)
+            except Exception:
+                if self._closed or len(buffered) + len(rows) > self.max_rows * 10:
+                    _log.exception(f"Dropped {len(rows)} rows for {buffered.name}")
+                    return
+
+                _log.exception(f"Failed to flush {len(rows)} rows for {buffered.name}, retrying later")
+                buffered.requeue(rows)
+        finally:
+            self._flushing.pop(buffered.name, None)
+
+    async def flush(self, table: str | None = None) -> None:
+        """
+        Write the pending rows now.
+
+        Parameters
+        ----------
+        table : `str | None`
+            The table to flush, every table if not given.
+        """
+        tables = [self._tables[table]] if table else list(self._tables.values())
+        await asyncio.gather(*(self._flush_one(buffered) for buffered in tables))
+
+    async def _flush_one(self, buffered: BufferedTable) -> None:
+        # a running write only covers the rows it took, the ones enqueued since need another.
+        running = self._flushing.get(buffered.name)
+        if running is not None:
+            await asyncio.shield(running)
+
+        if len(buffered):
+            await asyncio.shield(self._schedule(buffered))
+
+    async def _run(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        """Stop accepting rows and write everything still pending."""
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        await self.flush()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Callable, Literal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+__all__: tuple[str, ...] = ("JSONBCodec", "RawJSON", "get_jsonb_codec", "dumps", "loads", "decoded")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# The first byte of a jsonb value in binary format is the version of the format.
+JSONB_VERSION: bytes = b"\x01"
+
+
+def _std_dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)  # type: ignore
+
+
+SERIALIZERS: dict[str, tuple[Callable[[Any], bytes], Callable[[bytes | str], Any]]] = {
+    "json": (_std_dumps, json.loads),
+}
+if orjson is not None:
+    SERIALIZERS["orjson"] = (_orjson_dumps, orjson.loads)
+
+
+def _resolve(serializer: str) -> str:
+    if serializer == "auto":
+        return "orjson" if "orjson" in SERIALIZERS else "json"
+
+    if serializer not in SERIALIZERS:
+        _log.warning(f"JSON serializer {serializer!r} is not available, falling back to json.")
+        return "json"
+
+    return serializer
+
+
+# Used to decode values returned in raw mode.
+dumps, loads = SERIALIZERS[_resolve("auto")]
+
+
+class RawJSON(bytes):
+    """The JSON bytes of a jsonb value returned by a codec in raw mode."""
+
+    __slots__: tuple[str, ...] = ()
+
+
+def decoded(value: Any) -> Any:
+    """Decode a jsonb value if a codec returned it raw, values it decoded are returned as is."""
+    if isinstance(value, RawJSON):
+        # orjson only takes exact bytes, not a subclass of them.
+        return loads(bytes(value))
+    return value
+
+
+class JSONBCodec:
+    """
+    A jsonb codec to register on every connection of the pool.
+
+    Attributes
+    ----------
+    serializer : `str`
+        The name of the JSON library in use.
+    format : `Literal["text", "binary"]`
+        The wire format of the jsonb values.
+    raw : `bool`
+        Whether decoding is skipped and values are returned as `RawJSON` bytes, to be
+        decoded lazily with :func:`decoded`.
+    """
+
+    __slots__: tuple[str, ...] = ("serializer", "format", "raw", "encoder", "decoder")
+
+    def __init__(
+        self,
+        serializer: str = "auto",
+        format: Literal["text", "binary"] = "binary",
+        raw: bool = False,
+    ) -> None:
+        self.serializer: str = _resolve(serializer)
+        # raw bytes only make sense on the binary format, text would have to be encoded again.
+        self.format: Literal["text", "binary"] = "binary" if raw else format
+        self.raw: bool = raw
+
+        _dumps, _loads = SERIALIZERS[self.serializer]
+
+        if self.format == "text":
+            self.encoder: Callable[[Any], Any] = lambda value: _dumps(value).decode()
+            self.decoder: Callable[[Any], Any] = _loads
+        else:
+            self.encoder = lambda value: JSONB_VERSION + _dumps(value)
+            if raw:
+                self.decoder = lambda data: RawJSON(memoryview(data)[1:])
+            else:
+                self.decoder = lambda data: _loads(data[1:])
+
+    async def register(self, connection: Any) -> None:
+        """
+        Register the codec on a connection.
+
+        Parameters
+        ----------
+        connection : `asyncpg.Connection`
+            The connection to register the codec on.
+        """
+        await connection.set_type_codec(
+            "jsonb",
+            schema="pg_catalog",
+            encoder=self.encoder,
+            decoder=self.decoder,
+            format=self.format,
+        )
+
+    def __repr__(self) -> str:
+        return f"<JSONBCodec serializer={self.serializer} format={self.format} raw={self.raw}>"
+
+
+def get_jsonb_codec(
+    serializer: str = "auto", format: str = "binary", raw: bool = False
+) -> JSONBCodec:
+    """
+    Get a jsonb codec, falling back to what's available.
+
+    Parameters
+    ----------
+    serializer : `str`
+        The JSON library to use, ``auto`` picks the fastest one installed.
+    format : `str`
+        The wire format, ``text`` or ``binary``.
+    raw : `bool`
+        Whether to return the raw JSON bytes instead of decoded values.
+
+    Returns
+    -------
+    JSONBCodec
+        The codec.
+    """
+    if format not in ("text", "binary"):
+        _log.warning(f"Unknown jsonb format {format!r}, falling back to binary.")
+        format = "binary"
+
+    return JSONBCodec(serializer, format, raw)  # type: ignore
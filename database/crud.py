@@ -1,17 +1,51 @@
 from __future__ import annotations
 
-import json
 import asyncpg
 from typing import TYPE_CHECKING, Protocol, Any
 
+from .codecs import JSONBCodec, get_jsonb_codec
+from .queries import QUERIES, QueryRegistry
+
 if TYPE_CHECKING:
+    from pathlib import Path
     from types import TracebackType
 
 
-__all__: tuple[str, ...] = ("create_pool", "DatabaseProtocol")
+__all__: tuple[str, ...] = ("create_pool", "setup_schemas", "DatabaseProtocol", "FIFIConnection")
+
 
+class FIFIConnection(asyncpg.Connection):
+    """
+    A connection which can keep queries prepared ahead of their first call.
+    """
 
-async def create_pool(dsn: str, size: int = 20) -> asyncpg.Pool:
+    __slots__: tuple[str, ...] = ()
+
+    async def cache_statement(self, query: str) -> None:
+        """
+        Prepare a query and keep it in this connection's statement cache, so
+        calling it later with ``execute``/``fetch``/``fetchrow`` doesn't parse it again.
+
+        Parameters
+        ----------
+        query : `str`
+            The query to prepare.
+        """
+        # ``prepare()`` skips the statement cache, and the statement it returns can't
+        # be used once the connection went back to the pool. The cache outlives that.
+        await self._get_statement(query, None, use_cache=True)
+
+
+async def create_pool(
+    dsn: str,
+    min_size: int = 2,
+    max_size: int = 20,
+    *,
+    command_timeout: float = 30.0,
+    idle_lifetime: float = 120.0,
+    registry: QueryRegistry = QUERIES,
+    jsonb_codec: JSONBCodec | None = None,
+) -> asyncpg.Pool:
     """
     Create a pool of connections to the database.
 
@@ -19,38 +53,67 @@ async def create_pool(dsn: str, size: int = 20) -> asyncpg.Pool:
     ----------
     dsn : str
         The database connection string.
-    size : int, optional
-        The size of the pool, by default 20
+    min_size : int, optional
+        The number of connections kept open, by default 2
+    max_size : int, optional
+        The maximum number of connections, by default 20
+    command_timeout : float, optional
+        The default timeout (in seconds) of a query, by default 30
+    idle_lifetime : float, optional
+        How long (in seconds) any connection is kept open while idle, the minimum included, by default 120
+    registry : QueryRegistry, optional
+        The registry whose queries are prepared on every connection, by default the shared one.
+    jsonb_codec : JSONBCodec | None, optional
+        The codec used for jsonb values, by default the fastest one available in binary format.
 
     Returns
     -------
     asyncpg.Pool
         The pool of connections to the database.
     """
-    def _encode_jsonb(value):
-        return json.dumps(value)
-
-    def _decode_jsonb(value):
-        return json.loads(value)
+    codec = jsonb_codec or get_jsonb_codec()
 
     async def init(con):
-        await con.set_type_codec(
-            "jsonb",
-            schema="pg_catalog",
-            encoder=_encode_jsonb,
-            decoder=_decode_jsonb,
-            format="text",
-        )
+        await codec.register(con)
+        await registry.prepare(con)
+        # preparing leaves the statements' implicit transaction open, along with its
+        # locks on the tables, until the next query ends it.
+        await con.execute("SELECT 1")
 
     return await asyncpg.create_pool(
         dsn=dsn,
         init=init,
-        command_timeout=300,
-        max_size=size,
-        min_size=size,
+        connection_class=FIFIConnection,
+        # keep the prepared named queries for the connection's lifetime, along with room for the rest.
+        statement_cache_size=len(registry.queries) + 100,
+        max_cached_statement_lifetime=0,
+        command_timeout=command_timeout,
+        max_size=max_size,
+        min_size=min_size,
+        max_inactive_connection_lifetime=idle_lifetime,
     )
 
 
+async def setup_schemas(dsn: str, *schemas: Path) -> None:
+    """
+    Create the tables of the given schema files. This is meant to run before the
+    pool is created, so its connections can prepare the queries on them.
+
+    Parameters
+    ----------
+    dsn : str
+        The database connection string.
+    *schemas : Path
+        The SQL files to run.
+    """
+    con = await asyncpg.connect(dsn)
+    try:
+        for schema in schemas:
+            await con.execute(schema.read_text())
+    finally:
+        await con.close()
+
+
 class ConnectionContextManager(Protocol):
     """
     A protocol for a context manager to manage a connection to the database.
@@ -83,4 +146,4 @@ class DatabaseProtocol(Protocol):
 
     def acquire(self, *, timeout: float | None = None) -> ConnectionContextManager: ...
 
-    def release(self, connection: asyncpg.Connection) -> None: ...
+    async def release(self, connection: asyncpg.Connection) -> None: ...
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import logging
+import datetime
+from typing import TYPE_CHECKING, Any
+
+from .queries import QUERIES
+
+if TYPE_CHECKING:
+    from .buffer import WriteBuffer
+
+
+__all__: tuple[str, ...] = ("ErrorStore",)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+TOP_ERRORS = QUERIES.register(
+    "errors.top",
+    "SELECT o.fingerprint, r.name, SUM(o.occurrences) AS occurrences, "
+    "COUNT(DISTINCT NULLIF(o.guild_id, 0)) AS guilds, r.first_seen, r.last_seen, r.last_command "
+    "FROM error_occurrences o JOIN error_reports r ON r.fingerprint = o.fingerprint "
+    "WHERE o.minute >= $1 "
+    "GROUP BY o.fingerprint, r.name, r.first_seen, r.last_seen, r.last_command "
+    "ORDER BY occurrences DESC LIMIT $2",
+)
+GET_ERROR = QUERIES.register(
+    "errors.get",
+    "SELECT * FROM error_reports WHERE fingerprint = $1",
+)
+# Keyset pagination over the occurrences of an error, the latest first.
+OCCURRENCES_FIRST = QUERIES.register(
+    "errors.occurrences.first",
+    "SELECT minute, command, guild_id, occurrences FROM error_occurrences WHERE fingerprint = $1 "
+    "ORDER BY minute DESC, command DESC, guild_id DESC LIMIT $2",
+)
+OCCURRENCES_AFTER = QUERIES.register(
+    "errors.occurrences.after",
+    "SELECT minute, command, guild_id, occurrences FROM error_occurrences WHERE fingerprint = $1 "
+    "AND (minute, command, guild_id) < ($2, $3, $4) "
+    "ORDER BY minute DESC, command DESC, guild_id DESC LIMIT $5",
+)
+PRUNE_OCCURRENCES = QUERIES.register(
+    "errors.prune",
+    "DELETE FROM error_occurrences WHERE minute < $1",
+)
+
+
+class ErrorStore:
+    """
+    Persists error occurrences through the write buffer.
+
+    Every error has a row in ``error_reports`` holding its traceback and totals,
+    and its occurrences are counted per minute, command and guild in
+    ``error_occurrences`` so rates can be queried over any window.
+
+    Attributes
+    ----------
+    buffer: `WriteBuffer`
+        The buffer the rows are written through.
+    retention: `datetime.timedelta`
+        How long the per minute counts are kept.
+    """
+
+    __slots__: tuple[str, ...] = ("buffer", "retention")
+
+    def __init__(
+        self, buffer: WriteBuffer, *, retention: datetime.timedelta = datetime.timedelta(days=14)
+    ) -> None:
+        self.buffer: WriteBuffer = buffer
+        self.retention: datetime.timedelta = retention
+
+        buffer.register(
+            "error_reports",
+            (
+                "fingerprint",
+                "name",
+                "traceback",
+                "occurrences",
+                "first_seen",
+                "last_seen",
+                "last_command",
+                "last_guild_id",
+            ),
+            conflict=("fingerprint",),
+            increment=("occurrences",),
+            preserve=("name", "traceback", "first_seen"),
+        )
+        buffer.register(
+            "error_occurrences",
+            ("fingerprint", "minute", "command", "guild_id", "occurrences"),
+            conflict=("fingerprint", "minute", "command", "guild_id"),
+            increment=("occurrences",),
+        )
+
+    def record(
+        self,
+        fingerprint: str,
+        name: str,
+        traceback: str,
+        *,
+        time: datetime.datetime,
+        command: str | None = None,
+        guild_id: int | None = None,
+    ) -> None:
+        """
+        Record an occurrence of an error, written with the next flush of the buffer.
+
+        Parameters
+        ----------
+        fingerprint: `str`
+            The fingerprint of the error.
+        name: `str`
+            The name of the error type.
+        traceback: `str`
+            The formatted traceback, only stored the first time the error is seen.
+        time: `datetime.datetime`
+            When the error occurred.
+        command: `str | None`
+            The command the error occurred in, if any.
+        guild_id: `int | None`
+            The guild the error occurred in, if any.
+        """
+        command, guild_id = command or "", guild_id or 0
+        self.buffer.enqueue(
+            "error_reports",
+            (fingerprint, name, traceback, 1, time, time, command, guild_id),
+        )
+        self.buffer.enqueue(
+            "error_occurrences",
+            (fingerprint, time.replace(second=0, microsecond=0), command, guild_id, 1),
+        )
+
+    async def top(self, *, window: datetime.timedelta, limit: int = 10) -> list[Any]:
+        """
+        Get the errors which occurred the most over a window.
+
+        Parameters
+        ----------
+        window: `datetime.timedelta`
+            How far back to count the occurrences.
+        limit: `int`
+            The maximum number of errors to get.
+
+        Returns
+        -------
+        list[Any]
+            The rows, most occurrences first.
+        """
+        # what's still buffered is part of the answer.
+        await self.flush()
+
+        since = datetime.datetime.now(datetime.timezone.utc) - window
+        return await QUERIES.fetch(self.buffer.db, TOP_ERRORS, since, limit)
+
+    async def flush(self) -> None:
+        """Write out the occurrences still buffered."""
+        await self.buffer.flush("error_occurrences")
+        await self.buffer.flush("error_reports")
+
+    async def get(self, fingerprint: str) -> Any | None:
+        """Get the stored report of an error."""
+        await self.buffer.flush("error_reports")
+        return await QUERIES.fetchrow(self.buffer.db, GET_ERROR, fingerprint)
+
+    async def prune(self) -> None:
+        """Delete the per minute counts older than the retention."""
+        before = datetime.datetime.now(datetime.timezone.utc) - self.retention
+        await QUERIES.execute(self.buffer.db, PRUNE_OCCURRENCES, before)
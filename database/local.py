@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import re
+import json
+import asyncio
+import logging
+import sqlite3
+import datetime
+import itertools
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Generator, Iterable, Sequence
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+
+__all__: tuple[str, ...] = ("LocalDatabase", "LocalConnection")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# Rewrites the Postgres flavoured SQL used by the bot into SQLite.
+TRANSLATIONS: list[tuple[re.Pattern[str], str]] = [
+    # numbered parameters, $1 -> ?1
+    (re.compile(r"\$(\d+)"), r"?\1"),
+    # type casts, $1::bigint -> $1
+    (re.compile(r"::[a-zA-Z_]+(\[\])?"), ""),
+    # jsonb concatenation, a.settings || EXCLUDED.settings -> json_patch(...)
+    (re.compile(r"(\w+\.\w+)\s*\|\|\s*(EXCLUDED\.\w+)", re.IGNORECASE), r"json_patch(\1, \2)"),
+    # now() -> CURRENT_TIMESTAMP
+    (re.compile(r"\bnow\(\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+    # LEAST(a, b) -> MIN(a, b), scalar with several arguments
+    (re.compile(r"\bLEAST\(", re.IGNORECASE), "MIN("),
+    (re.compile(r"\bGREATEST\(", re.IGNORECASE), "MAX("),
+]
+
+# Values of columns declared with these types are decoded when read.
+sqlite3.register_converter("JSONB", json.loads)
+sqlite3.register_converter("JSON", json.loads)
+sqlite3.register_converter(
+    "TIMESTAMPTZ", lambda value: datetime.datetime.fromisoformat(value.decode())
+)
+
+
+def _adapt(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+class _Transaction:
+    __slots__: tuple[str, ...] = ("connection",)
+
+    def __init__(self, connection: LocalConnection) -> None:
+        self.connection: LocalConnection = connection
+
+    async def __aenter__(self) -> None:
+        await self.connection._db._begin(self.connection)
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.connection._db._end(self.connection, commit=exc_type is None)
+
+
+class LocalConnection:
+    """
+    A connection to a :class:`LocalDatabase`, mimicking the parts of
+    ``asyncpg.Connection`` the bot uses.
+    """
+
+    __slots__: tuple[str, ...] = ("_db", "_con", "_listeners", "_notifications")
+
+    def __init__(self, db: LocalDatabase, con: sqlite3.Connection) -> None:
+        self._db: LocalDatabase = db
+        self._con: sqlite3.Connection = con
+        self._listeners: dict[str, list[Callable[..., Any]]] = {}
+        self._notifications: list[tuple[str, str]] = []
+
+        con.create_function("pg_notify", 2, self._notify)
+        con.create_function("pg_sleep", 1, lambda _: None)
+
+    def _notify(self, channel: str, payload: str) -> None:
+        self._notifications.append((channel, payload))
+
+    async def _run(self, query: str, args: Sequence[Any]) -> sqlite3.Cursor:
+        await self._db._wait_turn(self)
+        if self._db.latency:
+            await asyncio.sleep(self._db.latency)
+
+        cursor = self._con.execute(self._db.translate(query), [_adapt(a) for a in args])
+        if not self._con.in_transaction:
+            self._db._deliver(self)
+        return cursor
+
+    @staticmethod
+    def _status(query: str, cursor: sqlite3.Cursor, rows: int | None = None) -> str:
+        verb = query.lstrip().split(None, 1)[0].upper()
+        count = cursor.rowcount if rows is None else rows
+        if verb == "INSERT":
+            return f"INSERT 0 {count}"
+        if verb in ("UPDATE", "DELETE", "SELECT"):
+            return f"{verb} {count}"
+        return verb
+
+    async def execute(self, query: str, *args: Any, timeout: float | None = None) -> str:
+        if not args and ";" in query.strip().rstrip(";"):
+            # several statements without arguments, like a schema file.
+            await self._db._wait_turn(self)
+            self._con.executescript(self._db.translate(query))
+            return "OK"
+
+        cursor = await self._run(query, args)
+        rows = len(cursor.fetchall()) if cursor.description else None
+        return self._status(query, cursor, rows)
+
+    async def executemany(self, query: str, args: Iterable[Sequence[Any]], *, timeout: float | None = None) -> None:
+        await self._db._wait_turn(self)
+        self._con.executemany(
+            self._db.translate(query), ([_adapt(a) for a in row] for row in args)
+        )
+
+    async def fetch(self, query: str, *args: Any, timeout: float | None = None) -> list[sqlite3.Row]:
+        cursor = await self._run(query, args)
+        return cursor.fetchall()
+
+    async def fetchrow(self, query: str, *args: Any, timeout: float | None = None) -> sqlite3.Row | None:
+        cursor = await self._run(query, args)
+        return cursor.fetchone()
+
+    async def fetchval(
+        self, query: str, *args: Any, column: int = 0, timeout: float | None = None
+    ) -> Any:
+        row = await self.fetchrow(query, *args)
+        return None if row is None else row[column]
+
+    async def copy_records_to_table(
+        self,
+        table_name: str,
+        *,
+        records: Iterable[Sequence[Any]],
+        columns: Sequence[str],
+        timeout: float | None = None,
+    ) -> str:
+        placeholders = ", ".join("?" for _ in columns)
+        await self.executemany(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})",
+            records,
+        )
+        return "COPY"
+
+    def transaction(self) -> _Transaction:
+        return _Transaction(self)
+
+    async def add_listener(self, channel: str, callback: Callable[..., Any]) -> None:
+        self._listeners.setdefault(channel, []).append(callback)
+
+    async def remove_listener(self, channel: str, callback: Callable[..., Any]) -> None:
+        callbacks = self._listeners.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def add_termination_listener(self, callback: Callable[..., Any]) -> None:
+        # an in-process connection is never lost.
+        pass
+
+
+class _AcquireContext:
+    __slots__: tuple[str, ...] = ("db", "connection")
+
+    def __init__(self, db: LocalDatabase) -> None:
+        self.db: LocalDatabase = db
+        self.connection: LocalConnection | None = None
+
+    async def __aenter__(self) -> LocalConnection:
+        self.connection = self.db._connect()
+        return self.connection
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            await self.db.release(connection)
+
+    def __await__(self) -> Generator[Any, None, LocalConnection]:
+        yield from ()
+        return self.db._connect()
+
+
+class LocalDatabase:
+    """
+    An in-process database backed by SQLite, for tests and benchmarks which
+    shouldn't need a Postgres server. It satisfies :class:`DatabaseProtocol`.
+
+    Queries are written for Postgres, the subset the bot uses (numbered parameters,
+    casts, jsonb merging, ``pg_notify`` and ``LISTEN``) is translated or emulated.
+    Statements run on the event loop, which is fine for an in-memory database.
+
+    Attributes
+    ----------
+    path: `str`
+        The SQLite database file, ``:memory:`` for a database living in this process only.
+    latency: `float`
+        An artificial delay (in seconds) added to every statement, to mimic a network round trip.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "path",
+        "latency",
+        "_uri",
+        "_keepalive",
+        "_connections",
+        "_owner",
+        "_turn",
+        "_translated",
+    )
+
+    _ids = itertools.count()
+
+    def __init__(self, path: str = ":memory:", *, latency: float = 0.0) -> None:
+        self.path: str = path
+        self.latency: float = latency
+
+        if path == ":memory:":
+            # every connection shares the same named in-memory database.
+            self._uri: str = f"file:fifi-{next(self._ids)}?mode=memory&cache=shared"
+        else:
+            self._uri = Path(path).resolve().as_uri()
+
+        self._connections: set[LocalConnection] = set()
+        self._owner: LocalConnection | None = None
+        self._turn: asyncio.Condition | None = None
+        self._translated: dict[str, str] = {}
+        # an in-memory database is gone as soon as its last connection closes.
+        self._keepalive: sqlite3.Connection = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        con = sqlite3.connect(
+            self._uri,
+            uri=True,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        con.row_factory = sqlite3.Row
+        return con
+
+    def translate(self, query: str) -> str:
+        """Translate a Postgres query to SQLite."""
+        translated = self._translated.get(query)
+        if translated is None:
+            translated = query
+            for pattern, replacement in TRANSLATIONS:
+                translated = pattern.sub(replacement, translated)
+            self._translated[query] = translated
+
+        return translated
+
+    def _connect(self) -> LocalConnection:
+        connection = LocalConnection(self, self._open())
+        self._connections.add(connection)
+        return connection
+
+    async def _wait_turn(self, connection: LocalConnection) -> None:
+        # SQLite has one writer, statements of other connections wait for a transaction to end.
+        if self._owner is None or self._owner is connection:
+            return
+
+        if self._turn is None:
+            self._turn = asyncio.Condition()
+        async with self._turn:
+            await self._turn.wait_for(lambda: self._owner is None)
+
+    async def _begin(self, connection: LocalConnection) -> None:
+        await self._wait_turn(connection)
+        self._owner = connection
+        connection._con.execute("BEGIN")
+
+    async def _end(self, connection: LocalConnection, *, commit: bool) -> None:
+        connection._con.execute("COMMIT" if commit else "ROLLBACK")
+        if commit:
+            self._deliver(connection)
+        else:
+            connection._notifications.clear()
+
+        self._owner = None
+        if self._turn is not None:
+            async with self._turn:
+                self._turn.notify_all()
+
+    def _deliver(self, sender: LocalConnection) -> None:
+        notifications, sender._notifications = sender._notifications, []
+        loop = asyncio.get_running_loop()
+        for channel, payload in notifications:
+            for connection in self._connections:
+                for callback in connection._listeners.get(channel, ()):
+                    loop.call_soon(callback, connection, 0, channel, payload)
+
+    async def setup(self, *schemas: Path) -> None:
+        """
+        Create the tables of the given schema files.
+
+        Parameters
+        ----------
+        *schemas : `Path`
+            The SQL files to run.
+        """
+        async with self.acquire() as con:
+            for schema in schemas:
+                await con.execute(schema.read_text())
+
+    def acquire(self, *, timeout: float | None = None) -> _AcquireContext:
+        return _AcquireContext(self)
+
+    async def release(self, connection: LocalConnection) -> None:
+        if connection is self._owner:
+            await self._end(connection, commit=False)
+
+        self._connections.discard(connection)
+        connection._con.close()
+
+    async def execute(self, query: str, *args: Any, timeout: float | None = None) -> str:
+        async with self.acquire() as con:
+            return await con.execute(query, *args)
+
+    async def executemany(self, query: str, args: Iterable[Sequence[Any]], *, timeout: float | None = None) -> None:
+        async with self.acquire() as con:
+            return await con.executemany(query, args)
+
+    async def fetch(self, query: str, *args: Any, timeout: float | None = None) -> list[sqlite3.Row]:
+        async with self.acquire() as con:
+            return await con.fetch(query, *args)
+
+    async def fetchrow(self, query: str, *args: Any, timeout: float | None = None) -> sqlite3.Row | None:
+        async with self.acquire() as con:
+            return await con.fetchrow(query, *args)
+
+    async def fetchval(
+        self, query: str, *args: Any, column: int = 0, timeout: float | None = None
+    ) -> Any:
+        async with self.acquire() as con:
+            return await con.fetchval(query, *args, column=column)
+
+    async def close(self) -> None:
+        for connection in list(self._connections):
+            await self.release(connection)
+        self._keepalive.close()
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import TYPE_CHECKING, Any, Generator
+
+import asyncpg
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+
+__all__: tuple[str, ...] = ("AdaptivePool", "PoolMetrics")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """
+    Saturation metrics of a pool.
+
+    Attributes
+    ----------
+    acquires : `int`
+        How many connections were handed out.
+    timeouts : `int`
+        How many acquires gave up waiting for a connection.
+    wait_total : `float`
+        The total time (in seconds) spent waiting for a connection.
+    wait_max : `float`
+        The longest time (in seconds) spent waiting for a connection.
+    in_use : `int`
+        How many connections are currently handed out.
+    peak_in_use : `int`
+        The most connections handed out at once since the last resize decision.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "acquires",
+        "timeouts",
+        "wait_total",
+        "wait_max",
+        "in_use",
+        "peak_in_use",
+        "_waits",
+    )
+
+    def __init__(self, samples: int = 512) -> None:
+        self.acquires: int = 0
+        self.timeouts: int = 0
+        self.wait_total: float = 0.0
+        self.wait_max: float = 0.0
+        self.in_use: int = 0
+        self.peak_in_use: int = 0
+        self._waits: deque[float] = deque(maxlen=samples)
+
+    def record_wait(self, elapsed: float) -> None:
+        self.acquires += 1
+        self.wait_total += elapsed
+        self.wait_max = max(self.wait_max, elapsed)
+        self._waits.append(elapsed)
+
+    def reset_window(self) -> tuple[float, int]:
+        """
+        Start a new sampling window.
+
+        Returns
+        -------
+        tuple[float, int]
+            The p95 acquire wait and the peak of connections in use during the last window.
+        """
+        waiting, peak = self.wait_percentile(95), self.peak_in_use
+        self._waits.clear()
+        self.peak_in_use = self.in_use
+        return waiting, peak
+
+    def wait_percentile(self, q: float) -> float:
+        """Get a percentile (in seconds) of the most recent acquire waits."""
+        if not self._waits:
+            return 0.0
+
+        waits = sorted(self._waits)
+        return waits[min(len(waits) - 1, int(len(waits) * q / 100))]
+
+    def __repr__(self) -> str:
+        return (
+            f"<PoolMetrics acquires={self.acquires} timeouts={self.timeouts} "
+            f"in_use={self.in_use} wait_p95={self.wait_percentile(95):.4f}>"
+        )
+
+
+class _AcquireContext:
+    __slots__: tuple[str, ...] = ("pool", "timeout", "connection")
+
+    def __init__(self, pool: AdaptivePool, timeout: float | None) -> None:
+        self.pool: AdaptivePool = pool
+        self.timeout: float | None = timeout
+        self.connection: asyncpg.Connection | None = None
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        self.connection = await self.pool._acquire(self.timeout)
+        return self.connection
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            await self.pool.release(connection)
+
+    def __await__(self) -> Generator[Any, None, asyncpg.Connection]:
+        return self.pool._acquire(self.timeout).__await__()
+
+
+class AdaptivePool:
+    """
+    A wrapper around an asyncpg pool which sizes it by how long acquires wait.
+
+    asyncpg opens connections on demand up to its maximum size and closes the
+    ones left idle. This keeps a soft limit on the connections handed out
+    between the pool's minimum and maximum size. The limit grows when acquires
+    wait longer than ``target_wait`` and shrinks when it's mostly unused, so a
+    burst doesn't open every connection the pool is allowed to have at once.
+
+    Attributes
+    ----------
+    pool: `asyncpg.Pool`
+        The wrapped pool.
+    target_wait: `float`
+        The acquire wait (in seconds) above which the limit grows.
+    acquire_timeout: `float | None`
+        How long (in seconds) an acquire waits for a connection by default.
+    command_timeout: `float | None`
+        How long (in seconds) a query can run by default.
+    metrics: `PoolMetrics`
+        The saturation metrics of the pool.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "pool",
+        "target_wait",
+        "acquire_timeout",
+        "command_timeout",
+        "metrics",
+        "_limit",
+        "_condition",
+        "_task",
+    )
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        target_wait: float = 0.05,
+        acquire_timeout: float | None = 10.0,
+        command_timeout: float | None = 30.0,
+        resize_interval: float = 10.0,
+    ) -> None:
+        self.pool: asyncpg.Pool = pool
+        self.target_wait: float = target_wait
+        self.acquire_timeout: float | None = acquire_timeout
+        self.command_timeout: float | None = command_timeout
+        self.metrics: PoolMetrics = PoolMetrics()
+
+        self._limit: int = pool.get_min_size() or 1
+        self._condition: asyncio.Condition = asyncio.Condition()
+        self._task: asyncio.Task[None] = asyncio.create_task(self._resize(resize_interval))
+
+    @property
+    def limit(self) -> int:
+        """The number of connections that can currently be handed out at once."""
+        return self._limit
+
+    def get_size(self) -> int:
+        """The number of connections open in the pool."""
+        return self.pool.get_size()
+
+    def get_idle_size(self) -> int:
+        """The number of open connections that aren't handed out."""
+        return self.pool.get_idle_size()
+
+    def get_min_size(self) -> int:
+        return self.pool.get_min_size()
+
+    def get_max_size(self) -> int:
+        return self.pool.get_max_size()
+
+    async def _acquire(self, timeout: float | None) -> asyncpg.Connection:
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.perf_counter()
+        try:
+            async with self._condition:
+                await asyncio.wait_for(
+                    self._condition.wait_for(lambda: self.metrics.in_use < self._limit),
+                    timeout,
+                )
+                self.metrics.in_use += 1
+
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - started))
+            try:
+                connection = await self.pool.acquire(timeout=remaining)
+            except BaseException:
+                await self._put_back()
+                raise
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            _log.warning(
+                f"Timed out acquiring a connection ({self.metrics.in_use}/{self._limit} in use)"
+            )
+            raise
+
+        self.metrics.record_wait(time.perf_counter() - started)
+        self.metrics.peak_in_use = max(self.metrics.peak_in_use, self.metrics.in_use)
+        return connection
+
+    async def _put_back(self) -> None:
+        async with self._condition:
+            self.metrics.in_use -= 1
+            self._condition.notify()
+
+    def acquire(self, *, timeout: float | None = None) -> _AcquireContext:
+        """
+        Acquire a connection, either awaited or used as an async context manager.
+
+        Parameters
+        ----------
+        timeout : `float | None`
+            How long (in seconds) to wait for a connection, ``acquire_timeout`` if not given.
+        """
+        return _AcquireContext(self, timeout)
+
+    async def release(self, connection: asyncpg.Connection) -> None:
+        """Release a connection acquired without a context manager."""
+        try:
+            await self.pool.release(connection)
+        finally:
+            await self._put_back()
+
+    async def _resize(self, interval: float) -> None:
+        min_size, max_size = self.pool.get_min_size() or 1, self.pool.get_max_size()
+        while True:
+            await asyncio.sleep(interval)
+
+            waiting, peak = self.metrics.reset_window()
+
+            if waiting > self.target_wait and self._limit < max_size:
+                # acquires are queueing, grow quickly.
+                self._limit = min(max_size, self._limit + max(1, self._limit // 2))
+                _log.info(f"Pool limit grown to {self._limit} (p95 acquire wait {waiting * 1000:.1f}ms)")
+                async with self._condition:
+                    self._condition.notify_all()
+            elif peak < self._limit // 2 and self._limit > min_size:
+                # mostly unused, shrink slowly. asyncpg closes the connections left idle.
+                self._limit -= 1
+
+    def _timeout(self, timeout: float | None) -> float | None:
+        # an explicit 0 is a timeout of its own, not a missing one.
+        return self.command_timeout if timeout is None else timeout
+
+    async def execute(self, query: str, *args: Any, timeout: float | None = None) -> str:
+        async with self.acquire() as con:
+            return await con.execute(query, *args, timeout=self._timeout(timeout))
+
+    async def executemany(self, query: str, args: Any, *, timeout: float | None = None) -> None:
+        async with self.acquire() as con:
+            return await con.executemany(query, args, timeout=self._timeout(timeout))
+
+    async def fetch(self, query: str, *args: Any, timeout: float | None = None) -> list[Any]:
+        async with self.acquire() as con:
+            return await con.fetch(query, *args, timeout=self._timeout(timeout))
+
+    async def fetchrow(self, query: str, *args: Any, timeout: float | None = None) -> Any | None:
+        async with self.acquire() as con:
+            return await con.fetchrow(query, *args, timeout=self._timeout(timeout))
+
+    async def fetchval(
+        self, query: str, *args: Any, column: int = 0, timeout: float | None = None
+    ) -> Any:
+        async with self.acquire() as con:
+            return await con.fetchval(
+                query, *args, column=column, timeout=self._timeout(timeout)
+            )
+
+    async def close(self) -> None:
+        self._task.cancel()
+        await self.pool.close()
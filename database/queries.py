@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import time
+import logging
+import asyncpg
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from .crud import DatabaseProtocol
+
+    Executor = DatabaseProtocol | asyncpg.Connection
+
+
+__all__: tuple[str, ...] = ("QueryRegistry", "QueryStats", "QUERIES")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Runtime statistics of a named query.
+
+    Attributes
+    ----------
+    calls : `int`
+        How many times the query was run.
+    rows : `int`
+        The total number of rows returned or affected.
+    errors : `int`
+        How many times the query raised an error.
+    total_time : `float`
+        The total time (in seconds) spent running the query.
+    """
+
+    __slots__: tuple[str, ...] = ("calls", "rows", "errors", "total_time", "_samples")
+
+    def __init__(self, samples: int = 1024) -> None:
+        self.calls: int = 0
+        self.rows: int = 0
+        self.errors: int = 0
+        self.total_time: float = 0.0
+        self._samples: deque[float] = deque(maxlen=samples)
+
+    def record(self, elapsed: float, rows: int) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.total_time += elapsed
+        self._samples.append(elapsed)
+
+    def percentile(self, q: float) -> float:
+        """
+        Get a latency percentile (in seconds) over the most recent calls.
+
+        Parameters
+        ----------
+        q : `float`
+            The percentile to get, between 0 and 100.
+        """
+        if not self._samples:
+            return 0.0
+
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    def __repr__(self) -> str:
+        return f"<QueryStats calls={self.calls} p50={self.p50:.4f} p99={self.p99:.4f} rows={self.rows}>"
+
+
+class QueryRegistry:
+    """
+    A registry of named queries.
+
+    Queries are declared once by name, prepared on every pool connection when it's
+    created and then called by name, which records how they perform. Queries can
+    be called on the pool or on an acquired connection, e.g. inside a transaction.
+
+    Attributes
+    ----------
+    queries : `dict[str, str]`
+        A mapping of query names to their SQL.
+    stats : `dict[str, QueryStats]`
+        A mapping of query names to their runtime statistics.
+    slow_threshold : `float`
+        Queries slower than this (in seconds) are logged, ``0`` disables it.
+    observers : `list[Callable[[str, float, bool], None]]`
+        Called after every query with its name, the time (in seconds) it took
+        including the wait for a connection, and whether it failed.
+    """
+
+    __slots__: tuple[str, ...] = ("queries", "stats", "slow_threshold", "observers")
+
+    def __init__(self, *, slow_threshold: float = 0.0) -> None:
+        self.queries: dict[str, str] = {}
+        self.stats: dict[str, QueryStats] = {}
+        self.slow_threshold: float = slow_threshold
+        self.observers: list[Callable[[str, float, bool], None]] = []
+
+    def register(self, name: str, query: str) -> str:
+        """
+        Declare a named query.
+
+        Parameters
+        ----------
+        name : `str`
+            The name to call the query by.
+        query : `str`
+            The SQL of the query.
+
+        Returns
+        -------
+        str
+            The name of the query.
+
+        Raises
+        ------
+        ValueError
+            A different query is already registered under this name.
+        """
+        existing = self.queries.get(name)
+        if existing is not None and existing != query:
+            raise ValueError(f"A different query named {name!r} is already registered.")
+
+        self.queries[name] = query
+        self.stats.setdefault(name, QueryStats())
+        return name
+
+    async def prepare(self, connection: asyncpg.Connection) -> None:
+        """
+        Prepare every registered query on a connection. This is meant to be
+        called from the pool's ``init`` hook.
+
+        Parameters
+        ----------
+        connection : `asyncpg.Connection`
+            The connection to prepare the queries on.
+        """
+        cache_statement = getattr(connection, "cache_statement", None)
+        if cache_statement is None:
+            return
+
+        for name, query in self.queries.items():
+            try:
+                await cache_statement(query)
+            except asyncpg.PostgresError as e:
+                _log.warning(f"Unable to prepare query {name!r}: {e}")
+
+    async def _run(
+        self,
+        db: Executor,
+        name: str,
+        method: str,
+        args: tuple[Any, ...],
+        timeout: float | None,
+    ) -> Any:
+        try:
+            query = self.queries[name]
+        except KeyError:
+            raise KeyError(f"No query named {name!r} is registered.") from None
+
+        stats = self.stats[name]
+        called = started = time.perf_counter()
+        try:
+            if hasattr(db, "acquire"):
+                async with db.acquire() as connection:
+                    # The connection's statement cache already holds the prepared query, it's not parsed again.
+                    started = time.perf_counter()
+                    result = await getattr(connection, method)(query, *args, timeout=timeout)
+            else:
+                # Already a connection, e.g. to run the query inside a transaction.
+                result = await getattr(db, method)(query, *args, timeout=timeout)
+        except Exception:
+            stats.errors += 1
+            self._notify(name, time.perf_counter() - called, True)
+            raise
+
+        finished = time.perf_counter()
+        elapsed = finished - started
+        self._notify(name, finished - called, False)
+        if method == "fetch":
+            rows = len(result)
+        elif method == "fetchrow":
+            rows = int(result is not None)
+        else:
+            count = result.rpartition(" ")[2]
+            rows = int(count) if count.isdigit() else 0
+
+        stats.record(elapsed, rows)
+        if self.slow_threshold and elapsed >= self.slow_threshold:
+            _log.warning(
+                f"Slow query {name!r} took {elapsed * 1000:.1f}ms ({rows} rows)"
+            )
+
+        return result
+
+    def _notify(self, name: str, elapsed: float, failed: bool) -> None:
+        for observer in self.observers:
+            try:
+                observer(name, elapsed, failed)
+            except Exception:
+                _log.exception(f"Query observer {observer!r} failed")
+
+    async def execute(
+        self, db: Executor, name: str, *args: Any, timeout: float | None = None
+    ) -> str:
+        """Run a named query and return its status."""
+        return await self._run(db, name, "execute", args, timeout)
+
+    async def fetch(
+        self, db: Executor, name: str, *args: Any, timeout: float | None = None
+    ) -> list[Any]:
+        """Run a named query and return all rows."""
+        return await self._run(db, name, "fetch", args, timeout)
+
+    async def fetchrow(
+        self, db: Executor, name: str, *args: Any, timeout: float | None = None
+    ) -> Any | None:
+        """Run a named query and return the first row."""
+        return await self._run(db, name, "fetchrow", args, timeout)
+
+    def report(self) -> list[tuple[str, QueryStats]]:
+        """
+        Get the statistics of every query that was called, most expensive first.
+
+        Returns
+        -------
+        list[tuple[str, QueryStats]]
+            The name and statistics of each query.
+        """
+        return sorted(
+            ((name, stats) for name, stats in self.stats.items() if stats.calls),
+            key=lambda item: item[1].total_time,
+            reverse=True,
+        )
+
+
+# The registry shared by the whole bot, queries are registered on import.
+QUERIES: QueryRegistry = QueryRegistry()
@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS command_sync (
+    scope BIGINT PRIMARY KEY,
+    payload_hash TEXT NOT NULL,
+    commands JSONB NOT NULL DEFAULT '{}'::jsonb,
+    synced_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
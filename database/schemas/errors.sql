@@ -0,0 +1,21 @@
+CREATE TABLE IF NOT EXISTS error_reports (
+    fingerprint TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    traceback TEXT NOT NULL,
+    occurrences BIGINT NOT NULL DEFAULT 0,
+    first_seen TIMESTAMPTZ NOT NULL,
+    last_seen TIMESTAMPTZ NOT NULL,
+    last_command TEXT NOT NULL DEFAULT '',
+    last_guild_id BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS error_occurrences (
+    fingerprint TEXT NOT NULL,
+    minute TIMESTAMPTZ NOT NULL,
+    command TEXT NOT NULL DEFAULT '',
+    guild_id BIGINT NOT NULL DEFAULT 0,
+    occurrences INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (fingerprint, minute, command, guild_id)
+);
+
+CREATE INDEX IF NOT EXISTS error_occurrences_minute_idx ON error_occurrences (minute);
@@ -0,0 +1,4 @@
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id BIGINT PRIMARY KEY,
+    settings JSONB NOT NULL DEFAULT '{}'::jsonb
+);
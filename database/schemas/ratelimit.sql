@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS ratelimit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated DOUBLE PRECISION NOT NULL,
+    per DOUBLE PRECISION NOT NULL
+);
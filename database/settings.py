@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import time
+import uuid
+import asyncio
+import logging
+from types import MappingProxyType
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Mapping
+
+from .codecs import decoded
+from .pool import AdaptivePool
+from .queries import QUERIES
+
+if TYPE_CHECKING:
+    from .crud import DatabaseProtocol
+
+
+__all__: tuple[str, ...] = ("GuildSettingsCache",)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+CHANNEL: str = "fifi_guild_settings"
+
+GET_SETTINGS = QUERIES.register(
+    "guild_settings.get",
+    "SELECT settings FROM guild_settings WHERE guild_id = $1",
+)
+UPDATE_SETTINGS = QUERIES.register(
+    "guild_settings.update",
+    "INSERT INTO guild_settings (guild_id, settings) VALUES ($1, $2) "
+    "ON CONFLICT (guild_id) DO UPDATE SET settings = guild_settings.settings || EXCLUDED.settings "
+    "RETURNING settings",
+)
+DELETE_SETTINGS = QUERIES.register(
+    "guild_settings.delete",
+    "DELETE FROM guild_settings WHERE guild_id = $1",
+)
+NOTIFY = QUERIES.register("guild_settings.notify", "SELECT pg_notify($1, $2)")
+
+
+class GuildSettingsCache:
+    """
+    A read-through cache of the per guild settings.
+
+    Entries are bounded in number (least recently used are evicted first) and in
+    age. Writes go through the cache and notify every other process listening on
+    the same database, which drops its copy of the entry.
+
+    Attributes
+    ----------
+    db: `DatabaseProtocol`
+        The database the settings are stored in.
+    max_size: `int`
+        The maximum number of guilds kept in the cache.
+    ttl: `float`
+        How long (in seconds) an entry is kept before it's loaded again.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "db",
+        "max_size",
+        "ttl",
+        "_origin",
+        "_entries",
+        "_loading",
+        "_stale",
+        "_task",
+        "_closed",
+        "_listeners",
+    )
+
+    def __init__(
+        self, db: DatabaseProtocol, *, max_size: int = 1000, ttl: float = 300.0
+    ) -> None:
+        self.db: DatabaseProtocol = db
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+
+        # identifies the notifications sent by this process so it doesn't drop its own writes.
+        self._origin: str = uuid.uuid4().hex
+        self._entries: OrderedDict[int, tuple[float, Mapping[str, Any]]] = OrderedDict()
+        self._loading: dict[int, asyncio.Future[Mapping[str, Any]]] = {}
+        self._stale: set[int] = set()
+        self._task: asyncio.Task[None] | None = None
+        self._closed: asyncio.Event = asyncio.Event()
+        self._listeners: list[Callable[[int | None], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, guild_id: int, settings: Mapping[str, Any]) -> Mapping[str, Any]:
+        settings = MappingProxyType(dict(settings))
+        self._entries[guild_id] = (time.monotonic() + self.ttl, settings)
+        self._entries.move_to_end(guild_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        return settings
+
+    async def _load(self, guild_id: int) -> Mapping[str, Any]:
+        try:
+            row = await QUERIES.fetchrow(self.db, GET_SETTINGS, guild_id)
+        finally:
+            stale = guild_id in self._stale
+            self._stale.discard(guild_id)
+
+        settings = decoded(row["settings"]) if row is not None else {}
+
+        # invalidated while we were loading, what we got may already be outdated.
+        if stale:
+            return MappingProxyType(dict(settings))
+
+        return self._store(guild_id, settings)
+
+    async def get(self, guild_id: int) -> Mapping[str, Any]:
+        """
+        Get the settings of a guild, loading them if they aren't cached.
+
+        Parameters
+        ----------
+        guild_id : `int`
+            The guild to get the settings of.
+
+        Returns
+        -------
+        Mapping[str, Any]
+            A read only view of the settings, empty if the guild has none.
+        """
+        entry = self._entries.get(guild_id)
+        if entry is not None:
+            expires, settings = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(guild_id)
+                return settings
+
+            del self._entries[guild_id]
+
+        # share one database round trip between everyone asking for the same guild.
+        future = self._loading.get(guild_id)
+        if future is None:
+            future = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = future
+            future.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+
+        return await asyncio.shield(future)
+
+    def get_cached(self, guild_id: int) -> Mapping[str, Any] | None:
+        """Get the settings of a guild only if they are cached and fresh."""
+        entry = self._entries.get(guild_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    async def _write(self, query: str, guild_id: int, *args: Any) -> Any:
+        async with self.db.acquire() as con:
+            async with con.transaction():
+                # the notification is only delivered once the write is committed.
+                result = await QUERIES.fetchrow(con, query, guild_id, *args)
+                await QUERIES.execute(con, NOTIFY, CHANNEL, f"{guild_id}:{self._origin}")
+
+        self.invalidate(guild_id)
+        return result
+
+    async def update(self, guild_id: int, **values: Any) -> Mapping[str, Any]:
+        """
+        Update some settings of a guild, the other settings are kept.
+
+        Parameters
+        ----------
+        guild_id : `int`
+            The guild to update the settings of.
+        **values : `Any`
+            The settings to set.
+
+        Returns
+        -------
+        Mapping[str, Any]
+            The settings of the guild after the update.
+        """
+        row = await self._write(UPDATE_SETTINGS, guild_id, values)
+        return self._store(guild_id, decoded(row["settings"]))
+
+    async def reset(self, guild_id: int) -> None:
+        """
+        Delete every setting of a guild.
+
+        Parameters
+        ----------
+        guild_id : `int`
+            The guild to reset the settings of.
+        """
+        await self._write(DELETE_SETTINGS, guild_id)
+
+    def add_listener(self, listener: Callable[[int | None], None]) -> None:
+        """
+        Call a function whenever settings are dropped from the cache, e.g. to reload
+        what was derived from them.
+
+        Parameters
+        ----------
+        listener : `Callable[[int | None], None]`
+            Called with the guild whose settings were dropped, ``None`` for every guild.
+        """
+        self._listeners.append(listener)
+
+    def invalidate(self, guild_id: int | None = None) -> None:
+        """
+        Drop a guild from the cache, or every guild if not given.
+
+        Parameters
+        ----------
+        guild_id : `int | None`
+            The guild to drop.
+        """
+        if guild_id is None:
+            self._entries.clear()
+            self._stale.update(self._loading)
+        else:
+            self._entries.pop(guild_id, None)
+            if guild_id in self._loading:
+                self._stale.add(guild_id)
+
+        for listener in self._listeners:
+            listener(guild_id)
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        guild_id, _, origin = payload.partition(":")
+        if origin != self._origin:
+            self.invalidate(int(guild_id))
+
+    async def _listen(self) -> None:
+        while not self._closed.is_set():
+            lost = asyncio.Event()
+            try:
+                # the connection is held for good, it doesn't count against the pool's soft limit.
+                db = self.db.pool if isinstance(self.db, AdaptivePool) else self.db
+                async with db.acquire() as con:
+                    await con.add_listener(CHANNEL, self._on_notification)
+                    con.add_termination_listener(lambda _: lost.set())
+                    # notifications sent while nobody was listening are gone.
+                    self.invalidate()
+
+                    waiters = [asyncio.ensure_future(e.wait()) for e in (lost, self._closed)]
+                    try:
+                        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        for waiter in waiters:
+                            waiter.cancel()
+
+                    if not lost.is_set():
+                        await con.remove_listener(CHANNEL, self._on_notification)
+            except Exception as e:
+                _log.warning(f"Guild settings listener failed: {e}")
+
+            if not self._closed.is_set():
+                self.invalidate()
+                await asyncio.sleep(5)
+
+    def start(self) -> None:
+        """Start listening for changes made by other processes."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        """Stop listening for changes."""
+        self._closed.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
@@ -1,42 +1,144 @@
+import time
+import types
+import asyncio
 import logging
 import pathlib
+from typing import Any, Coroutine, Generator
 from discord.ext import commands
 from bot import FIFIBot
 
 logger: logging.Logger = logging.getLogger(__name__)
 
 
+# Extensions that don't live in this package but are loaded along with it.
+EXTERNAL: list[str] = ["jishaku"]
+
+# Rarely used extensions mapped to the command names that trigger them.
+# Outside of debug mode they are only loaded on the first invocation of one of these commands.
+LAZY: dict[str, tuple[str, ...]] = {"jishaku": ("jishaku", "jsk")}
+
+# Extensions whose setup needs other extensions loaded first, mapped to those extensions.
+# Everything else is loaded concurrently.
+AFTER: dict[str, tuple[str, ...]] = {}
+
+
+def _local_extensions() -> list[str]:
+    return [f"extensions.{f.stem}" for f in pathlib.Path("extensions").glob("*[a-zA-Z].py")]
+
+
+def _lazy_command(bot: FIFIBot, extension: str, triggers: tuple[str, ...]) -> commands.Command:
+    # A placeholder command which loads the real extension and then re-invokes the message.
+    lock = asyncio.Lock()
+
+    async def load_and_invoke(ctx: commands.Context) -> None:
+        async with lock:
+            if extension not in bot.extensions:
+                placeholder = bot.remove_command(triggers[0])
+
+                started = time.perf_counter()
+                try:
+                    await bot.load_extension(extension)
+                except Exception:
+                    # keep the placeholder, so the next invocation tries again.
+                    if placeholder is not None:
+                        bot.add_command(placeholder)
+                    raise
+                logger.info(
+                    f"Lazily loaded {extension} in {(time.perf_counter() - started) * 1000:.1f}ms"
+                )
+
+        new_ctx = await bot.get_context(ctx.message)
+        await bot.invoke(new_ctx)
+
+    return commands.Command(
+        load_and_invoke,
+        name=triggers[0],
+        aliases=list(triggers[1:]),
+        hidden=True,
+    )
+
+
+@types.coroutine
+def _busy(coro: Coroutine[Any, Any, Any]) -> Generator[Any, Any, tuple[Any, float]]:
+    # Drives a coroutine and counts only the time its own steps run on the loop, not
+    # the time it's suspended while others (e.g. their imports) run.
+    busy = 0.0
+    value: Any = None
+    error: BaseException | None = None
+    while True:
+        started = time.perf_counter()
+        try:
+            waiting = coro.send(value) if error is None else coro.throw(error)
+        except StopIteration as e:
+            return e.value, busy + time.perf_counter() - started
+        busy += time.perf_counter() - started
+
+        try:
+            value, error = (yield waiting), None
+        except BaseException as e:
+            value, error = None, e
+
+
+async def _load(bot: FIFIBot, extension: str) -> float | None:
+    try:
+        _, busy = await _busy(bot.load_extension(extension))
+    except Exception as e:
+        logger.error(f"Unable to load extension: {extension} > {e}")
+        return None
+
+    return busy
+
+
 async def setup(bot: FIFIBot) -> None:
-    NO_LOAD: list[str] = [".test"]
-    extensions: list[str] = [
-        f".{f.stem}" for f in pathlib.Path("extensions").glob("*[a-zA-Z].py")
-    ]
-    loaded: list[str] = []
+    NO_LOAD: list[str] = ["extensions.test"]
+    extensions: list[str] = []
 
-    for extension in extensions:
+    for extension in EXTERNAL + _local_extensions():
         if bot.debug and extension in NO_LOAD:
             logger.info(
                 f"Skipped loading: {extension} as bot is currently in debug mode."
             )
             continue
 
-        try:
-            await bot.load_extension(extension, package="extensions")
-        except Exception as e:
-            logger.error(f"Unable to load extension: {extension} > {e}")
-        else:
-            loaded.append(f"extensions{extension}")
+        if not bot.debug and extension in LAZY:
+            bot.add_command(_lazy_command(bot, extension, LAZY[extension]))
+            logger.info(f"Deferred loading: {extension} until it's first used.")
+            continue
 
-    logger.info(f"Loaded the following extensions: {loaded}")
+        extensions.append(extension)
+
+    # Each wave is loaded concurrently, an extension waits for the waves holding what it needs.
+    # discord.py imports the module and runs its setup in one go, the timings cover both.
+    started = time.perf_counter()
+    timings: dict[str, float | None] = {}
+    pending = list(extensions)
+    while pending:
+        wave = [ext for ext in pending if all(dep not in pending for dep in AFTER.get(ext, ()))]
+        # a dependency cycle, break it by loading one of them on its own.
+        if not wave:
+            wave = pending[:1]
+        for ext, busy in zip(wave, await asyncio.gather(*(_load(bot, ext) for ext in wave))):
+            timings[ext] = busy
+        pending = [ext for ext in pending if ext not in timings]
+    total = time.perf_counter() - started
+
+    loaded = {ext: t for ext, t in timings.items() if t is not None}
+    report = "\n".join(
+        f"  {ext:<32} {t * 1000:>8.1f}ms"
+        for ext, t in sorted(loaded.items(), key=lambda item: item[1], reverse=True)
+    )
+    logger.info(
+        f"Loaded {len(loaded)}/{len(extensions)} extensions in {total * 1000:.1f}ms:\n{report}"
+    )
 
 
 async def teardown(bot: FIFIBot) -> None:
-    extensions: list[str] = [
-        f".{f.stem}" for f in pathlib.Path("extensions").glob("*[a-zA-Z].py")
-    ]
+    for extension in EXTERNAL + _local_extensions():
+        if extension in LAZY and extension not in bot.extensions:
+            bot.remove_command(LAZY[extension][0])
+            continue
 
-    for extension in extensions:
         try:
-            await bot.unload_extension(extension, package="extensions")
+            await bot.unload_extension(extension)
         except commands.ExtensionNotLoaded:
             pass
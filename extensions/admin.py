@@ -1,10 +1,15 @@
+import time
+import datetime
 from typing import Literal, Annotated
 
 import discord
 from discord.ext import commands
-from numpy import number
 from _typings import Context, BaseCog
 from bot import FIFIBot
+from database import AdaptivePool, QUERIES
+from database.errors import OCCURRENCES_AFTER, OCCURRENCES_FIRST
+from ui import QueryPaginator
+from utils import CacheReport, SyncOutcome
 from discord import app_commands
 
 from discord.app_commands import locale_str as _T
@@ -21,35 +26,212 @@ class Admin(BaseCog):
         ctx: Context,
         guilds: commands.Greedy[discord.Object],
         spec: Literal["~", "*", "^"] | None = None,
+        flag: Literal["force"] | None = None,
     ) -> None:
+        """
+        Sync the application commands, skipped for every scope whose commands didn't change.
+
+        ``~`` syncs the current guild, ``*`` copies the global commands to it first, ``^`` clears it.
+        Pass ``force`` to sync even if nothing changed.
+        """
+        force = flag == "force"
+        syncer = ctx.bot.syncer
         if not guilds:
             if spec == "~":
-                synced = await ctx.bot.tree.sync(guild=ctx.guild)
+                report = await syncer.sync(ctx.guild, force=force)
             elif spec == "*":
                 ctx.bot.tree.copy_global_to(guild=ctx.guild)
-                synced = await ctx.bot.tree.sync(guild=ctx.guild)
+                report = await syncer.sync(ctx.guild, force=force)
             elif spec == "^":
                 ctx.bot.tree.clear_commands(guild=ctx.guild)
-                await ctx.bot.tree.sync(guild=ctx.guild)
-                synced = []
+                report = await syncer.sync(ctx.guild, force=force)
             else:
-                synced = await ctx.bot.tree.sync()
+                report = await syncer.sync(force=force)
+
+            await ctx.send(report.summary())
+            return
+
+        outcomes: list[SyncOutcome] = []
+        message = await ctx.send(f"Syncing the tree to {len(guilds)} guilds...")
+        last_edit = time.monotonic()
+        async for outcome in syncer.sync_many(guilds, force=force):
+            outcomes.append(outcome)
+            # editing on every outcome would burn the rate limit of the channel.
+            if time.monotonic() - last_edit > 2 and len(outcomes) < len(guilds):
+                await message.edit(content=f"Syncing the tree... {len(outcomes)}/{len(guilds)}")
+                last_edit = time.monotonic()
+
+        synced = sum(1 for o in outcomes if o.report is not None and not o.report.skipped)
+        skipped = sum(1 for o in outcomes if o.report is not None and o.report.skipped)
+        failed = [o for o in outcomes if not o.ok]
+
+        await message.edit(
+            content=f"Synced the tree to {synced}/{len(guilds)} guilds, "
+            f"{skipped} unchanged, {len(failed)} failed."
+        )
+        if failed:
+            lines = [
+                f"{o.guild.id}: {type(o.error).__name__}: {o.error} ({o.attempts} attempts)"
+                for o in failed
+            ]
+            await ctx.safe_send("```\n" + "\n".join(lines) + "```")
+
+    @commands.group(invoke_without_command=True)
+    @commands.guild_only()
+    async def prefix(self, ctx: Context) -> None:
+        """Show the command prefixes of this server."""
+        assert ctx.guild is not None
+        prefixes = ", ".join(f"`{p}`" for p in ctx.bot.prefixes.get(ctx.guild.id))
+        await ctx.send(f"The prefixes of this server are {prefixes}, mentioning me works too.")
+
+    @prefix.command(name="set")
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    async def prefix_set(self, ctx: Context, *prefixes: str) -> None:
+        """Replace the command prefixes of this server."""
+        assert ctx.guild is not None
+        if not prefixes:
+            await ctx.send("Give at least one prefix.")
+            return
+
+        matcher = ctx.bot.prefixes
+        previous = matcher.get(ctx.guild.id)
+        # the matcher cleans the prefixes, they're saved the way it keeps them.
+        matcher.set(ctx.guild.id, prefixes)
+        try:
+            await ctx.settings.update(ctx.guild.id, prefixes=list(matcher.get(ctx.guild.id)))
+        except Exception:
+            # don't answer to prefixes which would be gone after a restart.
+            matcher.set(ctx.guild.id, previous)
+            raise
+        await ctx.send(f"The prefixes of this server are now {', '.join(f'`{p}`' for p in matcher.get(ctx.guild.id))}.")
+
+    @prefix.command(name="reset")
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    async def prefix_reset(self, ctx: Context) -> None:
+        """Go back to the default command prefixes."""
+        assert ctx.guild is not None
+        await ctx.settings.update(ctx.guild.id, prefixes=[])
+        ctx.bot.prefixes.set(ctx.guild.id, None)
+        await ctx.send("The prefixes of this server are back to the defaults.")
+
+    @commands.command()
+    @commands.is_owner()
+    async def queries(self, ctx: Context, limit: int = 15) -> None:
+        """Show the most expensive named queries."""
+        report = QUERIES.report()[:limit]
+        if not report:
+            await ctx.send("No named queries have been called yet.")
+            return
 
-            await ctx.send(
-                f"Synced {len(synced)} commands {'globally' if spec is None else 'to the current guild.'}"
+        lines = [f"{'name':<28} {'calls':>7} {'p50':>8} {'p99':>8} {'total':>9} {'rows':>8}"]
+        for name, stats in report:
+            lines.append(
+                f"{name[:28]:<28} {stats.calls:>7} {stats.p50 * 1000:>6.1f}ms "
+                f"{stats.p99 * 1000:>6.1f}ms {stats.total_time:>8.2f}s {stats.rows:>8}"
             )
+
+        await ctx.safe_send("```\n" + "\n".join(lines) + "```")
+
+    @commands.command()
+    @commands.is_owner()
+    async def pool(self, ctx: Context) -> None:
+        """Show how saturated the database pool is."""
+        pool = ctx.bot.pool
+        if not isinstance(pool, AdaptivePool):
+            await ctx.send("The database backend in use doesn't report pool metrics.")
             return
 
-        ret = 0
-        for guild in guilds:
-            try:
-                await ctx.bot.tree.sync(guild=guild)
-            except discord.HTTPException:
-                pass
-            else:
-                ret += 1
+        metrics = pool.metrics
+        average = metrics.wait_total / metrics.acquires if metrics.acquires else 0.0
+        await ctx.send(
+            f"**Connections**: {metrics.in_use} in use / {pool.limit} allowed / "
+            f"{pool.get_size()} open ({pool.get_idle_size()} idle), "
+            f"{pool.get_min_size()}-{pool.get_max_size()} configured\n"
+            f"**Acquires**: {metrics.acquires} ({metrics.timeouts} timed out)\n"
+            f"**Wait**: avg {average * 1000:.1f}ms, p95 {metrics.wait_percentile(95) * 1000:.1f}ms, "
+            f"max {metrics.wait_max * 1000:.1f}ms"
+        )
+
+    @commands.command()
+    @commands.is_owner()
+    async def cache(self, ctx: Context, limit: int = 10) -> None:
+        """Show what the gateway cache holds and the guilds taking the most of it."""
+        report = CacheReport.collect(ctx.bot, ctx.bot.fetched)
+
+        lines = [f"{'kind':<10} {'count':>9} {'approx':>10}"]
+        for kind, (count, size) in report.totals.items():
+            lines.append(f"{kind:<10} {count:>9} {size / 1024:>8.1f}KB")
+        lines.append(f"{'total':<10} {'':>9} {report.total_bytes / 1024:>8.1f}KB")
+
+        lines += ["", f"{'guild':<20} {'members':>8} {'approx':>10}  name"]
+        for guild, size in report.guilds[:limit]:
+            lines.append(f"{guild.id:<20} {len(guild.members):>8} {size / 1024:>8.1f}KB  {guild.name[:24]}")
+
+        await ctx.safe_send("```\n" + "\n".join(lines) + "```")
+
+    @commands.command()
+    @commands.is_owner()
+    async def errors(self, ctx: Context, minutes: int = 60, limit: int = 10) -> None:
+        """Show the errors which occurred the most over the last minutes."""
+        store = ctx.bot.packets.store
+        if store is None:
+            await ctx.send("Errors aren't being persisted.")
+            return
+
+        rows = await store.top(window=datetime.timedelta(minutes=minutes), limit=limit)
+        if not rows:
+            await ctx.send(f"No errors in the last {minutes} minutes.")
+            return
+
+        lines = [f"{'fingerprint':<16} {'error':<24} {'count':>6} {'/min':>6} {'guilds':>6}  last command"]
+        for row in rows:
+            lines.append(
+                f"{row['fingerprint']:<16} {row['name'][:24]:<24} {row['occurrences']:>6} "
+                f"{row['occurrences'] / minutes:>6.2f} {row['guilds']:>6}  {row['last_command'] or '-'}"
+            )
+
+        await ctx.safe_send("```\n" + "\n".join(lines) + "```")
+
+    @commands.command()
+    @commands.is_owner()
+    async def occurrences(self, ctx: Context, fingerprint: str) -> None:
+        """Page through the occurrences of an error, the latest first."""
+        store = ctx.bot.packets.store
+        if store is None:
+            await ctx.send("Errors aren't being persisted.")
+            return
+
+        await store.flush()
+        report = await store.get(fingerprint)
+        if report is None:
+            await ctx.send(f"No error with the fingerprint {fingerprint}.")
+            return
+
+        def format_page(rows: list, index: int) -> str:
+            lines = [f"{report['name']} ({fingerprint}), page {index + 1}", ""]
+            lines.append(f"{'minute':<17} {'count':>6} {'guild':>20}  command")
+            for row in rows:
+                minute = row["minute"].strftime("%Y-%m-%d %H:%M")
+                lines.append(
+                    f"{minute:<17} {row['occurrences']:>6} {row['guild_id'] or '-':>20}  {row['command'] or '-'}"
+                )
+            if not rows:
+                lines.append("No occurrences left, the counts are pruned after the retention.")
+            return "```\n" + "\n".join(lines) + "```"
 
-        await ctx.send(f"Synced the tree to {ret}/{len(guilds)}.")
+        paginator = QueryPaginator(
+            ctx.db,
+            OCCURRENCES_FIRST,
+            OCCURRENCES_AFTER,
+            fingerprint,
+            key=("minute", "command", "guild_id"),
+            formatter=format_page,
+            per_page=15,
+            author_id=ctx.author.id,
+        )
+        await paginator.start(ctx)
 
     @app_commands.command(name=_T("testing"),
                           description=_T("This is a teting command."))
@@ -74,4 +256,4 @@ class Admin(BaseCog):
 
 
 async def setup(bot: FIFIBot) -> None:
-    await bot.add_cog(Admin())
+    await bot.add_cog(Admin(bot))
@@ -1,10 +1,23 @@
 import logging
 import asyncio
 import discord
+from pathlib import Path
 
-from core import CONFIG
+from core import CONFIG, ClusterSupervisor, WorkerLink
+from core.cluster import fetch_recommended_shards
+from core.performance import run
 from bot import FIFIBot
-from database import create_pool
+from database import (
+    AdaptivePool,
+    create_pool,
+    DatabaseProtocol,
+    get_jsonb_codec,
+    GuildSettingsCache,
+    LocalDatabase,
+    QUERIES,
+    setup_schemas,
+    WriteBuffer,
+)
 
 
 # setup discord logging
@@ -14,27 +27,107 @@ discord.utils.setup_logging(level=logging.INFO)
 _log: logging.Logger = logging.getLogger(__name__)
 
 
-# main function to run the bot
-def main() -> None:
+async def create_database() -> DatabaseProtocol:
+    schemas = sorted(Path("database/schemas").glob("*.sql"))
+    if CONFIG.DATABASE.backend == "sqlite":
+        # an in-process database, so the bot can run without a Postgres server.
+        db = LocalDatabase(CONFIG.DATABASE.sqlite_path, latency=CONFIG.DATABASE.latency)
+        await db.setup(*schemas)
+        return db
+
+    # every schema only creates what doesn't exist yet, so this is safe on every start.
+    await setup_schemas(CONFIG.DATABASE.dsn, *schemas)
+
+    # The pool grows between pool_min_size and pool_max_size as acquires start waiting.
+    return AdaptivePool(
+        await create_pool(
+            dsn=CONFIG.DATABASE.dsn,
+            min_size=CONFIG.DATABASE.pool_min_size,
+            max_size=CONFIG.DATABASE.pool_max_size,
+            command_timeout=CONFIG.DATABASE.command_timeout,
+            idle_lifetime=CONFIG.DATABASE.pool_idle_lifetime,
+            jsonb_codec=get_jsonb_codec(
+                CONFIG.DATABASE.jsonb_serializer,
+                CONFIG.DATABASE.jsonb_format,
+                CONFIG.DATABASE.jsonb_raw,
+            ),
+        ),
+        target_wait=CONFIG.DATABASE.pool_target_wait,
+        acquire_timeout=CONFIG.DATABASE.acquire_timeout,
+        command_timeout=CONFIG.DATABASE.command_timeout,
+    )
+
 
-    async def start() -> None:
+async def start(
+    *,
+    shard_ids: list[int] | None = None,
+    shard_count: int | None = None,
+    cluster: WorkerLink | None = None,
+) -> None:
 
-        # First try to connect to the database and create pool of 20 connections. 
-        # [By default command timeout is 300 seconds]
-        try:
-            pool = await create_pool(dsn=CONFIG.DATABASE.dsn)
-            _log.info(f"Created Database Pool Successfully")
-        except Exception as e:
-            _log.error(f"Failed to create pool: {e}")
-            return
+    QUERIES.slow_threshold = CONFIG.DATABASE.slow_query_threshold
 
-        # Then try to start the bot.
-        async with FIFIBot() as bot:
-            bot.pool = pool
-            await bot.start(CONFIG.BOT.token, reconnect=True)
+    # First try to connect to the database and create the pool.
+    try:
+        pool = await create_database()
+        _log.info(f"Created Database Pool Successfully")
+    except Exception as e:
+        _log.error(f"Failed to create pool: {e}")
+        return
+
+    # Then try to start the bot.
+    async with FIFIBot(
+        shard_ids=shard_ids, shard_count=shard_count, cluster=cluster
+    ) as bot:
+        bot.pool = pool
+        bot.buffer = WriteBuffer(
+            pool,
+            max_rows=CONFIG.DATABASE.buffer_max_rows,
+            interval=CONFIG.DATABASE.buffer_interval,
+        )
+        bot.settings = GuildSettingsCache(
+            pool,
+            max_size=CONFIG.DATABASE.settings_cache_size,
+            ttl=CONFIG.DATABASE.settings_cache_ttl,
+        )
+        await bot.start(CONFIG.BOT.token, reconnect=True)
 
+
+def run_worker(
+    cluster_id: int, shard_ids: list[int], shard_count: int, link: WorkerLink
+) -> None:
+    # entry point of a cluster worker process, every worker owns its own pool and session.
+    _log.info(f"Cluster {cluster_id} starting with shards {shard_ids}")
+    try:
+        run(start(shard_ids=shard_ids, shard_count=shard_count, cluster=link))
+    except KeyboardInterrupt:
+        return
+
+
+def run_cluster() -> None:
+    shard_count = CONFIG.CLUSTER.shard_count
+    if shard_count <= 0:
+        shard_count = asyncio.run(fetch_recommended_shards(CONFIG.BOT.token))
+        _log.info(f"Using the recommended shard count: {shard_count}")
+
+    supervisor = ClusterSupervisor(
+        run_worker,
+        shard_count=shard_count,
+        workers=CONFIG.CLUSTER.workers,
+        heartbeat_interval=CONFIG.CLUSTER.heartbeat_interval,
+        heartbeat_timeout=CONFIG.CLUSTER.heartbeat_timeout,
+        restart_delay=CONFIG.CLUSTER.restart_delay,
+    )
+    supervisor.run()
+
+
+# main function to run the bot
+def main() -> None:
     try:
-        asyncio.run(start())
+        if CONFIG.CLUSTER.enabled:
+            run_cluster()
+        else:
+            run(start())
     except KeyboardInterrupt:
         return
 
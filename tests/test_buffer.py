@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import unittest
+
+from database.buffer import BufferedTable
+
+
+class BufferedTableTest(unittest.TestCase):
+    def test_requeued_rows_are_older_than_pending_ones(self) -> None:
+        table = BufferedTable(
+            "error_reports",
+            ("fingerprint", "occurrences", "first_seen", "last_seen", "last_command"),
+            conflict=("fingerprint",),
+            increment=("occurrences",),
+            preserve=("first_seen",),
+        )
+        table.add(("abc", 2, 1, 1, "old"))
+        failed = table.take()
+
+        table.add(("abc", 3, 5, 5, "new"))
+        table.add(("def", 1, 6, 6, "other"))
+        table.requeue(failed)
+
+        self.assertEqual(
+            sorted(table.take()),
+            [("abc", 5, 1, 5, "new"), ("def", 1, 6, 6, "other")],
+        )
+
+    def test_requeued_rows_are_copied_first(self) -> None:
+        table = BufferedTable("events", ("id", "name"))
+        table.add((1, "a"))
+        failed = table.take()
+
+        table.add((2, "b"))
+        table.requeue(failed)
+        self.assertEqual(table.take(), [(1, "a"), (2, "b")])
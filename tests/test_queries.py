@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import os
+import unittest
+
+from database import QueryRegistry, create_pool
+
+DSN = os.environ.get("FIFI_TEST_DSN")
+
+
+@unittest.skipUnless(DSN, "FIFI_TEST_DSN isn't set to a PostgreSQL database")
+class PreparedQueryTest(unittest.IsolatedAsyncioTestCase):
+    async def test_prepared_queries_outlive_a_release(self) -> None:
+        registry = QueryRegistry()
+        name = registry.register("test.add_one", "SELECT $1::int + 1 AS value")
+        pool = await create_pool(DSN, 1, 1, registry=registry)
+        try:
+            # the single connection goes back to the pool and is acquired again every time.
+            for value in range(3):
+                row = await registry.fetchrow(pool, name, value)
+                self.assertEqual(row["value"], value + 1)
+
+            async with pool.acquire() as connection:
+                self.assertEqual((await registry.fetchrow(connection, name, 9))["value"], 10)
+        finally:
+            await pool.close()
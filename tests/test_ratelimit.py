@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import time
+import unittest
+from pathlib import Path
+
+from core import RateLimited
+from database import QUERIES, LocalDatabase
+from utils.ratelimit import PRUNE_SHARED, Limit, RateLimiter
+
+
+class RateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def hits(self, limiter: RateLimiter, limits: tuple[Limit, ...], count: int, **kwargs) -> int:
+        allowed = 0
+        for _ in range(count):
+            try:
+                await limiter.hit([("cmd", limits, 1.0)], user_id=1, guild_id=5, **kwargs)
+            except RateLimited:
+                continue
+            allowed += 1
+        return allowed
+
+    async def test_stacked_limits_of_the_same_scope(self) -> None:
+        limiter = RateLimiter()
+        burst, sustained = Limit(2, 60), Limit(3, 3600)
+        self.assertEqual(await self.hits(limiter, (burst, sustained), 20), 2)
+        self.assertEqual(len(limiter), 2)
+
+        # the burst refilled, the sustained limit still holds.
+        limiter._buckets[("cmd", "user", 1, 2, 60)].updated -= 60
+        self.assertEqual(await self.hits(limiter, (burst, sustained), 20), 1)
+
+    async def test_refused_use_takes_nothing(self) -> None:
+        limiter = RateLimiter()
+        user, guild = Limit(5, 60), Limit(1, 60, "guild")
+        self.assertEqual(await self.hits(limiter, (user, guild), 3), 1)
+
+        bucket = limiter._buckets[("cmd", "user", 1, 5, 60)]
+        self.assertAlmostEqual(bucket.level(time.monotonic()), 4, places=2)
+
+    async def test_peek_takes_nothing(self) -> None:
+        limiter = RateLimiter()
+        limit = Limit(1, 60)
+        self.assertEqual(await self.hits(limiter, (limit,), 5, take=False), 5)
+        self.assertEqual(await self.hits(limiter, (limit,), 5), 1)
+        with self.assertRaises(RateLimited) as refused:
+            await limiter.hit([("cmd", (limit,), 1.0)], user_id=1, guild_id=5, take=False)
+        self.assertEqual(refused.exception.scope, "user")
+
+    async def test_shared_buckets_are_pruned(self) -> None:
+        db = LocalDatabase()
+        await db.setup(*sorted(Path("database/schemas").glob("*.sql")))
+        limiter = RateLimiter(db, shared_scopes=["global"])
+        limit = Limit(2, 10, "global")
+        self.assertEqual(await self.hits(limiter, (limit,), 3), 2)
+
+        await db.execute("UPDATE ratelimit_buckets SET updated = updated - 11")
+        await QUERIES.execute(db, PRUNE_SHARED, time.time())
+        self.assertEqual(await db.fetch("SELECT * FROM ratelimit_buckets"), [])
+
+    async def test_refused_shared_use_takes_nothing(self) -> None:
+        db = LocalDatabase()
+        await db.setup(*sorted(Path("database/schemas").glob("*.sql")))
+        limiter = RateLimiter(db, shared_scopes=["global"])
+        loose, strict = Limit(5, 60, "global"), Limit(1, 60, "global")
+        self.assertEqual(await self.hits(limiter, (loose, strict), 3), 1)
+
+        row = await db.fetchrow("SELECT tokens FROM ratelimit_buckets WHERE key = $1", "cmd:global:0:5:60")
+        self.assertAlmostEqual(row["tokens"], 4, places=2)
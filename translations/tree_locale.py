@@ -1,20 +1,105 @@
-from threading import local
+from __future__ import annotations
+
+import json
+import marshal
+import logging
+from pathlib import Path
+
 import discord
 from discord import app_commands
 
 
+__all__: tuple[str, ...] = ("TreeTranslator",)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# A compiled catalog maps (locale, context location, message) to the translation.
+# A location of "*" matches a message in any context.
+Catalog = dict[tuple[str, str, str], str]
+
+LOCALES_PATH: Path = Path(__file__).parent / "locales"
+CACHE_PATH: Path = Path(__file__).parent / ".cache" / "catalog.marshal"
+
+# Bump when the compiled format changes so old caches are ignored.
+CACHE_VERSION: int = 1
+
+
 class TreeTranslator(app_commands.Translator):
     """
     This class is a part ot app command translation system. Translate the command name description as per user locale.
+
+    Catalogs are JSON files in ``translations/locales`` named after the locale (e.g. ``ja.json``),
+    mapping a translation context location (e.g. ``command_name`` or ``*`` for any) to the
+    messages and their translation. They are compiled into a single lookup table which is
+    cached on disk until one of the files changes.
     """
 
-    async def load(self):
-        # Not implemented yet
-        ...
+    def __init__(
+        self, locales_path: Path = LOCALES_PATH, cache_path: Path = CACHE_PATH
+    ) -> None:
+        self.locales_path: Path = locales_path
+        self.cache_path: Path = cache_path
+        self._catalog: Catalog = {}
+
+    def _sources(self) -> dict[str, tuple[int, int]]:
+        return {
+            path.name: (path.stat().st_mtime_ns, path.stat().st_size)
+            for path in sorted(self.locales_path.glob("*.json"))
+        }
+
+    def _compile(self) -> Catalog:
+        catalog: Catalog = {}
+        locales = {locale.value for locale in discord.Locale}
+
+        for path in sorted(self.locales_path.glob("*.json")):
+            if path.stem not in locales:
+                _log.warning(f"Skipped catalog {path.name}, {path.stem!r} is not a Discord locale.")
+                continue
+
+            with open(path, "r", encoding="utf-8") as fp:
+                data: dict[str, dict[str, str]] = json.load(fp)
+
+            for location, messages in data.items():
+                for message, translation in messages.items():
+                    catalog[(path.stem, location, message)] = translation
+
+        return catalog
+
+    def _read_cache(self, sources: dict[str, tuple[int, int]]) -> Catalog | None:
+        try:
+            with open(self.cache_path, "rb") as fp:
+                version, cached_sources, catalog = marshal.load(fp)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        if version != CACHE_VERSION or cached_sources != sources:
+            return None
+
+        return catalog
+
+    def _write_cache(self, sources: dict[str, tuple[int, int]], catalog: Catalog) -> None:
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_path, "wb") as fp:
+                marshal.dump((CACHE_VERSION, sources, catalog), fp)
+        except OSError as e:
+            _log.warning(f"Unable to cache the translation catalog: {e}")
+
+    async def load(self) -> None:
+        # Called once when the translator is set on the tree.
+        sources = self._sources()
+        catalog = self._read_cache(sources)
+        if catalog is None:
+            catalog = self._compile()
+            self._write_cache(sources, catalog)
+            _log.info(f"Compiled {len(catalog)} translations from {len(sources)} catalogs.")
+
+        self._catalog = catalog
 
-    async def unload(self):
-        # Not implemented yet
-        ...
+    async def unload(self) -> None:
+        self._catalog = {}
 
     async def translate(
         self,
@@ -34,18 +119,8 @@ class TreeTranslator(app_commands.Translator):
         context : app_commands.TranslationContext
             The origin of this string, eg TranslationContext.command_name, etc
         """
-        print(locale)
-        if locale == discord.Locale.japanese:
-            message_str = str(string.message)
-            print(message_str)
-            if message_str == "testing":
-                return "テスト"
-            elif message_str == "This is a teting command.":
-                return "これはテストコマンドです。"
-
-            elif message_str == "number":
-                return "数字"
-            elif message_str == "This is a number.":
-                return "これは数字です。"
-            
-        return None
+        catalog = self._catalog
+        message = string.message
+        return catalog.get((locale.value, context.location.name, message)) or catalog.get(
+            (locale.value, "*", message)
+        )
@@ -1 +1,3 @@
-from .button.confirmation import ConfirmationView
+from .button.prompt import PromptButton
+from .dispatcher import Prompt, PromptDispatcher
+from .paginator import Paginator, QueryPaginator, TextPaginator
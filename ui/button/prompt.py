@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Any
+
+import discord
+
+if TYPE_CHECKING:
+    from bot import FIFIBot
+
+
+__all__: tuple[str, ...] = ("PromptButton",)
+
+
+class PromptButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"fifi:prompt:(?P<id>[0-9a-f]+):(?P<author>[0-9]+):(?P<choice>[yn])",
+):
+    """
+    A button of a confirmation prompt.
+
+    Everything needed to route a press is in its custom ID, so the buttons of
+    every prompt are handled by the bot's prompt dispatcher, and still get an
+    answer after a restart.
+    """
+
+    def __init__(self, prompt_id: str, author_id: int, choice: bool) -> None:
+        super().__init__(
+            discord.ui.Button(
+                label="Confirm" if choice else "Cancel",
+                style=discord.ButtonStyle.green if choice else discord.ButtonStyle.red,
+                custom_id=f"fifi:prompt:{prompt_id}:{author_id}:{'y' if choice else 'n'}",
+            )
+        )
+        self.prompt_id: str = prompt_id
+        self.author_id: int = author_id
+        self.choice: bool = choice
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction[FIFIBot], item: discord.ui.Item[Any], match: re.Match[str], /
+    ) -> PromptButton:
+        return cls(match["id"], int(match["author"]), match["choice"] == "y")
+
+    async def interaction_check(self, interaction: discord.Interaction[FIFIBot], /) -> bool:
+        if interaction.user.id == self.author_id:
+            return True
+
+        await interaction.response.send_message(
+            "This confirmation prompt is not for you.", ephemeral=True
+        )
+        return False
+
+    async def callback(self, interaction: discord.Interaction[FIFIBot]) -> None:
+        await interaction.client.prompts.resolve(self.prompt_id, self.choice, interaction)
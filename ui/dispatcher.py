@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import heapq
+import asyncio
+import logging
+import secrets
+from typing import TYPE_CHECKING
+
+import discord
+
+from .button.prompt import PromptButton
+
+if TYPE_CHECKING:
+    from bot import FIFIBot
+
+
+__all__: tuple[str, ...] = ("PromptDispatcher", "Prompt")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+class Prompt:
+    """
+    A confirmation prompt waiting for an answer.
+
+    Attributes
+    ----------
+    id : `str`
+        The ID of the prompt, part of the custom ID of its buttons.
+    future : `asyncio.Future[bool | None]`
+        Done with ``True`` if confirmed, ``False`` if denied, ``None`` if it timed out.
+    """
+
+    __slots__: tuple[str, ...] = ("id", "future", "deadline", "delete_after", "message")
+
+    def __init__(self, id: str, future: asyncio.Future[bool | None], deadline: float, delete_after: bool) -> None:
+        self.id: str = id
+        self.future: asyncio.Future[bool | None] = future
+        self.deadline: float = deadline
+        self.delete_after: bool = delete_after
+        # only what's needed to delete the message once the prompt times out.
+        self.message: discord.PartialMessage | discord.InteractionMessage | discord.WebhookMessage | None = None
+
+
+class PromptDispatcher:
+    """
+    Routes the presses of every confirmation prompt to the command waiting on it.
+
+    A prompt is a future and an entry of a heap of deadlines, which a single
+    timer handle of the loop expires in order. The buttons are sent with a
+    stopped view, so nothing is kept in the view store: a press is matched to
+    its prompt by the ID in the button's custom ID.
+
+    Attributes
+    ----------
+    bot : `FIFIBot`
+        The bot the prompts are sent by.
+    """
+
+    __slots__: tuple[str, ...] = ("bot", "_prompts", "_deadlines", "_timer", "_tasks")
+
+    def __init__(self, bot: FIFIBot) -> None:
+        self.bot: FIFIBot = bot
+        self._prompts: dict[str, Prompt] = {}
+        self._deadlines: list[tuple[float, str]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def view(self, prompt: Prompt, author_id: int) -> discord.ui.View:
+        """
+        Create the buttons of a prompt.
+
+        Parameters
+        ----------
+        prompt : `Prompt`
+            The prompt the buttons answer.
+        author_id : `int`
+            The only user who can press them.
+
+        Returns
+        -------
+        discord.ui.View
+            A view to send the prompt with, already stopped so it isn't stored.
+        """
+        view = discord.ui.View(timeout=None)
+        view.add_item(PromptButton(prompt.id, author_id, True))
+        view.add_item(PromptButton(prompt.id, author_id, False))
+        view.stop()
+        return view
+
+    def create(self, *, timeout: float, delete_after: bool) -> Prompt:
+        """
+        Start waiting for an answer.
+
+        Parameters
+        ----------
+        timeout : `float`
+            How long (in seconds) to wait for an answer.
+        delete_after : `bool`
+            Whether the message of the prompt is deleted once it's over.
+
+        Returns
+        -------
+        Prompt
+            The prompt, its future is done once it's answered or timed out.
+        """
+        loop = asyncio.get_running_loop()
+        prompt = Prompt(secrets.token_hex(8), loop.create_future(), loop.time() + timeout, delete_after)
+        self._prompts[prompt.id] = prompt
+
+        # the deadlines of answered prompts are dropped lazily, don't let them pile up.
+        if len(self._deadlines) > 2 * len(self._prompts) + 64:
+            self._deadlines = [entry for entry in self._deadlines if entry[1] in self._prompts]
+            heapq.heapify(self._deadlines)
+
+        heapq.heappush(self._deadlines, (prompt.deadline, prompt.id))
+        self._schedule()
+        return prompt
+
+    def attach(self, prompt: Prompt, message: discord.Message) -> None:
+        """Remember the message of a prompt, to delete it when it times out."""
+        if prompt.future.done() or not prompt.delete_after:
+            return
+
+        if isinstance(message, (discord.InteractionMessage, discord.WebhookMessage)):
+            # ephemeral messages can only be deleted through the interaction.
+            prompt.message = message
+        else:
+            prompt.message = message.channel.get_partial_message(message.id)  # type: ignore[union-attr]
+
+    def discard(self, prompt: Prompt) -> None:
+        """Stop waiting for an answer, e.g. when the prompt couldn't be sent."""
+        self._prompts.pop(prompt.id, None)
+        prompt.future.cancel()
+
+    async def resolve(self, prompt_id: str, value: bool, interaction: discord.Interaction[FIFIBot]) -> None:
+        """
+        Answer a prompt with the press of one of its buttons.
+
+        Parameters
+        ----------
+        prompt_id : `str`
+            The prompt the button belongs to.
+        value : `bool`
+            Whether the button confirms.
+        interaction : `discord.Interaction[FIFIBot]`
+            The press.
+        """
+        prompt = self._prompts.pop(prompt_id, None)
+        if prompt is None:
+            # answered, timed out, or sent before a restart.
+            await interaction.response.edit_message(view=None)
+            await interaction.followup.send("This confirmation prompt is no longer active.", ephemeral=True)
+            return
+
+        if not prompt.future.done():
+            prompt.future.set_result(value)
+
+        await interaction.response.defer()
+        if prompt.delete_after:
+            await interaction.delete_original_response()
+
+    def _schedule(self) -> None:
+        if not self._deadlines:
+            return
+
+        deadline = self._deadlines[0][0]
+        if self._timer is not None:
+            if self._timer.when() <= deadline:
+                return
+            self._timer.cancel()
+
+        self._timer = asyncio.get_running_loop().call_at(deadline, self._expire)
+
+    def _expire(self) -> None:
+        self._timer = None
+        now = asyncio.get_running_loop().time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, prompt_id = heapq.heappop(self._deadlines)
+            prompt = self._prompts.pop(prompt_id, None)
+            if prompt is None:
+                # answered before it timed out.
+                continue
+
+            if not prompt.future.done():
+                prompt.future.set_result(None)
+            if prompt.message is not None:
+                task = asyncio.create_task(self._delete(prompt.message))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        self._schedule()
+
+    async def _delete(self, message: discord.PartialMessage | discord.InteractionMessage | discord.WebhookMessage) -> None:
+        try:
+            await message.delete()
+        except discord.HTTPException as e:
+            _log.debug(f"Failed to delete an expired prompt: {e}")
+
+    def close(self) -> None:
+        """Stop the timer, every prompt still waiting ends as timed out."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        for prompt in self._prompts.values():
+            if not prompt.future.done():
+                prompt.future.set_result(None)
+        self._prompts.clear()
+        self._deadlines.clear()
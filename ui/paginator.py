@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+import discord
+
+from database import QUERIES
+
+if TYPE_CHECKING:
+    from _typings import Context
+    from database import DatabaseProtocol
+
+
+__all__: tuple[str, ...] = ("Paginator", "TextPaginator", "QueryPaginator")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+Page = str | discord.Embed
+
+
+class Paginator(discord.ui.View, abc.ABC):
+    """
+    A view flipping through pages which are only made when they are shown.
+
+    Subclasses implement :meth:`get_page` and, when they know it, :attr:`page_count`.
+
+    Attributes
+    ----------
+    author_id : `int`
+        The only user who can flip the pages.
+    index : `int`
+        The page being shown.
+    message : `discord.Message | None`
+        The message the paginator is shown on.
+    """
+
+    def __init__(self, *, author_id: int, timeout: float | None = 180.0) -> None:
+        super().__init__(timeout=timeout)
+        self.author_id: int = author_id
+        self.index: int = 0
+        self.message: discord.Message | None = None
+
+    @property
+    def page_count(self) -> int | None:
+        """The number of pages, ``None`` if it isn't known."""
+        return None
+
+    @abc.abstractmethod
+    async def get_page(self, index: int) -> Page | None:
+        """
+        Make a page.
+
+        Parameters
+        ----------
+        index : `int`
+            The page to make, starting at 0.
+
+        Returns
+        -------
+        str | discord.Embed | None
+            The page, ``None`` if there is no such page.
+        """
+
+    async def close(self) -> None:
+        """Release what the pages were made from, called once the paginator stops."""
+
+    def _kwargs(self, page: Page) -> dict[str, Any]:
+        self._update_buttons()
+        if isinstance(page, discord.Embed):
+            return {"content": None, "embed": page, "view": self}
+        return {"content": page, "embeds": [], "view": self}
+
+    def _update_buttons(self) -> None:
+        count = self.page_count
+        self.first.disabled = self.previous.disabled = self.index == 0
+        self.next.disabled = count is not None and self.index >= count - 1
+        self.last.disabled = count is None or self.index >= count - 1
+        self.counter.label = f"{self.index + 1}/{'?' if count is None else count}"
+
+    async def start(self, ctx: Context, *, ephemeral: bool = False) -> discord.Message | None:
+        """
+        Show the first page.
+
+        Parameters
+        ----------
+        ctx : `Context`
+            Where to show the paginator.
+        ephemeral : `bool`
+            Whether only the author can see it, for interactions.
+
+        Returns
+        -------
+        discord.Message | None
+            The message shown, ``None`` if there are no pages.
+        """
+        page = await self.get_page(0)
+        if page is None:
+            await self._stop()
+            return None
+
+        if self.page_count == 1:
+            # nothing to flip through.
+            await self._stop()
+            kwargs = self._kwargs(page)
+            kwargs.pop("view")
+            return await ctx.send(**kwargs, ephemeral=ephemeral)
+
+        self.message = await ctx.send(**self._kwargs(page), ephemeral=ephemeral)
+        return self.message
+
+    async def show(self, interaction: discord.Interaction, index: int) -> None:
+        page = await self.get_page(index)
+        if page is None:
+            # there is no page after all, e.g. the last one was exactly full.
+            self.next.disabled = True
+            await interaction.response.edit_message(view=self)
+            return
+
+        self.index = index
+        await interaction.response.edit_message(**self._kwargs(page))
+
+    async def refresh(self) -> None:
+        """Show the current page again, e.g. after the page count changed."""
+        if self.message is None or self.is_finished():
+            return
+
+        page = await self.get_page(self.index)
+        if page is not None:
+            try:
+                await self.message.edit(**self._kwargs(page))
+            except discord.HTTPException as e:
+                _log.debug(f"Failed to refresh a paginator: {e}")
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id == self.author_id:
+            return True
+
+        await interaction.response.send_message("This paginator is not for you.", ephemeral=True)
+        return False
+
+    async def _stop(self) -> None:
+        self.stop()
+        await self.close()
+
+    async def on_timeout(self) -> None:
+        await self.close()
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(label="≪", style=discord.ButtonStyle.grey)
+    async def first(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self.show(interaction, 0)
+
+    @discord.ui.button(label="‹", style=discord.ButtonStyle.blurple)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self.show(interaction, max(0, self.index - 1))
+
+    @discord.ui.button(label="1/?", style=discord.ButtonStyle.grey, disabled=True)
+    async def counter(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        pass
+
+    @discord.ui.button(label="›", style=discord.ButtonStyle.blurple)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self.show(interaction, self.index + 1)
+
+    @discord.ui.button(label="≫", style=discord.ButtonStyle.grey)
+    async def last(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        count = self.page_count
+        if count is not None:
+            await self.show(interaction, count - 1)
+
+    @discord.ui.button(label="✕", style=discord.ButtonStyle.red)
+    async def quit(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await interaction.response.edit_message(view=None)
+        await self._stop()
+
+
+class TextPaginator(Paginator):
+    """
+    A paginator over pages of text, which can still be added while it's shown.
+
+    Attributes
+    ----------
+    pages : `list[str]`
+        The pages added so far.
+    complete : `bool`
+        Whether every page was added.
+    """
+
+    def __init__(self, pages: list[str] | None = None, *, author_id: int, timeout: float | None = 180.0) -> None:
+        super().__init__(author_id=author_id, timeout=timeout)
+        self.pages: list[str] = pages or []
+        self.complete: bool = pages is not None
+
+    @property
+    def page_count(self) -> int | None:
+        return len(self.pages) if self.complete else None
+
+    async def get_page(self, index: int) -> Page | None:
+        if index < len(self.pages):
+            return self.pages[index]
+        return None
+
+    def add_page(self, page: str) -> None:
+        self.pages.append(page)
+
+
+class QueryPaginator(Paginator):
+    """
+    A paginator over the rows of a query, fetched a page at a time with keyset
+    pagination.
+
+    Two named queries make the pages. ``first`` gets the first rows, ``after``
+    gets the rows following a key. Both take ``args`` followed by the number of
+    rows as their last parameter, ``after`` takes the values of the key columns
+    in between, e.g.::
+
+        SELECT ... WHERE guild_id = $1 ORDER BY score DESC, user_id DESC LIMIT $2
+        SELECT ... WHERE guild_id = $1 AND (score, user_id) < ($2, $3)
+            ORDER BY score DESC, user_id DESC LIMIT $4
+
+    Only the rows of the page shown and of its neighbours are held, the next
+    page is fetched in the background while the page is read. Every page is a query of
+    its own, no connection is held between them.
+
+    Attributes
+    ----------
+    db : `DatabaseProtocol`
+        The database the rows are fetched from.
+    per_page : `int`
+        The number of rows of a page.
+    """
+
+    def __init__(
+        self,
+        db: DatabaseProtocol,
+        first: str,
+        after: str,
+        *args: Any,
+        key: Sequence[str],
+        formatter: Callable[[Sequence[Any], int], Page],
+        per_page: int = 10,
+        author_id: int,
+        timeout: float | None = 180.0,
+    ) -> None:
+        super().__init__(author_id=author_id, timeout=timeout)
+        self.db: DatabaseProtocol = db
+        self.per_page: int = per_page
+
+        self._first: str = first
+        self._after: str = after
+        self._args: tuple[Any, ...] = args
+        self._key: tuple[str, ...] = tuple(key)
+        self._formatter: Callable[[Sequence[Any], int], Page] = formatter
+
+        # the key each page starts after, known for every page reached so far.
+        self._starts: list[tuple[Any, ...] | None] = [None]
+        self._count: int | None = None
+        self._pages: dict[int, asyncio.Task[list[Any]]] = {}
+
+    @property
+    def page_count(self) -> int | None:
+        return self._count
+
+    async def _fetch(self, index: int) -> list[Any]:
+        start = self._starts[index]
+        # one row more than a page tells whether there is a page after it.
+        if start is None:
+            rows = await QUERIES.fetch(self.db, self._first, *self._args, self.per_page + 1)
+        else:
+            rows = await QUERIES.fetch(self.db, self._after, *self._args, *start, self.per_page + 1)
+
+        if len(rows) > self.per_page:
+            rows = rows[: self.per_page]
+            if len(self._starts) == index + 1:
+                self._starts.append(tuple(rows[-1][k] for k in self._key))
+        else:
+            self._count = index + 1 if rows or index == 0 else index
+        return rows
+
+    def _load(self, index: int) -> asyncio.Task[list[Any]]:
+        task = self._pages.get(index)
+        if task is None:
+            task = self._pages[index] = asyncio.ensure_future(self._fetch(index))
+        return task
+
+    async def get_page(self, index: int) -> Page | None:
+        if index >= len(self._starts) or (self._count is not None and index >= self._count):
+            return None
+
+        try:
+            rows = await self._load(index)
+        except Exception:
+            self._pages.pop(index, None)
+            raise
+
+        if not rows and index > 0:
+            return None
+
+        # keep the page shown and its neighbours, start fetching the next one.
+        for cached in [i for i in self._pages if abs(i - index) > 1]:
+            self._pages.pop(cached).cancel()
+        if index + 1 < len(self._starts):
+            self._load(index + 1)
+
+        return self._formatter(rows, index)
+
+    async def close(self) -> None:
+        for task in self._pages.values():
+            task.cancel()
+        self._pages.clear()
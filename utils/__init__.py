@@ -0,0 +1,6 @@
+from .tree_sync import SyncOutcome, SyncReport, TreeSyncer
+from .prefix import PrefixMatcher
+from .http import RetryBudget, WebClient, WebResponse
+from .stream import AttachmentSpool, paginate_stream
+from .ratelimit import Limit, RateLimiter, TimingWheel, command_uses, ratelimit
+from .cache import CacheReport, FetchCache, cache_options
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import sys
+import time
+import asyncio
+import itertools
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, TypeVar
+
+import discord
+
+from .metrics import METRICS
+
+if TYPE_CHECKING:
+    from core.config import CacheConfig
+
+
+__all__: tuple[str, ...] = ("FetchCache", "CacheReport", "cache_options")
+
+
+T = TypeVar("T")
+CacheKey = tuple[int, int]
+
+FETCH_CACHE = METRICS.counter(
+    "fifi_fetch_cache_total",
+    "Members and users missing from the gateway cache by how they were found.",
+    ("kind", "result"),
+)
+
+# Values counted as part of an object, anything else is an object of its own.
+_PLAIN: tuple[type, ...] = (str, bytes, int, float, tuple, list, dict, set, frozenset, array)
+
+
+def cache_options(config: CacheConfig, intents: discord.Intents) -> dict[str, Any]:
+    """
+    Get the client options of a cache profile.
+
+    Parameters
+    ----------
+    config : `CacheConfig`
+        The cache profile.
+    intents : `discord.Intents`
+        The intents of the client, the member cache can't hold more than they allow.
+
+    Returns
+    -------
+    dict[str, Any]
+        The ``max_messages``, ``member_cache_flags`` and ``chunk_guilds_at_startup`` options.
+    """
+    if config.members == "all":
+        flags = discord.MemberCacheFlags.from_intents(intents)
+    elif config.members == "voice":
+        flags = discord.MemberCacheFlags.none()
+        flags.voice = intents.voice_states
+    elif config.members == "none":
+        flags = discord.MemberCacheFlags.none()
+    else:
+        raise ValueError(f"Unknown member cache {config.members!r}, expected all, voice or none")
+
+    return {
+        "max_messages": config.max_messages or None,
+        "member_cache_flags": flags,
+        # chunking fills the member cache of every guild, only worth it when it keeps them.
+        "chunk_guilds_at_startup": config.chunk_guilds_at_startup and intents.members and flags.joined,
+    }
+
+
+class FetchCache:
+    """
+    Members and users missing from the gateway cache, fetched when asked for.
+
+    Fetched entries are bounded in number (least recently used are evicted
+    first) and in age, everyone asking for the same entry at once shares a single
+    request.
+
+    Attributes
+    ----------
+    max_size : `int`
+        The maximum number of entries kept.
+    ttl : `float`
+        How long (in seconds) an entry is kept before it's fetched again.
+    """
+
+    __slots__: tuple[str, ...] = ("max_size", "ttl", "_entries", "_inflight")
+
+    def __init__(self, *, max_size: int = 1000, ttl: float = 300.0) -> None:
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self._entries: OrderedDict[CacheKey, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[CacheKey, asyncio.Future[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def values(self) -> list[Any]:
+        return [value for _, value in self._entries.values()]
+
+    def discard(self, user_id: int, guild_id: int = 0) -> None:
+        """Drop an entry, e.g. once the member left the guild."""
+        self._entries.pop((guild_id, user_id), None)
+
+    def _store(self, key: CacheKey, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _fetch(self, key: CacheKey, kind: str, fetch: Callable[[], Awaitable[T]]) -> T | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                FETCH_CACHE.inc(kind, "hit")
+                return value
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is None:
+            FETCH_CACHE.inc(kind, "fetch")
+            future = self._inflight[key] = asyncio.ensure_future(fetch())
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        try:
+            value = await asyncio.shield(future)
+        except discord.NotFound:
+            return None
+
+        # the first one back stores it, the others would only move it to the end again.
+        if key not in self._entries:
+            self._store(key, value)
+        return value
+
+    async def member(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        """
+        Get a member from the guild's cache, or fetch it if it isn't there.
+
+        Parameters
+        ----------
+        guild : `discord.Guild`
+            The guild of the member.
+        user_id : `int`
+            The ID of the member.
+
+        Returns
+        -------
+        discord.Member | None
+            The member, ``None`` if the user isn't in the guild.
+        """
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        return await self._fetch((guild.id, user_id), "member", lambda: guild.fetch_member(user_id))
+
+    async def user(self, client: discord.Client, user_id: int) -> discord.User | None:
+        """
+        Get a user from the client's cache, or fetch it if it isn't there.
+
+        Parameters
+        ----------
+        client : `discord.Client`
+            The client to get the user with.
+        user_id : `int`
+            The ID of the user.
+
+        Returns
+        -------
+        discord.User | None
+            The user, ``None`` if there is no such user.
+        """
+        user = client.get_user(user_id)
+        if user is not None:
+            return user
+        return await self._fetch((0, user_id), "user", lambda: client.fetch_user(user_id))
+
+
+@lru_cache(maxsize=None)
+def _slots(cls: type) -> tuple[str, ...]:
+    names: list[str] = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return tuple(names)
+
+
+def _shallow_size(obj: Any) -> int:
+    # the object and its plain values, objects it refers to are counted on their own.
+    size = sys.getsizeof(obj)
+    values = (getattr(obj, name, None) for name in _slots(type(obj)))
+    if hasattr(obj, "__dict__"):
+        values = itertools.chain(values, vars(obj).values())
+    for value in values:
+        if isinstance(value, _PLAIN):
+            size += sys.getsizeof(value)
+    return size
+
+
+def _average_size(objects: Iterable[Any], sample: int) -> float:
+    sizes = [_shallow_size(obj) for obj in itertools.islice(objects, sample)]
+    return sum(sizes) / len(sizes) if sizes else 0.0
+
+
+class CacheReport:
+    """
+    The size of the gateway cache, the bytes are estimated from a sample of each
+    kind of entry.
+
+    Attributes
+    ----------
+    totals : `dict[str, tuple[int, int]]`
+        The number of entries and approximate bytes of each kind of entry.
+    guilds : `list[tuple[discord.Guild, int]]`
+        Every guild with the approximate bytes of its entries, the largest first.
+    """
+
+    __slots__: tuple[str, ...] = ("totals", "guilds")
+
+    def __init__(self, totals: dict[str, tuple[int, int]], guilds: list[tuple[discord.Guild, int]]) -> None:
+        self.totals: dict[str, tuple[int, int]] = totals
+        self.guilds: list[tuple[discord.Guild, int]] = guilds
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self.totals.values())
+
+    @classmethod
+    def collect(cls, client: discord.Client, fetched: FetchCache | None = None, *, sample: int = 64) -> CacheReport:
+        """
+        Measure the cache of a client.
+
+        Parameters
+        ----------
+        client : `discord.Client`
+            The client to measure.
+        fetched : `FetchCache | None`
+            The members and users fetched on demand, counted along with the cache.
+        sample : `int`
+            The number of entries of each kind measured.
+
+        Returns
+        -------
+        CacheReport
+            The report.
+        """
+        guilds = client.guilds
+        messages = client.cached_messages
+        users = client.users
+
+        # members are spread over the guilds, sample a few of each.
+        per_guild = max(1, sample // max(1, len(guilds)))
+        member_size = _average_size(
+            itertools.chain.from_iterable(itertools.islice(g.members, per_guild) for g in guilds), sample
+        )
+        channel_size = _average_size(itertools.chain.from_iterable(g.channels for g in guilds), sample)
+        role_size = _average_size(itertools.chain.from_iterable(g.roles for g in guilds), sample)
+        message_size = _average_size(reversed(messages), sample)
+        user_size = _average_size(users, sample)
+        guild_size = _average_size(guilds, sample)
+
+        message_counts: dict[int | None, int] = {}
+        for message in messages:
+            guild_id = message.guild and message.guild.id
+            message_counts[guild_id] = message_counts.get(guild_id, 0) + 1
+
+        sizes: list[tuple[discord.Guild, int]] = []
+        members = channels = roles = 0
+        for guild in guilds:
+            counts = (len(guild.members), len(guild.channels), len(guild.roles))
+            members, channels, roles = members + counts[0], channels + counts[1], roles + counts[2]
+            size = (
+                guild_size
+                + counts[0] * member_size
+                + counts[1] * channel_size
+                + counts[2] * role_size
+                + message_counts.get(guild.id, 0) * message_size
+            )
+            sizes.append((guild, int(size)))
+        sizes.sort(key=lambda item: item[1], reverse=True)
+
+        totals: dict[str, tuple[int, int]] = {
+            "guilds": (len(guilds), int(len(guilds) * guild_size)),
+            "members": (members, int(members * member_size)),
+            "channels": (channels, int(channels * channel_size)),
+            "roles": (roles, int(roles * role_size)),
+            "messages": (len(messages), int(len(messages) * message_size)),
+            "users": (len(users), int(len(users) * user_size)),
+        }
+        if fetched is not None:
+            entries = fetched.values()
+            totals["fetched"] = (len(entries), int(len(entries) * _average_size(entries, sample)))
+
+        return cls(totals, sizes)
@@ -1,2 +1,2 @@
 from .packet_manager import PacketManager
-
+from .webhook_queue import WebhookQueue
@@ -1,23 +1,28 @@
 from __future__ import annotations
 
+import random
+import asyncio
+import hashlib
 import logging
 import discord
 import traceback
 from datetime import datetime
-from collections import defaultdict
+from collections import OrderedDict
 from typing import (
     TYPE_CHECKING,
     Any,
     Generator,
     TypeAlias,
-    DefaultDict,
 )
 
+from _typings import Context
+from core import CONFIG
+from database import ErrorStore
+from .webhook_queue import WebhookQueue
+
 
 if TYPE_CHECKING:
     from bot import FIFIBot
-    from context import Context
-    from core import CONFIG
 
 
 Traceback: TypeAlias = dict[str, Any]
@@ -26,39 +31,188 @@ Traceback: TypeAlias = dict[str, Any]
 _log: logging.Logger = logging.getLogger(__name__)
 
 
-__all__: tuple[str, ...] = ("PacketManager",)
+__all__: tuple[str, ...] = ("PacketManager", "ErrorGroup")
+
+
+def fingerprint(error: BaseException) -> str:
+    """
+    Fingerprint an error by its type and the frames it was raised through.
+
+    Line numbers are left out so an error keeps its fingerprint when unrelated
+    code of the same file moves around.
+
+    Parameters
+    ----------
+    error: `BaseException`
+        The error to fingerprint.
+
+    Returns
+    -------
+    str
+        A short hexadecimal fingerprint.
+    """
+    parts: list[str] = []
+    current: BaseException | None = error
+    seen: set[int] = set()
+    # the chained errors are part of what makes the failure, e.g. a CommandInvokeError wrapping it.
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        parts.append(f"{type(current).__module__}.{type(current).__qualname__}")
+        for frame in traceback.extract_tb(current.__traceback__):
+            parts.append(f"{frame.filename}:{frame.name}:{(frame.line or '').strip()}")
+        current = current.__cause__ or current.__context__
+
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+
+class ErrorGroup:
+    """
+    Every occurrence of the same error.
+
+    Attributes
+    ----------
+    fingerprint: `str`
+        The fingerprint shared by the occurrences.
+    name: `str`
+        The name of the error type.
+    traceback: `str`
+        The formatted traceback of the first occurrence.
+    count: `int`
+        How many times the error occurred.
+    pending: `int`
+        How many times the error occurred since it was last reported.
+    first_seen: `datetime`
+        When the error first occurred.
+    last_seen: `datetime`
+        When the error last occurred.
+    samples: `list[Traceback]`
+        A uniform sample of the occurrences since the error was last reported.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "fingerprint",
+        "name",
+        "traceback",
+        "count",
+        "pending",
+        "first_seen",
+        "last_seen",
+        "reported_at",
+        "samples",
+        "_sample_size",
+    )
+
+    def __init__(
+        self, fingerprint: str, name: str, traceback: str, *, sample_size: int = 5
+    ) -> None:
+        self.fingerprint: str = fingerprint
+        self.name: str = name
+        self.traceback: str = traceback
+        self.count: int = 0
+        self.pending: int = 0
+        self.first_seen: datetime = discord.utils.utcnow()
+        self.last_seen: datetime = self.first_seen
+        self.reported_at: float = 0.0
+        self.samples: list[Traceback] = []
+        self._sample_size: int = sample_size
+
+    def add(self, packet: Traceback) -> None:
+        self.count += 1
+        self.pending += 1
+        self.last_seen = packet["time"]
+
+        # the exception keeps every frame of its traceback alive, don't hold on to it.
+        packet = {k: v for k, v in packet.items() if k != "exception"}
+
+        # reservoir sampling, every occurrence of the window is as likely to be kept.
+        if len(self.samples) < self._sample_size:
+            self.samples.append(packet)
+        else:
+            index = random.randrange(self.pending)
+            if index < self._sample_size:
+                self.samples[index] = packet
+
+    def reset_window(self, now: float) -> None:
+        self.pending = 0
+        self.reported_at = now
+        self.samples.clear()
+
+    def __repr__(self) -> str:
+        return f"<ErrorGroup fingerprint={self.fingerprint} name={self.name} count={self.count}>"
 
 
 class PacketManager:
     """An extension to the error handler that keeps track of errors and sends them to a webhook.
 
+    Errors are grouped by fingerprint. The first occurrence of an error is sent
+    right away, the ones after it are counted and sent as a summary at most once
+    per cooldown. Every occurrence is also recorded in the error store, if any.
+
     Attributes
     ----------
     bot: FIFIBot
         The bot instance.
-    errors: DefaultDict[str, list[Traceback]]
-        A mapping of trace backs to their error information.
+    cooldown: float
+        The minimum time (in seconds) between two reports of the same error.
+    max_errors: int
+        The maximum number of error groups kept, the least recently seen are dropped first.
+    errors: OrderedDict[str, ErrorGroup]
+        A mapping of fingerprints to their error group.
+    queue: WebhookQueue | None
+        The reports waiting to be delivered to the webhook, ``None`` if no webhook is configured.
+    store: ErrorStore | None
+        Where the occurrences are persisted.
     """
 
     __slots__: tuple[str, ...] = (
         "bot",
         "cooldown",
+        "max_errors",
         "_lock",
         "_most_recent",
+        "_task",
         "errors",
         "_code_blocker",
         "_error_webhook",
+        "queue",
+        "store",
     )
 
-    def __init__(self, bot: FIFIBot) -> None:
+    def __init__(
+        self,
+        bot: FIFIBot,
+        *,
+        cooldown: float = 300.0,
+        max_errors: int = 256,
+        max_queue: int = 100,
+        store: ErrorStore | None = None,
+    ) -> None:
         self.bot: FIFIBot = bot
+        self.cooldown: float = cooldown
+        self.max_errors: int = max_errors
 
-        self.errors: DefaultDict[str, list[Traceback]] = defaultdict(list)
+        self.errors: OrderedDict[str, ErrorGroup] = OrderedDict()
+        self._most_recent: ErrorGroup | None = None
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
 
         self._code_blocker: str = "```py\n{}```"
-        self._error_webhook: discord.Webhook = discord.Webhook.from_url(
-            CONFIG.BOT.exception_webhook, session=bot.session, bot_token=bot.http.token
-        )
+        self.store: ErrorStore | None = store
+
+        self._error_webhook: discord.Webhook | None = None
+        self.queue: WebhookQueue | None = None
+        if CONFIG.BOT.exception_webhook:
+            self._error_webhook = discord.Webhook.from_url(
+                CONFIG.BOT.exception_webhook, session=bot.session, bot_token=bot.http.token
+            )
+            self.queue = WebhookQueue(
+                self._get_webhook, send_kwargs=self._send_kwargs, max_size=max_queue
+            )
+
+    @property
+    def most_recent(self) -> ErrorGroup | None:
+        """The error group which occurred last."""
+        return self._most_recent
 
     def _yield_code_chunks(
         self, iterable: str, *, chunks: int = 2000
@@ -70,8 +224,25 @@ class PacketManager:
                 iterable[i : i + chunks - code_blocker_size]
             )
 
-    async def _release_error(self, traceback_str: str, packet: Traceback) -> None:
+    def _send_kwargs(self) -> dict[str, Any]:
+        kwargs: dict[str, Any] = {}
+        if self.bot.user:
+            kwargs["username"] = self.bot.user.display_name
+            kwargs["avatar_url"] = self.bot.user.display_avatar.url
+        return kwargs
+
+    async def _get_webhook(self) -> discord.Webhook:
+        async with self._lock:
+            webhook = self._error_webhook
+            assert webhook is not None
+            if webhook.is_partial():
+                self._error_webhook = webhook = await self._error_webhook.fetch()
+            return webhook
+
+    def _release_error(self, group: ErrorGroup, packet: Traceback) -> None:
         _log.error("Releasing error to log", exc_info=packet["exception"])
+        if self.queue is None:
+            return
 
         embed = discord.Embed(
             title=f'An error has occurred in {packet["command"]}',
@@ -81,26 +252,17 @@ class PacketManager:
             name="Metadata",
             value="\n".join([f"**{k.title()}**: {v}" for k, v in packet.items()]),
         )
+        embed.set_footer(text=f"Fingerprint {group.fingerprint}")
 
-        kwargs: dict[str, Any] = {}
         if self.bot.user:
-            kwargs["username"] = self.bot.user.display_name
-            kwargs["avatar_url"] = self.bot.user.display_avatar.url
-
             embed.set_author(
                 name=str(self.bot.user), icon_url=self.bot.user.display_avatar.url
             )
 
-        webhook = self._error_webhook
-        if webhook.is_partial():
-            self._error_webhook = webhook = await self._error_webhook.fetch()
-
-        code_chunks = list(self._yield_code_chunks(traceback_str))
-
+        code_chunks = list(self._yield_code_chunks(group.traceback))
         embed.description = code_chunks.pop(0)
-        await webhook.send(embed=embed, **kwargs)
 
-        embeds: list[discord.Embed] = []
+        embeds: list[discord.Embed] = [embed]
         for entry in code_chunks:
             embed = discord.Embed(description=entry)
             if self.bot.user:
@@ -110,12 +272,78 @@ class PacketManager:
 
             embeds.append(embed)
 
-            if len(embeds) == 10:
-                await webhook.send(embeds=embeds, **kwargs)
-                embeds = []
+        if not self.queue.put(embeds):
+            _log.warning(f"Error delivery queue is full, dropped the report of {group!r}")
+
+    def _summary_embed(self, group: ErrorGroup) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"{group.name} occurred {group.pending} more times",
+            description=f"{group.count} times in total since {discord.utils.format_dt(group.first_seen)}.",
+            timestamp=group.last_seen,
+        )
+        for i, sample in enumerate(group.samples, start=1):
+            embed.add_field(
+                name=f"Sample {i}",
+                value="\n".join([f"**{k.title()}**: {v}" for k, v in sample.items()])[:1024],
+                inline=False,
+            )
+        embed.set_footer(text=f"Fingerprint {group.fingerprint}")
+        return embed
+
+    def release_summaries(self, *, force: bool = False) -> None:
+        """
+        Send a summary of every error which occurred again since it was last reported.
 
-        if embeds:
-            await webhook.send(embeds=embeds, **kwargs)
+        Parameters
+        ----------
+        force: `bool`
+            Whether to send the summaries whose cooldown isn't over yet.
+        """
+        now = asyncio.get_running_loop().time()
+        due = [
+            group
+            for group in self.errors.values()
+            if group.pending and (force or now - group.reported_at >= self.cooldown)
+        ]
+        if not due:
+            return
+
+        for group in due:
+            # one report per group, the queue packs them into as few messages as it can.
+            if self.queue is not None and not self.queue.put([self._summary_embed(group)]):
+                _log.warning(f"Error delivery queue is full, dropped the summary of {group!r}")
+            group.reset_window(now)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.cooldown)
+            try:
+                self.release_summaries()
+                if self.store is not None:
+                    await self.store.prune()
+            except Exception:
+                _log.exception("Failed to release error summaries")
+
+    def _record(self, error: BaseException, packet: Traceback) -> tuple[ErrorGroup, bool]:
+        key = fingerprint(error)
+        group = self.errors.get(key)
+        first = group is None
+        if group is None:
+            traceback_string = "".join(
+                traceback.format_exception(type(error), error, error.__traceback__)
+            )
+            group = ErrorGroup(key, type(error).__name__, traceback_string)
+            self.errors[key] = group
+            while len(self.errors) > self.max_errors:
+                _, dropped = self.errors.popitem(last=False)
+                if dropped.pending:
+                    _log.warning(f"Dropped {dropped.pending} unreported occurrences of {dropped!r}")
+        else:
+            self.errors.move_to_end(key)
+
+        group.add(packet)
+        self._most_recent = group
+        return group, first
 
     async def add_error(
         self,
@@ -138,7 +366,7 @@ class PacketManager:
         """
         _log.info(f"Adding error {str(error)} to log.")
 
-        created: datetime.datetime = discord.utils.utcnow()
+        created: datetime = discord.utils.utcnow()
         author: discord.Member | discord.User | None = None
 
         if target is not None:
@@ -168,9 +396,34 @@ class PacketManager:
             }
             packet.update(addons)
 
-        traceback_string = "".join(
-            traceback.format_exception(type(error), error, error.__traceback__)
-        )
-        self.errors[traceback_string].append(packet)
+        group, first = self._record(error, packet)
+
+        if self.store is not None:
+            self.store.record(
+                group.fingerprint,
+                group.name,
+                group.traceback,
+                time=created,
+                command=target and target.command and target.command.qualified_name,
+                guild_id=target and target.guild and target.guild.id,
+            )
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        if not first:
+            # counted, it goes out with the next summary.
+            return
+
+        group.reset_window(asyncio.get_running_loop().time())
+        self._release_error(group, packet)
+
+    async def close(self) -> None:
+        """Stop the summaries and deliver everything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
 
-        await self._release_error(traceback_string, packet)
+        self.release_summaries(force=True)
+        if self.queue is not None:
+            await self.queue.close()
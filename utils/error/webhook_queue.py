@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+import discord
+
+
+__all__: tuple[str, ...] = ("WebhookQueue",)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# Discord limits of a single message.
+MAX_EMBEDS: int = 10
+MAX_EMBED_CHARACTERS: int = 6000
+
+
+class WebhookQueue:
+    """
+    A bounded queue of embeds delivered to a webhook in the background.
+
+    Reports are packed into as few messages as possible. When the queue is full
+    new reports are dropped and a note of how many were lost is sent with the
+    next message instead.
+
+    Attributes
+    ----------
+    max_size: `int`
+        The maximum number of reports waiting to be sent.
+    interval: `float`
+        The minimum time (in seconds) between two messages. A webhook shares the
+        rate limit of its channel, 30 messages a minute, which the library only
+        learns about once it's hit.
+    dropped: `int`
+        How many reports were dropped since the last message.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "max_size",
+        "interval",
+        "dropped",
+        "_get_webhook",
+        "_send_kwargs",
+        "_reports",
+        "_ready",
+        "_task",
+    )
+
+    def __init__(
+        self,
+        get_webhook: Callable[[], Awaitable[discord.Webhook]],
+        *,
+        send_kwargs: Callable[[], dict[str, Any]] = dict,
+        max_size: int = 100,
+        interval: float = 2.0,
+    ) -> None:
+        self.max_size: int = max_size
+        self.interval: float = interval
+        self.dropped: int = 0
+
+        self._get_webhook: Callable[[], Awaitable[discord.Webhook]] = get_webhook
+        self._send_kwargs: Callable[[], dict[str, Any]] = send_kwargs
+        self._reports: deque[list[discord.Embed]] = deque()
+        self._ready: asyncio.Event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._reports)
+
+    def put(self, embeds: list[discord.Embed]) -> bool:
+        """
+        Queue a report to be sent, without waiting for it.
+
+        Parameters
+        ----------
+        embeds: `list[discord.Embed]`
+            The embeds of the report, sent in order.
+
+        Returns
+        -------
+        bool
+            Whether the report was queued, ``False`` if the queue was full.
+        """
+        if len(self._reports) >= self.max_size:
+            self.dropped += 1
+            return False
+
+        self._reports.append(embeds)
+        self._ready.set()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return True
+
+    def _dropped_embed(self) -> discord.Embed:
+        return discord.Embed(
+            title=f"Dropped {self.dropped} error reports",
+            description="The delivery queue was full, check the logs for the lost reports.",
+            colour=discord.Colour.orange(),
+        )
+
+    def _pack(self) -> list[discord.Embed]:
+        # take whole reports while they fit, a report larger than a message is split over several.
+        embeds: list[discord.Embed] = []
+        characters = 0
+
+        if self.dropped:
+            embeds.append(self._dropped_embed())
+            characters += len(embeds[0])
+            self.dropped = 0
+
+        while self._reports:
+            report = self._reports[0]
+            size = sum(len(embed) for embed in report)
+            fits = len(embeds) + len(report) <= MAX_EMBEDS and characters + size <= MAX_EMBED_CHARACTERS
+            if embeds and not fits:
+                break
+
+            self._reports.popleft()
+            for i, embed in enumerate(report):
+                if embeds and (
+                    len(embeds) == MAX_EMBEDS or characters + len(embed) > MAX_EMBED_CHARACTERS
+                ):
+                    # the rest of the report goes first in the next message.
+                    self._reports.appendleft(report[i:])
+                    return embeds
+                embeds.append(embed)
+                characters += len(embed)
+
+        return embeds
+
+    async def _send(self, embeds: list[discord.Embed]) -> None:
+        try:
+            webhook = await self._get_webhook()
+            await webhook.send(embeds=embeds, **self._send_kwargs())
+        except discord.HTTPException as e:
+            # the library already waited out 429s, whatever is left won't go through on a retry.
+            _log.error(f"Failed to deliver {len(embeds)} error embeds: {e}")
+        except Exception:
+            # e.g. a connection error, the worker has to keep going for the reports after these.
+            _log.exception(f"Failed to deliver {len(embeds)} error embeds")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._ready.wait()
+            started = loop.time()
+
+            embeds = self._pack()
+            if not self._reports:
+                self._ready.clear()
+            if embeds:
+                await self._send(embeds)
+
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    async def close(self, *, timeout: float = 10.0) -> None:
+        """
+        Stop the worker, sending what is still queued first.
+
+        Parameters
+        ----------
+        timeout: `float`
+            How long (in seconds) to keep sending before giving up on the rest.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        async def drain() -> None:
+            while self._reports or self.dropped:
+                await self._send(self._pack())
+
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            _log.warning(f"Gave up delivering {len(self._reports)} error reports")
@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Mapping
+
+import aiohttp
+from multidict import CIMultiDictProxy
+from yarl import URL
+
+from database.codecs import loads
+from .metrics import METRICS
+
+
+__all__: tuple[str, ...] = ("WebClient", "WebResponse", "RetryBudget")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# Statuses worth trying again, the rest won't change on a retry.
+RETRY_STATUSES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+# Methods which can be sent twice without doing something twice.
+IDEMPOTENT_METHODS: frozenset[str] = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+WEB_CACHE = METRICS.counter(
+    "fifi_web_cache_total",
+    "Cacheable requests of the web client by how they were answered.",
+    ("host", "result"),
+)
+WEB_RETRIES = METRICS.counter(
+    "fifi_web_retries_total", "Requests of the web client sent again.", ("host",)
+)
+
+
+class WebResponse:
+    """
+    A response read in full, safe to share between callers.
+
+    Attributes
+    ----------
+    url : `URL`
+        The URL the response came from, after redirects.
+    status : `int`
+        The HTTP status.
+    headers : `CIMultiDictProxy[str]`
+        The response headers.
+    body : `bytes`
+        The response body.
+    """
+
+    __slots__: tuple[str, ...] = ("url", "status", "headers", "body", "_request_info", "_history")
+
+    def __init__(self, response: aiohttp.ClientResponse, body: bytes) -> None:
+        self.url: URL = response.url
+        self.status: int = response.status
+        self.headers: CIMultiDictProxy[str] = response.headers
+        self.body: bytes = body
+        self._request_info: aiohttp.RequestInfo = response.request_info
+        self._history: tuple[aiohttp.ClientResponse, ...] = response.history
+
+    @property
+    def ok(self) -> bool:
+        """Whether the status is below 400."""
+        return self.status < 400
+
+    def text(self, encoding: str = "utf-8") -> str:
+        """Decode the body as text."""
+        return self.body.decode(encoding, errors="replace")
+
+    def json(self) -> Any:
+        """Decode the body as JSON."""
+        return loads(self.body)
+
+    def raise_for_status(self) -> None:
+        """Raise an :class:`aiohttp.ClientResponseError` if the status is 400 or above."""
+        if not self.ok:
+            raise aiohttp.ClientResponseError(
+                self._request_info,
+                self._history,
+                status=self.status,
+                message=self.text()[:200],
+                headers=self.headers,
+            )
+
+    def __repr__(self) -> str:
+        return f"<WebResponse url={self.url} status={self.status} size={len(self.body)}>"
+
+
+class RetryBudget:
+    """
+    Bounds the retries to a share of the requests, so a failing host doesn't
+    get every request multiplied by the number of retries.
+
+    Every request deposits ``ratio`` of a token and every retry takes a whole one.
+
+    Attributes
+    ----------
+    ratio : `float`
+        The share of requests which can be retried in the long run.
+    max_tokens : `float`
+        The most retries which can be saved up.
+    tokens : `float`
+        The retries available right now.
+    """
+
+    __slots__: tuple[str, ...] = ("ratio", "max_tokens", "tokens")
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0) -> None:
+        self.ratio: float = ratio
+        self.max_tokens: float = max_tokens
+        self.tokens: float = max_tokens
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class _Host:
+    __slots__: tuple[str, ...] = ("semaphore", "budget")
+
+    def __init__(self, limit: int, budget: RetryBudget) -> None:
+        self.semaphore: asyncio.Semaphore = asyncio.Semaphore(limit)
+        self.budget: RetryBudget = budget
+
+
+class _Entry:
+    __slots__: tuple[str, ...] = ("response", "expires", "etag", "last_modified")
+
+    def __init__(self, response: WebResponse, expires: float) -> None:
+        self.response: WebResponse = response
+        self.expires: float = expires
+        self.etag: str | None = response.headers.get("ETag")
+        self.last_modified: str | None = response.headers.get("Last-Modified")
+
+    @property
+    def size(self) -> int:
+        return len(self.response.body)
+
+
+CacheKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+def _freshness(response: WebResponse) -> float | None:
+    # how long the response says it's fresh for, None if it doesn't say.
+    directives: dict[str, str] = {}
+    for directive in response.headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+
+    if "no-cache" in directives:
+        return 0.0
+    try:
+        return max(0.0, float(directives["max-age"]))
+    except (KeyError, ValueError):
+        pass
+
+    if expires := response.headers.get("Expires"):
+        try:
+            fresh_until = parsedate_to_datetime(expires) - parsedate_to_datetime(response.headers["Date"])
+            return max(0.0, fresh_until.total_seconds())
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+
+    return None
+
+
+def _retry_after(response: WebResponse | None) -> float | None:
+    if response is None:
+        return None
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class WebClient:
+    """
+    A web client on top of the shared session for requests to external APIs.
+
+    Responses to ``GET`` are cached in memory, bounded in number and in size
+    (least recently used are evicted first). An entry is fresh for as long as
+    the response says, or ``ttl``, once stale it's revalidated with its ETag or
+    Last-Modified when it has one. Identical requests made while one is in
+    flight share its response.
+
+    Every host gets its own concurrency limit and retry budget, so a slow or
+    failing API doesn't take the connections or the retries of the others.
+
+    Attributes
+    ----------
+    session : `aiohttp.ClientSession`
+        The session the requests are sent with.
+    ttl : `float`
+        How long (in seconds) responses which don't say are cached.
+    max_entries : `int`
+        The maximum number of cached responses.
+    max_bytes : `int`
+        The maximum total size of the cached bodies.
+    max_entry_size : `int`
+        Bodies larger than this are never cached.
+    host_limit : `int`
+        The maximum number of concurrent requests to the same host.
+    retries : `int`
+        How many times an idempotent request is retried at most.
+    backoff : `float`
+        The base delay (in seconds) before a retry, doubled on each attempt.
+    retry_ratio : `float`
+        The share of the requests to a host which can be retried in the long run.
+    hits : `int`
+        Requests answered from the cache.
+    misses : `int`
+        Cacheable requests which had to be sent.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "session",
+        "ttl",
+        "max_entries",
+        "max_bytes",
+        "max_entry_size",
+        "host_limit",
+        "retries",
+        "backoff",
+        "retry_ratio",
+        "hits",
+        "misses",
+        "_size",
+        "_entries",
+        "_inflight",
+        "_hosts",
+    )
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        ttl: float = 60.0,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_entry_size: int = 1024 * 1024,
+        host_limit: int = 8,
+        retries: int = 3,
+        backoff: float = 0.5,
+        retry_ratio: float = 0.2,
+    ) -> None:
+        self.session: aiohttp.ClientSession = session
+        self.ttl: float = ttl
+        self.max_entries: int = max_entries
+        self.max_bytes: int = max_bytes
+        self.max_entry_size: int = max_entry_size
+        self.host_limit: int = host_limit
+        self.retries: int = retries
+        self.backoff: float = backoff
+        self.retry_ratio: float = retry_ratio
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._size: int = 0
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._inflight: dict[CacheKey, asyncio.Future[WebResponse]] = {}
+        self._hosts: dict[str, _Host] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """The total size of the cached bodies."""
+        return self._size
+
+    def _host(self, url: URL) -> _Host:
+        name = url.host or ""
+        host = self._hosts.get(name)
+        if host is None:
+            host = self._hosts[name] = _Host(self.host_limit, RetryBudget(self.retry_ratio))
+        return host
+
+    async def _send(
+        self, method: str, url: URL, headers: Mapping[str, str] | None, retries: int, **kwargs: Any
+    ) -> WebResponse:
+        host = self._host(url)
+        host.budget.deposit()
+
+        attempt = 0
+        while True:
+            response: WebResponse | None = None
+            try:
+                async with host.semaphore:
+                    async with self.session.request(method, url, headers=headers, **kwargs) as resp:
+                        response = WebResponse(resp, await resp.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= retries or not host.budget.withdraw():
+                    raise
+            else:
+                if response.status not in RETRY_STATUSES:
+                    return response
+                if attempt >= retries or not host.budget.withdraw():
+                    return response
+
+            attempt += 1
+            WEB_RETRIES.inc(url.host or "")
+            delay = _retry_after(response)
+            if delay is None:
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            _log.debug(f"Retrying {method} {url} in {delay:.2f}s (attempt {attempt}/{retries})")
+            await asyncio.sleep(delay)
+
+    async def request(
+        self,
+        method: str,
+        url: str | URL,
+        *,
+        headers: Mapping[str, str] | None = None,
+        retries: int | None = None,
+        **kwargs: Any,
+    ) -> WebResponse:
+        """
+        Send a request, bypassing the cache.
+
+        Parameters
+        ----------
+        method : `str`
+            The HTTP method.
+        url : `str | URL`
+            The URL to request.
+        headers : `Mapping[str, str] | None`
+            Extra headers of the request.
+        retries : `int | None`
+            How many times to retry, defaults to :attr:`retries` for idempotent methods
+            and none for the others.
+        **kwargs : `Any`
+            Passed to :meth:`aiohttp.ClientSession.request`, e.g. ``json`` or ``params``.
+
+        Returns
+        -------
+        WebResponse
+            The response, whatever its status.
+        """
+        method = method.upper()
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        return await self._send(method, URL(url), headers, retries, **kwargs)
+
+    async def get(
+        self,
+        url: str | URL,
+        *,
+        params: Mapping[str, Any] | None = None,
+        headers: Mapping[str, str] | None = None,
+        ttl: float | None = None,
+    ) -> WebResponse:
+        """
+        Get a URL, from the cache if a fresh response is cached.
+
+        Parameters
+        ----------
+        url : `str | URL`
+            The URL to get.
+        params : `Mapping[str, Any] | None`
+            The query parameters, added to those of the URL.
+        headers : `Mapping[str, str] | None`
+            Extra headers of the request, requests with different headers are cached apart.
+        ttl : `float | None`
+            How long (in seconds) to cache the response, instead of what the response says.
+
+        Returns
+        -------
+        WebResponse
+            The response, whatever its status. Only successful responses are cached.
+        """
+        target = URL(url)
+        if params:
+            target = target.update_query({k: str(v) for k, v in params.items()})
+
+        key: CacheKey = (str(target), tuple(sorted((k.lower(), v) for k, v in (headers or {}).items())))
+        host = target.host or ""
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            WEB_CACHE.inc(host, "hit")
+            return entry.response
+
+        # share one request between everyone asking for the same response.
+        future = self._inflight.get(key)
+        if future is None:
+            self.misses += 1
+            WEB_CACHE.inc(host, "miss" if entry is None else "stale")
+            future = asyncio.ensure_future(self._load(key, target, headers, ttl))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.hits += 1
+            WEB_CACHE.inc(host, "coalesced")
+
+        return await asyncio.shield(future)
+
+    async def _load(
+        self, key: CacheKey, url: URL, headers: Mapping[str, str] | None, ttl: float | None
+    ) -> WebResponse:
+        entry = self._entries.get(key)
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request_headers["If-Modified-Since"] = entry.last_modified
+
+        response = await self._send("GET", url, request_headers, self.retries)
+
+        if response.status == 304 and entry is not None:
+            # still the same, only its freshness changes.
+            WEB_CACHE.inc(url.host or "", "revalidated")
+            lifetime = ttl if ttl is not None else _freshness(response)
+            entry.expires = time.monotonic() + (self.ttl if lifetime is None else lifetime)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return entry.response
+
+        self._store(key, response, ttl)
+        return response
+
+    def _store(self, key: CacheKey, response: WebResponse, ttl: float | None) -> None:
+        self._discard(key)
+        if response.status != 200 or len(response.body) > self.max_entry_size:
+            return
+
+        if "no-store" in response.headers.get("Cache-Control", "").lower():
+            return
+
+        freshness = _freshness(response)
+        lifetime = ttl if ttl is not None else (self.ttl if freshness is None else freshness)
+        entry = _Entry(response, time.monotonic() + lifetime)
+        if lifetime <= 0 and not (entry.etag or entry.last_modified):
+            # stale right away and nothing to revalidate with.
+            return
+
+        self._entries[key] = entry
+        self._size += entry.size
+        while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def _discard(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def invalidate(self, url: str | URL | None = None) -> None:
+        """
+        Drop the cached responses of a URL, or every response if not given.
+
+        Parameters
+        ----------
+        url : `str | URL | None`
+            The URL, with its query parameters, to drop the responses of.
+        """
+        if url is None:
+            self._entries.clear()
+            self._size = 0
+            return
+
+        target = str(URL(url))
+        for key in [k for k in self._entries if k[0] == target]:
+            self._discard(key)
@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import abc
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable, Sequence
+
+import aiohttp
+from aiohttp import web
+
+
+__all__: tuple[str, ...] = (
+    "METRICS",
+    "MetricsRegistry",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "CommandTiming",
+    "current_timing",
+    "http_trace_config",
+    "LoopLagMonitor",
+    "MetricsServer",
+)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# Latency buckets (in seconds), from a fast cache hit to a command timing out.
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    kind: str = "untyped"
+
+    __slots__: tuple[str, ...] = ("name", "help", "labels")
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.labels: Labels = tuple(labels)
+
+    def _check(self, values: Sequence[str]) -> Labels:
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name} takes the labels {self.labels}, got {tuple(values)}")
+        return tuple(str(v) for v in values)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[str]:
+        """The sample lines of the metric in the text exposition format."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A value which only goes up, e.g. how many times a command was invoked."""
+
+    kind = "counter"
+
+    __slots__: tuple[str, ...] = ("_values",)
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._check(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(self._check(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """
+    A value which goes up and down. It's either set or read from ``function``
+    when the metrics are collected, e.g. the gateway latency.
+    """
+
+    kind = "gauge"
+
+    __slots__: tuple[str, ...] = ("_values", "function")
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        *,
+        function: Callable[[], Iterable[tuple[Labels, float]]] | None = None,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self._values: dict[Labels, float] = {}
+        self.function: Callable[[], Iterable[tuple[Labels, float]]] | None = function
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[self._check(labels)] = value
+
+    def samples(self) -> Iterable[str]:
+        values = self._values.items()
+        if self.function is not None:
+            try:
+                values = [(self._check(k), v) for k, v in self.function()]
+            except Exception:
+                _log.exception(f"Failed to collect {self.name}")
+                values = []
+
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """A distribution of values counted in buckets, e.g. the latency of a command."""
+
+    kind = "histogram"
+
+    __slots__: tuple[str, ...] = ("buckets", "_values")
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets)) + (float("inf"),)
+        # per label values: the count of each bucket (not cumulative), the sum and the count.
+        self._values: dict[Labels, list[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._check(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                labels = _format_labels(self.labels, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """
+    The metrics exposed on the metrics endpoint.
+
+    Attributes
+    ----------
+    metrics : `dict[str, _Metric]`
+        A mapping of metric names to the metric.
+    """
+
+    __slots__: tuple[str, ...] = ("metrics",)
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, _Metric] = {}
+
+    def _add(self, metric: Any) -> Any:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labels != metric.labels:
+                raise ValueError(f"A different metric named {metric.name!r} is already registered.")
+            return existing
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        *,
+        function: Callable[[], Iterable[tuple[Labels, float]]] | None = None,
+    ) -> Gauge:
+        gauge = self._add(Gauge(name, help, labels))
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets=buckets))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+# The registry shared by the whole bot.
+METRICS: MetricsRegistry = MetricsRegistry()
+
+COMMANDS = METRICS.counter(
+    "fifi_commands_total", "Commands invoked.", ("command", "kind")
+)
+COMMAND_ERRORS = METRICS.counter(
+    "fifi_command_errors_total", "Commands which raised an error.", ("command", "kind", "error")
+)
+COMMAND_LATENCY = METRICS.histogram(
+    "fifi_command_duration_seconds",
+    "Time spent in commands, split by stage. queue is the time from receiving the "
+    "message to running the callback (parsing, checks and converters).",
+    ("command", "kind", "stage"),
+)
+QUERY_LATENCY = METRICS.histogram(
+    "fifi_query_duration_seconds", "Time spent running named queries.", ("query",)
+)
+HTTP_LATENCY = METRICS.histogram(
+    "fifi_http_request_duration_seconds", "Time spent in HTTP requests.", ("host", "method")
+)
+LOOP_LAG = METRICS.histogram(
+    "fifi_event_loop_lag_seconds",
+    "How late the event loop woke a sleeping task up.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+
+class CommandTiming:
+    """
+    The time a command spent in each stage, kept in :data:`current_timing` while it runs.
+
+    Attributes
+    ----------
+    started : `float`
+        When the message or interaction was received.
+    invoked : `float | None`
+        When the command callback started.
+    db : `float`
+        The time (in seconds) spent in named queries.
+    http : `float`
+        The time (in seconds) spent in HTTP requests.
+    """
+
+    __slots__: tuple[str, ...] = ("started", "invoked", "db", "http")
+
+    def __init__(self) -> None:
+        self.started: float = time.perf_counter()
+        self.invoked: float | None = None
+        self.db: float = 0.0
+        self.http: float = 0.0
+
+    def observe(self, command: str, kind: str) -> None:
+        """Record the stages of the command once it's done."""
+        now = time.perf_counter()
+        COMMAND_LATENCY.observe(now - self.started, command, kind, "total")
+        if self.invoked is not None:
+            COMMAND_LATENCY.observe(self.invoked - self.started, command, kind, "queue")
+        COMMAND_LATENCY.observe(self.db, command, kind, "db")
+        COMMAND_LATENCY.observe(self.http, command, kind, "http")
+
+
+# Tasks copy the context they're created from, the timing object is shared with
+# whatever the command spawns.
+current_timing: ContextVar[CommandTiming | None] = ContextVar("current_timing", default=None)
+
+
+def observe_query(name: str, elapsed: float, failed: bool) -> None:
+    """A :class:`QueryRegistry` observer adding the query time to the running command."""
+    QUERY_LATENCY.observe(elapsed, name)
+    timing = current_timing.get()
+    if timing is not None:
+        timing.db += elapsed
+
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    """
+    Create a trace config timing the requests of an aiohttp session and adding
+    their time to the running command.
+    """
+
+    async def on_request_start(
+        session: aiohttp.ClientSession, context: SimpleNamespace, params: aiohttp.TraceRequestStartParams
+    ) -> None:
+        context.started = time.perf_counter()
+
+    async def on_request_end(
+        session: aiohttp.ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        started = getattr(context, "started", None)
+        if started is None:
+            return
+
+        elapsed = time.perf_counter() - started
+        HTTP_LATENCY.observe(elapsed, params.url.host or "", params.method)
+        timing = current_timing.get()
+        if timing is not None:
+            timing.http += elapsed
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_end)
+    return trace
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes a sleeping task up. A loop busy with
+    blocking code or too much work wakes it up late.
+
+    Attributes
+    ----------
+    interval : `float`
+        How long (in seconds) the task sleeps between measurements.
+    lag : `float`
+        The last measured lag (in seconds).
+    """
+
+    __slots__: tuple[str, ...] = ("interval", "lag", "_task")
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval: float = interval
+        self.lag: float = 0.0
+        self._task: asyncio.Task[None] | None = None
+
+        METRICS.gauge(
+            "fifi_event_loop_lag_last_seconds",
+            "The last measured event loop lag.",
+            function=lambda: [((), self.lag)],
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - expected)
+            LOOP_LAG.observe(self.lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class MetricsServer:
+    """
+    Serves the metrics in the Prometheus text format on ``/metrics``, from the
+    loop of the bot.
+
+    Attributes
+    ----------
+    host : `str`
+        The address to listen on.
+    port : `int`
+        The port to listen on.
+    registry : `MetricsRegistry`
+        The metrics to serve.
+    """
+
+    __slots__: tuple[str, ...] = ("host", "port", "registry", "_runner")
+
+    def __init__(self, host: str, port: int, *, registry: MetricsRegistry = METRICS) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.registry: MetricsRegistry = registry
+        self._runner: web.AppRunner | None = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.registry.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        _log.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import re
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Iterable
+
+import discord
+
+from database import QUERIES
+from database.codecs import decoded
+
+if TYPE_CHECKING:
+    from database import GuildSettingsCache
+
+
+__all__: tuple[str, ...] = ("PrefixMatcher",)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# The key of the guild settings holding the prefixes of a guild.
+SETTINGS_KEY: str = "prefixes"
+
+MAX_PREFIXES: int = 10
+MAX_PREFIX_LENGTH: int = 16
+
+GET_PREFIXES = QUERIES.register(
+    "prefixes.all",
+    "SELECT guild_id, settings FROM guild_settings WHERE settings -> 'prefixes' IS NOT NULL",
+)
+
+
+class _Compiled:
+    __slots__: tuple[str, ...] = ("first", "pattern")
+
+    def __init__(self, prefixes: tuple[str, ...], mention: bool) -> None:
+        # the longest prefix first, so "f!" isn't shadowed by "f".
+        alternatives = [re.escape(p) for p in sorted(prefixes, key=len, reverse=True)]
+        first = {p[0].lower() for p in prefixes}
+        if mention:
+            alternatives.append(r"<@!?(?P<mention>\d+)>")
+            first.add("<")
+
+        # a message can't start with a prefix if it doesn't start with the first character of one.
+        self.first: frozenset[str] = frozenset(first)
+        self.pattern: re.Pattern[str] = re.compile("|".join(alternatives), re.IGNORECASE)
+
+
+def _clean(prefixes: Iterable[Any]) -> tuple[str, ...]:
+    cleaned: dict[str, None] = {}
+    for prefix in prefixes:
+        if isinstance(prefix, str) and prefix.strip() and len(prefix) <= MAX_PREFIX_LENGTH:
+            cleaned[prefix.strip()] = None
+    return tuple(cleaned)[:MAX_PREFIXES]
+
+
+class PrefixMatcher:
+    """
+    Matches the command prefix of a message without touching the database.
+
+    The prefixes of every guild which has its own are kept in memory and
+    compiled into one pattern per distinct set of prefixes. Guilds without
+    prefixes of their own use the defaults. Matching is case insensitive and
+    mentioning the bot always works as a prefix.
+
+    Attributes
+    ----------
+    defaults : `tuple[str, ...]`
+        The prefixes of guilds without prefixes of their own, and of direct messages.
+    mention : `bool`
+        Whether mentioning the bot is a prefix.
+    user_id : `int | None`
+        The ID of the bot user, a mention of anyone else isn't a prefix.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "defaults",
+        "mention",
+        "user_id",
+        "_guilds",
+        "_compiled",
+        "_settings",
+        "_reloading",
+    )
+
+    def __init__(self, defaults: Iterable[str], *, mention: bool = True) -> None:
+        self.defaults: tuple[str, ...] = _clean(defaults)
+        self.mention: bool = mention
+        self.user_id: int | None = None
+
+        self._guilds: dict[int, tuple[str, ...]] = {}
+        self._compiled: dict[tuple[str, ...], _Compiled] = {}
+        self._settings: GuildSettingsCache | None = None
+        self._reloading: set[asyncio.Task[None]] = set()
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def get(self, guild_id: int | None) -> tuple[str, ...]:
+        """
+        Get the prefixes of a guild.
+
+        Parameters
+        ----------
+        guild_id : `int | None`
+            The guild to get the prefixes of, ``None`` for direct messages.
+
+        Returns
+        -------
+        tuple[str, ...]
+            The prefixes, not including the mention.
+        """
+        if guild_id is None:
+            return self.defaults
+        return self._guilds.get(guild_id, self.defaults)
+
+    def set(self, guild_id: int, prefixes: Iterable[Any] | None) -> None:
+        """
+        Set the prefixes of a guild in memory, the defaults are used if there are none.
+
+        Parameters
+        ----------
+        guild_id : `int`
+            The guild to set the prefixes of.
+        prefixes : `Iterable[Any] | None`
+            The prefixes, entries which aren't valid prefixes are ignored.
+        """
+        cleaned = _clean(prefixes or ())
+        if cleaned and cleaned != self.defaults:
+            self._guilds[guild_id] = cleaned
+        else:
+            self._guilds.pop(guild_id, None)
+
+    def _get_compiled(self, prefixes: tuple[str, ...]) -> _Compiled:
+        compiled = self._compiled.get(prefixes)
+        if compiled is None:
+            compiled = self._compiled[prefixes] = _Compiled(prefixes, self.mention)
+        return compiled
+
+    def match(self, message: discord.Message) -> str | None:
+        """
+        Get the prefix a message starts with.
+
+        Parameters
+        ----------
+        message : `discord.Message`
+            The message to match.
+
+        Returns
+        -------
+        str | None
+            The prefix as written in the message, ``None`` if it doesn't start with one.
+        """
+        content = message.content
+        compiled = self._get_compiled(self.get(message.guild and message.guild.id))
+        if content[:1].lower() not in compiled.first:
+            return None
+
+        match = compiled.pattern.match(content)
+        if match is None:
+            return None
+
+        mentioned = match.group("mention") if self.mention else None
+        if mentioned is not None and int(mentioned) != self.user_id:
+            return None
+
+        return match.group(0)
+
+    async def load(self, settings: GuildSettingsCache) -> None:
+        """
+        Load the prefixes of every guild and keep them in sync with the guild settings.
+
+        Parameters
+        ----------
+        settings : `GuildSettingsCache`
+            The settings the prefixes are stored in.
+        """
+        if self._settings is None:
+            settings.add_listener(self._on_invalidate)
+        self._settings = settings
+        await self._load_all()
+
+    async def _load_all(self) -> None:
+        assert self._settings is not None
+        rows = await QUERIES.fetch(self._settings.db, GET_PREFIXES)
+
+        self._guilds.clear()
+        for row in rows:
+            self.set(row["guild_id"], decoded(row["settings"]).get(SETTINGS_KEY))
+        # sets of prefixes nobody uses anymore.
+        self._compiled.clear()
+
+        _log.info(f"Loaded the prefixes of {len(self._guilds)} guilds")
+
+    async def _reload(self, guild_id: int | None) -> None:
+        assert self._settings is not None
+        try:
+            if guild_id is None:
+                await self._load_all()
+            else:
+                settings = await self._settings.get(guild_id)
+                self.set(guild_id, settings.get(SETTINGS_KEY))
+        except Exception as e:
+            _log.warning(f"Failed to reload the prefixes of {guild_id or 'every guild'}: {e}")
+
+    def _on_invalidate(self, guild_id: int | None) -> None:
+        # the current prefixes stay in use until the reload is done.
+        task = asyncio.create_task(self._reload(guild_id))
+        self._reloading.add(task)
+        task.add_done_callback(self._reloading.discard)
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Iterable, Literal, Sequence, TypeVar
+
+from discord.ext import commands
+
+from core import RateLimited
+from database import QUERIES
+from .metrics import METRICS
+
+if TYPE_CHECKING:
+    from _typings import Context
+    from database import DatabaseProtocol
+
+
+__all__: tuple[str, ...] = ("Limit", "RateLimiter", "TimingWheel", "ratelimit", "command_uses")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+Scope = Literal["user", "guild", "global"]
+# the namespace, scope and ID the bucket is kept for, then the rate and period of its limit.
+Key = tuple[str, str, int, int, float]
+# the namespace, limits and cost of a use.
+Use = tuple[str, Sequence["Limit"], float]
+
+RATELIMITED = METRICS.counter(
+    "fifi_ratelimited_total", "Commands refused by the rate limiter.", ("scope",)
+)
+
+# Refill and take tokens of a shared bucket in one statement, no row is returned when there aren't enough.
+TAKE_SHARED = QUERIES.register(
+    "ratelimit.take",
+    "INSERT INTO ratelimit_buckets (key, tokens, updated, per) "
+    "VALUES ($1, $2::float - $4::float, $5::float, $6::float) "
+    "ON CONFLICT (key) DO UPDATE SET "
+    "tokens = LEAST($2::float, ratelimit_buckets.tokens + ($5::float - ratelimit_buckets.updated) * $3::float) - $4::float, "
+    "updated = $5::float, per = $6::float "
+    "WHERE LEAST($2::float, ratelimit_buckets.tokens + ($5::float - ratelimit_buckets.updated) * $3::float) >= $4::float "
+    "RETURNING tokens",
+)
+# A bucket left alone for its period is full again, the same as no row at all.
+PRUNE_SHARED = QUERIES.register(
+    "ratelimit.prune",
+    "DELETE FROM ratelimit_buckets WHERE updated < $1::float - per",
+)
+
+
+class Limit:
+    """
+    A token bucket limit: ``rate`` uses every ``per`` seconds, refilled continuously.
+
+    Attributes
+    ----------
+    rate : `int`
+        The number of uses the bucket holds.
+    per : `float`
+        How long (in seconds) a full bucket takes to refill.
+    scope : `Scope`
+        Who shares the bucket, ``user``, ``guild`` or ``global``.
+    """
+
+    __slots__: tuple[str, ...] = ("rate", "per", "scope", "refill")
+
+    def __init__(self, rate: int, per: float, scope: Scope = "user") -> None:
+        self.rate: int = rate
+        self.per: float = per
+        self.scope: Scope = scope
+        self.refill: float = rate / per
+
+    def __repr__(self) -> str:
+        return f"<Limit rate={self.rate} per={self.per} scope={self.scope}>"
+
+
+class _Bucket:
+    __slots__: tuple[str, ...] = ("limit", "tokens", "updated")
+
+    def __init__(self, limit: Limit, now: float) -> None:
+        self.limit: Limit = limit
+        self.tokens: float = float(limit.rate)
+        self.updated: float = now
+
+    def level(self, now: float) -> float:
+        return min(float(self.limit.rate), self.tokens + (now - self.updated) * self.limit.refill)
+
+    def full_at(self) -> float:
+        # a full bucket is the same as no bucket, it can be dropped from then on.
+        return self.updated + (self.limit.rate - self.tokens) / self.limit.refill
+
+
+class TimingWheel:
+    """
+    Keys bucketed by the tick they are due at, so scheduling and expiring are O(1).
+
+    A key due further than a turn of the wheel is seen early and scheduled again.
+
+    Attributes
+    ----------
+    resolution : `float`
+        The length (in seconds) of a tick.
+    """
+
+    __slots__: tuple[str, ...] = ("resolution", "_slots", "_tick")
+
+    def __init__(self, slots: int = 512, resolution: float = 1.0) -> None:
+        self.resolution: float = resolution
+        self._slots: list[set[Hashable]] = [set() for _ in range(slots)]
+        self._tick: int = int(time.monotonic() / resolution)
+
+    def schedule(self, key: Hashable, when: float) -> None:
+        tick = max(int(when / self.resolution), self._tick + 1)
+        self._slots[tick % len(self._slots)].add(key)
+
+    def advance(self, now: float) -> list[Hashable]:
+        """Move to ``now`` and get the keys of every tick passed."""
+        target = int(now / self.resolution)
+        steps = min(target - self._tick, len(self._slots))
+        due: list[Hashable] = []
+        for step in range(1, steps + 1):
+            slot = self._slots[(self._tick + step) % len(self._slots)]
+            due.extend(slot)
+            slot.clear()
+
+        self._tick = max(self._tick, target)
+        return due
+
+
+class RateLimiter:
+    """
+    Token buckets per user, guild and globally, checked together so a use is
+    only counted when every level allows it.
+
+    Every limit has a bucket of its own, so limits of the same scope stack,
+    e.g. a burst and a sustained limit per user. Buckets are created on first
+    use and dropped by a timing wheel once they are full again, so memory
+    follows the users active over the longest limit. The buckets of the scopes
+    in ``shared_scopes`` live in the database instead, shared by every process
+    using it, and are pruned every ``prune_interval`` seconds.
+
+    Attributes
+    ----------
+    db : `DatabaseProtocol | None`
+        The database of the shared buckets.
+    shared_scopes : `frozenset[str]`
+        The scopes whose buckets are shared.
+    prune_interval : `float`
+        How often (in seconds) shared buckets which are full again are deleted.
+    """
+
+    __slots__: tuple[str, ...] = ("db", "shared_scopes", "prune_interval", "_buckets", "_wheel", "_task")
+
+    def __init__(
+        self,
+        db: DatabaseProtocol | None = None,
+        *,
+        shared_scopes: Iterable[str] = (),
+        slots: int = 512,
+        resolution: float = 1.0,
+        prune_interval: float = 60.0,
+    ) -> None:
+        self.db: DatabaseProtocol | None = db
+        self.shared_scopes: frozenset[str] = frozenset(shared_scopes) if db is not None else frozenset()
+        self.prune_interval: float = prune_interval
+        self._buckets: dict[Hashable, _Bucket] = {}
+        self._wheel: TimingWheel = TimingWheel(slots, resolution)
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _expire(self, now: float) -> None:
+        for key in self._wheel.advance(now):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+
+            full_at = bucket.full_at()
+            if full_at <= now:
+                del self._buckets[key]
+            else:
+                self._wheel.schedule(key, full_at)
+
+    def _bucket(self, key: Hashable, limit: Limit, now: float) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(limit, now)
+            self._wheel.schedule(key, now + limit.per)
+        return bucket
+
+    def acquire(
+        self, buckets: Sequence[tuple[Hashable, Limit, float]], *, take: bool = True
+    ) -> tuple[Scope, float] | None:
+        """
+        Take tokens from every bucket, or from none if any of them lacks them.
+
+        Parameters
+        ----------
+        buckets : `Sequence[tuple[Hashable, Limit, float]]`
+            The key, limit and number of tokens to take of every bucket.
+        take : `bool`
+            Whether to take the tokens, or only check that they are there.
+
+        Returns
+        -------
+        tuple[Scope, float] | None
+            The scope and retry after of the most restrictive exhausted bucket, ``None`` if taken.
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        found = [(self._bucket(key, limit, now), limit, cost) for key, limit, cost in buckets]
+        blocked: tuple[Scope, float] | None = None
+        for bucket, limit, cost in found:
+            level = bucket.level(now)
+            if level < cost:
+                retry_after = (cost - level) / limit.refill
+                if blocked is None or retry_after > blocked[1]:
+                    blocked = (limit.scope, retry_after)
+
+        if blocked is not None or not take:
+            return blocked
+
+        for bucket, _, cost in found:
+            bucket.tokens = bucket.level(now) - cost
+            bucket.updated = now
+        return None
+
+    async def _take_shared(self, con: Any, key: Key, limit: Limit, cost: float) -> float | None:
+        name = ":".join(map(str, key))
+        row = await QUERIES.fetchrow(
+            con, TAKE_SHARED, name, float(limit.rate), limit.refill, cost, time.time(), float(limit.per)
+        )
+        if row is not None:
+            return None
+        # not worth a second round trip for the exact level.
+        return cost / limit.refill
+
+    async def hit(self, uses: Iterable[Use], *, user_id: int, guild_id: int | None, take: bool = True) -> None:
+        """
+        Count uses against their limits, raising if any of them is exhausted.
+
+        Parameters
+        ----------
+        uses : `Iterable[Use]`
+            The namespace, limits and cost of every use. Buckets aren't shared
+            between namespaces, e.g. ``"*"`` for the bot-wide limits and the name
+            of a command for its own.
+        user_id : `int`
+            The user making the uses.
+        guild_id : `int | None`
+            The guild the uses are made in, direct messages count as a guild of their own per user.
+        take : `bool`
+            Whether to count the uses, or only check that the limits allow them.
+            Shared buckets are only checked when the uses are counted.
+
+        Raises
+        ------
+        RateLimited
+            A limit is exhausted, the uses aren't counted against any bucket.
+        """
+        ids: dict[str, int] = {"user": user_id, "guild": guild_id or -user_id, "global": 0}
+
+        local: list[tuple[Hashable, Limit, float]] = []
+        shared: list[tuple[Key, Limit, float]] = []
+        for namespace, limits, cost in uses:
+            for limit in limits:
+                key: Key = (namespace, limit.scope, ids[limit.scope], limit.rate, limit.per)
+                (shared if limit.scope in self.shared_scopes else local).append((key, limit, cost))
+
+        blocked = self.acquire(local, take=take and not shared)
+        if blocked is not None:
+            raise RateLimited(*blocked)
+        if not take or not shared:
+            return
+
+        # a use refused locally costs no round trip. Refusing it afterwards rolls back
+        # the shared buckets already taken from, the local ones are taken from last.
+        assert self.db is not None
+        async with self.db.acquire() as con:
+            async with con.transaction():
+                for key, limit, cost in shared:
+                    retry_after = await self._take_shared(con, key, limit, cost)
+                    if retry_after is not None:
+                        raise RateLimited(limit.scope, retry_after)
+
+                blocked = self.acquire(local)
+                if blocked is not None:
+                    raise RateLimited(*blocked)
+
+    async def check(self, ctx: Context, uses: Iterable[Use], *, take: bool = False) -> bool:
+        """Check the uses of a command, for checks which only look at the limits."""
+        await self.hit(uses, user_id=ctx.author.id, guild_id=ctx.guild and ctx.guild.id, take=take)
+        return True
+
+    async def _prune(self) -> None:
+        assert self.db is not None
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await QUERIES.execute(self.db, PRUNE_SHARED, time.time())
+            except Exception as e:
+                _log.warning(f"Failed to prune the shared rate limit buckets: {e}")
+
+    def start(self) -> None:
+        """Start pruning the shared buckets, if there are any."""
+        if self._task is None and self.shared_scopes:
+            self._task = asyncio.create_task(self._prune())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def command_uses(command: Any, defaults: Sequence[Limit] = (), *, inherited: bool = True) -> list[Use]:
+    """
+    Get every use a command counts against: the bot-wide limits, the limits of
+    its cog and its own.
+
+    Parameters
+    ----------
+    command : `commands.Command | app_commands.Command | None`
+        The command used.
+    defaults : `Sequence[Limit]`
+        The bot-wide limits.
+    inherited : `bool`
+        Whether to include the bot-wide and cog limits, not when a parent
+        invoked along with the command already counted against them.
+
+    Returns
+    -------
+    list[Use]
+        The namespace, limits and cost of every use.
+    """
+    uses: list[Use] = [("*", defaults, 1.0)] if defaults and inherited else []
+    if command is None:
+        return uses
+
+    cog = getattr(command, "cog", None) or getattr(command, "binding", None)
+    limits = getattr(cog, "ratelimits", ())
+    if limits and inherited:
+        uses.append((cog.qualified_name, limits, 1.0))
+
+    spec: tuple[Sequence[Limit], float] | None = getattr(command.callback, "__ratelimit__", None)
+    if spec is not None:
+        uses.append((command.qualified_name, *spec))
+    return uses
+
+
+def ratelimit(*limits: Limit, cost: float = 1.0) -> Callable[[T], T]:
+    """
+    Limit how often a command is used, against every limit at once.
+
+    The limits are checked along with the other checks, so the help command
+    hides a command while they are exhausted, and counted once the command is
+    invoked.
+
+    Parameters
+    ----------
+    *limits : `Limit`
+        The limits, e.g. ``Limit(3, 10)`` for 3 uses per user every 10 seconds
+        and ``Limit(30, 60, "guild")`` for 30 per guild every minute.
+    cost : `float`
+        The number of tokens a use takes, for commands sharing limits.
+
+    Raises
+    ------
+    RateLimited
+        A limit is exhausted, raised from the check or before the command is invoked.
+    """
+
+    async def predicate(ctx: Context) -> bool:
+        namespace = ctx.command.qualified_name if ctx.command else "unknown"
+        return await ctx.bot.ratelimiter.check(ctx, [(namespace, limits, cost)])
+
+    check = commands.check(predicate)
+
+    def decorator(func: Any) -> Any:
+        callback = func.callback if isinstance(func, commands.Command) else func
+        callback.__ratelimit__ = (limits, cost)
+        return check(func)
+
+    return decorator
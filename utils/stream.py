@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import gzip
+import tempfile
+from typing import IO, Any, AsyncIterable, AsyncIterator, Sequence
+
+import discord
+
+
+__all__: tuple[str, ...] = ("paginate_stream", "AttachmentSpool")
+
+
+def _format(item: str | Sequence[Any]) -> str:
+    if isinstance(item, str):
+        return item
+    # a row, one line with its values separated by tabs.
+    return "\t".join("" if value is None else str(value) for value in item) + "\n"
+
+
+def _cut(text: str, start: int, page_size: int, escape_mentions: bool) -> tuple[str, int]:
+    # the longest page from start which still fits once escaped, mentions are
+    # escaped on the page so one split over several items is caught too.
+    limit = page_size
+    while True:
+        if len(text) - start <= limit:
+            cut = len(text)
+        else:
+            cut = text.rfind("\n", start, start + limit)
+            cut = start + limit if cut <= start else cut + 1
+
+        page = text[start:cut]
+        if escape_mentions:
+            page = discord.utils.escape_mentions(page)
+        if len(page) <= page_size:
+            return page, cut
+        limit -= len(page) - page_size
+
+
+async def paginate_stream(
+    source: AsyncIterable[str | Sequence[Any]],
+    *,
+    page_size: int = 2000,
+    escape_mentions: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Cut the text of a stream into pages as it arrives.
+
+    Pages end on a line break whenever one falls in the page, and only the page
+    being filled is held in memory.
+
+    Parameters
+    ----------
+    source : `AsyncIterable[str | Sequence[Any]]`
+        The text, or rows which are written one per line.
+    page_size : `int`
+        The maximum length of a page.
+    escape_mentions : `bool`
+        Whether to escape mentions like @username.
+
+    Yields
+    ------
+    str
+        The pages, in order.
+    """
+    pending = ""
+    async for item in source:
+        pending += _format(item)
+        # a large item is cut from an offset, not copied again for every page.
+        start = 0
+        while len(pending) - start > page_size:
+            page, start = _cut(pending, start, page_size, escape_mentions)
+            yield page
+        pending = pending[start:]
+
+    start = 0
+    while pending[start:].strip():
+        page, start = _cut(pending, start, page_size, escape_mentions)
+        yield page
+
+
+class AttachmentSpool:
+    """
+    Text written to a file kept in memory while it's small and on disk after, to
+    be sent as an attachment.
+
+    Attributes
+    ----------
+    filename : `str`
+        The name of the attachment, ``.gz`` is added when compressed.
+    compress : `bool`
+        Whether the text is gzip compressed as it's written.
+    max_size : `int`
+        The most bytes of text kept, the rest is cut off.
+    size : `int`
+        The bytes of text written so far.
+    truncated : `bool`
+        Whether text was cut off.
+    """
+
+    __slots__: tuple[str, ...] = ("filename", "compress", "max_size", "size", "truncated", "_file", "_writer")
+
+    def __init__(
+        self,
+        filename: str = "output.txt",
+        *,
+        compress: bool = False,
+        max_size: int = 8 * 1024 * 1024,
+        memory_size: int = 1024 * 1024,
+    ) -> None:
+        self.filename: str = filename + ".gz" if compress else filename
+        self.compress: bool = compress
+        self.max_size: int = max_size
+        self.size: int = 0
+        self.truncated: bool = False
+
+        self._file: tempfile.SpooledTemporaryFile[bytes] = tempfile.SpooledTemporaryFile(max_size=memory_size)
+        self._writer: IO[bytes] = gzip.GzipFile(fileobj=self._file, mode="wb") if compress else self._file
+
+    def write(self, text: str) -> None:
+        if self.truncated:
+            return
+
+        data = text.encode()
+        if self.size + len(data) > self.max_size:
+            data = data[: self.max_size - self.size]
+            self.truncated = True
+
+        self._writer.write(data)
+        self.size += len(data)
+
+    def to_file(self) -> discord.File:
+        """Finish writing and get the attachment, the spool is closed along with it."""
+        if self.compress:
+            # flushes the end of the gzip stream, the underlying file stays open.
+            self._writer.close()
+
+        self._file.seek(0)
+        return discord.File(self._file, filename=self.filename)  # type: ignore[arg-type]
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import json
+import random
+import asyncio
+import hashlib
+import logging
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable
+
+import aiohttp
+import discord
+from discord import app_commands
+
+from database import QUERIES
+from database.codecs import decoded
+
+if TYPE_CHECKING:
+    from database import DatabaseProtocol
+
+
+__all__: tuple[str, ...] = ("TreeSyncer", "SyncReport", "SyncOutcome")
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+# The scope of the global commands, guild commands use the guild ID.
+GLOBAL_SCOPE: int = 0
+
+GET_STATE = QUERIES.register(
+    "command_sync.get",
+    "SELECT payload_hash, commands FROM command_sync WHERE scope = $1",
+)
+SET_STATE = QUERIES.register(
+    "command_sync.set",
+    "INSERT INTO command_sync (scope, payload_hash, commands) VALUES ($1, $2, $3) "
+    "ON CONFLICT (scope) DO UPDATE SET payload_hash = EXCLUDED.payload_hash, "
+    "commands = EXCLUDED.commands, synced_at = now()",
+)
+
+
+def _digest(data: Any) -> str:
+    # sorted keys and no whitespace so the same payload always hashes the same.
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class SyncReport:
+    """
+    The outcome of syncing the commands of a scope.
+
+    Attributes
+    ----------
+    guild : `discord.abc.Snowflake | None`
+        The guild synced to, ``None`` for the global commands.
+    skipped : `bool`
+        Whether the sync was skipped because nothing changed.
+    added : `list[str]`
+        The commands which weren't synced before.
+    removed : `list[str]`
+        The commands which aren't synced anymore.
+    changed : `list[str]`
+        The commands whose payload changed.
+    synced : `list[app_commands.AppCommand]`
+        The commands returned by Discord, empty if the sync was skipped.
+    """
+
+    __slots__: tuple[str, ...] = ("guild", "skipped", "added", "removed", "changed", "synced")
+
+    def __init__(
+        self,
+        guild: discord.abc.Snowflake | None,
+        *,
+        skipped: bool,
+        added: list[str],
+        removed: list[str],
+        changed: list[str],
+        synced: list[app_commands.AppCommand] | None = None,
+    ) -> None:
+        self.guild: discord.abc.Snowflake | None = guild
+        self.skipped: bool = skipped
+        self.added: list[str] = added
+        self.removed: list[str] = removed
+        self.changed: list[str] = changed
+        self.synced: list[app_commands.AppCommand] = synced or []
+
+    def summary(self) -> str:
+        """A human readable summary of what changed."""
+        scope = "globally" if self.guild is None else f"to guild {self.guild.id}"
+        if self.skipped:
+            return f"Skipped syncing {scope}, nothing changed."
+
+        parts = [
+            f"{label}: {', '.join(names)}"
+            for label, names in (("added", self.added), ("removed", self.removed), ("changed", self.changed))
+            if names
+        ]
+        details = f" ({'; '.join(parts)})" if parts else ""
+        return f"Synced {len(self.synced)} commands {scope}{details}."
+
+    def __repr__(self) -> str:
+        return (
+            f"<SyncReport guild={self.guild and self.guild.id} skipped={self.skipped} "
+            f"added={len(self.added)} removed={len(self.removed)} changed={len(self.changed)}>"
+        )
+
+
+class SyncOutcome:
+    """
+    The outcome of syncing one guild of a bulk sync.
+
+    Attributes
+    ----------
+    guild : `discord.abc.Snowflake`
+        The guild synced to.
+    report : `SyncReport | None`
+        What changed, ``None`` if the sync failed.
+    error : `Exception | None`
+        The error the sync failed with.
+    attempts : `int`
+        How many times the sync was tried.
+    """
+
+    __slots__: tuple[str, ...] = ("guild", "report", "error", "attempts")
+
+    def __init__(
+        self,
+        guild: discord.abc.Snowflake,
+        *,
+        report: SyncReport | None = None,
+        error: Exception | None = None,
+        attempts: int = 1,
+    ) -> None:
+        self.guild: discord.abc.Snowflake = guild
+        self.report: SyncReport | None = report
+        self.error: Exception | None = error
+        self.attempts: int = attempts
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return f"<SyncOutcome guild={self.guild.id} ok={self.ok} attempts={self.attempts}>"
+
+
+class TreeSyncer:
+    """
+    Syncs the application commands of a tree only when they changed.
+
+    The translated payload of every command is hashed and the hashes of the last
+    sync of each scope are stored in the database. A sync whose payload hashes
+    the same as the stored one isn't sent to Discord.
+
+    Attributes
+    ----------
+    tree : `app_commands.CommandTree`
+        The tree to sync.
+    db : `DatabaseProtocol`
+        The database the hashes are stored in.
+    """
+
+    __slots__: tuple[str, ...] = ("tree", "db")
+
+    def __init__(self, tree: app_commands.CommandTree, db: DatabaseProtocol) -> None:
+        self.tree: app_commands.CommandTree = tree
+        self.db: DatabaseProtocol = db
+
+    async def hashes(self, guild: discord.abc.Snowflake | None = None) -> dict[str, str]:
+        """
+        Hash the payload of every command of a scope, the way ``CommandTree.sync`` would send it.
+
+        Parameters
+        ----------
+        guild : `discord.abc.Snowflake | None`
+            The guild of the commands, ``None`` for the global commands.
+
+        Returns
+        -------
+        dict[str, str]
+            The hash of each command, keyed by its type and name.
+        """
+        tree, translator = self.tree, self.tree.translator
+        hashes: dict[str, str] = {}
+        for command in tree.get_commands(guild=guild):
+            if translator is not None:
+                payload = await command.get_translated_payload(tree, translator)
+            else:
+                payload = command.to_dict(tree)
+
+            # slash commands and context menus can share a name.
+            hashes[f"{payload.get('type', 1)}:{payload['name']}"] = _digest(payload)
+
+        return hashes
+
+    async def sync(
+        self, guild: discord.abc.Snowflake | None = None, *, force: bool = False
+    ) -> SyncReport:
+        """
+        Sync the commands of a scope if they changed since the last sync.
+
+        Parameters
+        ----------
+        guild : `discord.abc.Snowflake | None`
+            The guild to sync to, ``None`` for the global commands.
+        force : `bool`
+            Sync even if nothing changed, e.g. when the commands were edited elsewhere.
+
+        Returns
+        -------
+        SyncReport
+            What changed and whether the sync was skipped.
+
+        Raises
+        ------
+        discord.HTTPException
+            Syncing the commands failed.
+        """
+        scope = GLOBAL_SCOPE if guild is None else guild.id
+        current = await self.hashes(guild)
+        payload_hash = _digest(sorted(current.items()))
+
+        row = await QUERIES.fetchrow(self.db, GET_STATE, scope)
+        previous: dict[str, str] = dict(decoded(row["commands"])) if row is not None else {}
+
+        def _name(key: str) -> str:
+            return key.partition(":")[2]
+
+        added = sorted(_name(k) for k in current.keys() - previous.keys())
+        removed = sorted(_name(k) for k in previous.keys() - current.keys())
+        changed = sorted(_name(k) for k in current.keys() & previous.keys() if current[k] != previous[k])
+
+        if not force and row is not None and row["payload_hash"] == payload_hash:
+            report = SyncReport(guild, skipped=True, added=added, removed=removed, changed=changed)
+            _log.debug(report.summary())
+            return report
+
+        synced = await self.tree.sync(guild=guild)
+        await QUERIES.execute(self.db, SET_STATE, scope, payload_hash, current)
+
+        report = SyncReport(
+            guild, skipped=False, added=added, removed=removed, changed=changed, synced=synced
+        )
+        _log.info(report.summary())
+        return report
+
+    async def _sync_with_retries(
+        self,
+        guild: discord.abc.Snowflake,
+        *,
+        force: bool,
+        retries: int,
+        backoff: float,
+    ) -> SyncOutcome:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                report = await self.sync(guild, force=force)
+            except discord.RateLimited as e:
+                # the library gave up waiting on the bucket, wait as long as Discord asked.
+                error, delay = e, e.retry_after
+            except discord.HTTPException as e:
+                # forbidden (no applications.commands scope), invalid commands and the like won't fix themselves.
+                if e.status < 500:
+                    return SyncOutcome(guild, error=e, attempts=attempt)
+                error, delay = e, backoff * 2 ** (attempt - 1)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error, delay = e, backoff * 2 ** (attempt - 1)
+            except Exception as e:
+                # e.g. the database failed, one guild's failure mustn't abort the others.
+                _log.exception(f"Syncing guild {guild.id} failed")
+                return SyncOutcome(guild, error=e, attempts=attempt)
+            else:
+                return SyncOutcome(guild, report=report, attempts=attempt)
+
+            if attempt > retries:
+                return SyncOutcome(guild, error=error, attempts=attempt)
+
+            _log.warning(f"Syncing guild {guild.id} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def sync_many(
+        self,
+        guilds: Iterable[discord.abc.Snowflake],
+        *,
+        force: bool = False,
+        concurrency: int = 5,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ) -> AsyncIterator[SyncOutcome]:
+        """
+        Sync the commands of many guilds concurrently, yielding each outcome as it completes.
+
+        Rate limits are handled by the HTTP client, which waits on the bucket of each
+        guild, this only bounds how many syncs are in flight. Server errors and
+        connection failures are retried with an exponential backoff.
+
+        Parameters
+        ----------
+        guilds : `Iterable[discord.abc.Snowflake]`
+            The guilds to sync to.
+        force : `bool`
+            Sync even if nothing changed.
+        concurrency : `int`
+            How many guilds are synced at once.
+        retries : `int`
+            How many times a failed sync is retried.
+        backoff : `float`
+            The delay (in seconds) before the first retry, doubled for every other one.
+
+        Yields
+        ------
+        SyncOutcome
+            The outcome of each guild, in the order they complete.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(guild: discord.abc.Snowflake) -> SyncOutcome:
+            async with semaphore:
+                return await self._sync_with_retries(
+                    guild, force=force, retries=retries, backoff=backoff
+                )
+
+        tasks = [asyncio.create_task(run(guild)) for guild in guilds]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            # the caller stopped iterating early or was cancelled.
+            for task in tasks:
+                task.cancel()
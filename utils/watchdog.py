@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import sys
+import time
+import types
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Callable
+
+from core import LoopStalled
+
+
+__all__: tuple[str, ...] = ("LoopWatchdog",)
+
+
+_log: logging.Logger = logging.getLogger(__name__)
+
+
+def _describe_task(task: asyncio.Task | None) -> str | None:
+    if task is None:
+        return None
+
+    coro = task.get_coro()
+    name = getattr(coro, "__qualname__", None) or repr(coro)
+    return f"{task.get_name()} ({name})"
+
+
+class LoopWatchdog:
+    """
+    A thread watching how responsive an event loop is.
+
+    Every ``interval`` it asks the loop to run a callback. When the loop doesn't
+    get to it within ``threshold`` the stack of the loop thread is captured, so
+    the code holding the loop can be reported once it lets go.
+
+    Attributes
+    ----------
+    loop : `asyncio.AbstractEventLoop`
+        The loop to watch.
+    threshold : `float`
+        How long (in seconds) the loop can be unresponsive before it's a stall.
+    interval : `float`
+        How often (in seconds) the loop is checked.
+    on_stall : `Callable[[LoopStalled], None] | None`
+        Called on the loop once a stall is over, with an error whose traceback is the
+        captured stack.
+    stalls : `int`
+        How many stalls were detected.
+    """
+
+    __slots__: tuple[str, ...] = (
+        "loop",
+        "threshold",
+        "interval",
+        "on_stall",
+        "stalls",
+        "_loop_thread",
+        "_answered",
+        "_stopped",
+        "_thread",
+    )
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        threshold: float = 0.5,
+        interval: float = 0.1,
+        on_stall: Callable[[LoopStalled], None] | None = None,
+    ) -> None:
+        self.loop: asyncio.AbstractEventLoop = loop
+        self.threshold: float = threshold
+        self.interval: float = interval
+        self.on_stall: Callable[[LoopStalled], None] | None = on_stall
+        self.stalls: int = 0
+
+        # the watchdog is created from the loop thread.
+        self._loop_thread: int = threading.get_ident()
+        self._answered: threading.Event = threading.Event()
+        self._stopped: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _capture(self) -> types.TracebackType | None:
+        frame = sys._current_frames().get(self._loop_thread)
+        # line numbers of a running frame change, they are copied while it's held.
+        tb: types.TracebackType | None = None
+        while frame is not None:
+            tb = types.TracebackType(tb, frame, frame.f_lasti, frame.f_lineno)
+            frame = frame.f_back
+        return tb
+
+    def _report(self, started: float, tb: types.TracebackType | None, task: str | None) -> None:
+        duration = time.monotonic() - started
+        self.stalls += 1
+
+        error = LoopStalled(duration, task)
+        error.__traceback__ = tb
+        stack = "".join(traceback.format_tb(tb)) if tb is not None else "unavailable\n"
+        _log.warning(f"{error}, the loop thread was at:\n{stack}")
+
+        if self.on_stall is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.on_stall, error)
+            except RuntimeError:
+                # the loop is closed.
+                pass
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self._answered.clear()
+            started = time.monotonic()
+            try:
+                self.loop.call_soon_threadsafe(self._answered.set)
+            except RuntimeError:
+                return
+
+            if self._answered.wait(self.threshold):
+                continue
+
+            # stalled, the first capture shows what took the loop.
+            tb = self._capture()
+            task = _describe_task(asyncio.current_task(self.loop))
+            while not self._answered.wait(self.interval):
+                if self._stopped.is_set():
+                    return
+
+            self._report(started, tb, task)
+            del tb
+
+    def start(self) -> None:
+        """Start watching the loop."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching the loop."""
+        self._stopped.set()
+        self._thread = None